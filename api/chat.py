@@ -8,9 +8,8 @@ from pathlib import Path
 backend_path = str(Path(__file__).parent.parent / "backend")
 sys.path.insert(0, backend_path)
 
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from backend.main import app
+from main import create_app
 
 # Export the FastAPI app for Vercel
+app = create_app()
 handler = app
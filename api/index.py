@@ -10,8 +10,9 @@ backend_path = str(Path(__file__).parent.parent / "backend")
 sys.path.insert(0, backend_path)
 
 # Import FastAPI app
-from main import app
+from main import create_app
+
+app = create_app()
 
 # Vercel handler - standard for Python serverless
-def handler(event, context):
-    return app(event, context)
+handler = app
@@ -43,7 +43,11 @@ if IS_HF:
         print("No AI service configured")
         from app.test_mode import MockOpenAIService as AIService
 
-    from app.qdrant_service import QdrantService
+    if settings.VECTOR_BACKEND == "local":
+        print("Using local in-process vector index")
+        from app.local_index import LocalIndexService as QdrantService
+    else:
+        from app.qdrant_service import QdrantService
 
     ai_service = AIService()
     qdrant_service = QdrantService()
@@ -0,0 +1,181 @@
+"""
+Admission control for chat requests
+A token bucket per client IP limits request rate, and a global cap on
+concurrent LLM calls queues the excess fairly across clients.
+Requests over either limit are rejected at once with a Retry-After hint
+instead of piling up until they time out
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+from app.config import settings
+from app.metrics import ADMISSION_REJECTIONS, LLM_QUEUE_WAIT
+
+
+class AdmissionRejected(Exception):
+    """Request refused by admission control (status 429 or 503)"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"{reason}, retry after {self.retry_after}s")
+        ADMISSION_REJECTIONS.inc(reason=reason)
+
+
+class RateLimiter:
+    """Token bucket per client key, least recently seen clients evicted past max_clients"""
+
+    def __init__(self, per_minute: float, burst: int, max_clients: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = float(burst)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+
+    def check(self, key: str, cost: float = 1.0):
+        """
+        Take cost tokens from the client's bucket (raises AdmissionRejected 429 if empty)
+
+        A cost above the burst (a large batch) is admitted once the bucket is
+        full and leaves it in debt, so the client waits until it is paid off.
+        """
+        if self.rate <= 0:
+            return
+
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        needed = min(cost, self.burst)
+        self._buckets[key] = (tokens - cost if tokens >= needed else tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+        if tokens < needed:
+            raise AdmissionRejected(429, "rate_limited", (needed - tokens) / self.rate)
+
+
+class FairLimiter:
+    """
+    At most capacity holders at once; waiters are served round-robin by key
+
+    Each key has its own FIFO, and a released slot goes to the head of the
+    next key's FIFO in turn, so one client with many queued calls (e.g. a
+    batch) cannot starve the others. The queue is bounded in length and in
+    waiting time.
+    """
+
+    def __init__(self, capacity: int, max_queue: int, timeout: float):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._hold_ewma = 1.0  # seconds a slot is held, for Retry-After estimates
+
+    def retry_after(self) -> float:
+        """Rough seconds until a new request would get a slot"""
+        return self._hold_ewma * (self.waiting + 1) / max(1, self.capacity)
+
+    def check_capacity(self):
+        """Reject up front when the queue is already full (raises AdmissionRejected 503)"""
+        if self.active >= self.capacity and self.waiting >= self.max_queue:
+            raise AdmissionRejected(503, "queue_full", self.retry_after())
+
+    async def acquire(self, key: str):
+        """Wait for a slot (raises AdmissionRejected 503 if the queue is full or the wait times out)"""
+        if self.active < self.capacity and not self._queues:
+            self.active += 1
+            LLM_QUEUE_WAIT.observe(0.0)
+            return
+
+        self.check_capacity()
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(waiter)
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._discard(key, waiter)
+            raise AdmissionRejected(503, "queue_timeout", self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the caller went away: pass the slot on
+                self.release()
+            else:
+                self._discard(key, waiter)
+            raise
+        finally:
+            self.waiting -= 1
+            LLM_QUEUE_WAIT.observe(time.monotonic() - start)
+
+    def release(self):
+        """Hand the slot to the next key's oldest waiter, or free it"""
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, key: str, waiter: asyncio.Future):
+        queue = self._queues.get(key)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[key]
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncIterator[None]:
+        """Hold a slot for the body of the block"""
+        await self.acquire(key)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - start
+            self._hold_ewma += 0.2 * (held - self._hold_ewma)
+            self.release()
+
+    def stats(self) -> Dict:
+        """Slots in use and queued waiters"""
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "waiting": self.waiting,
+            "waiting_clients": len(self._queues),
+        }
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_llm_limiter: Optional[FairLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide per-client rate limiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            settings.RATE_LIMIT_PER_MINUTE, settings.RATE_LIMIT_BURST, settings.RATE_LIMIT_MAX_CLIENTS
+        )
+    return _rate_limiter
+
+
+def get_llm_limiter() -> FairLimiter:
+    """Process-wide cap on concurrent LLM calls"""
+    global _llm_limiter
+    if _llm_limiter is None:
+        _llm_limiter = FairLimiter(
+            settings.LLM_MAX_CONCURRENCY, settings.LLM_QUEUE_SIZE, settings.LLM_QUEUE_TIMEOUT
+        )
+    return _llm_limiter
@@ -0,0 +1,161 @@
+"""
+Memory-mapped chunk text store keyed by point id
+With LEAN_PAYLOADS the vector payloads only carry citation fields; the
+populate scripts write every chunk's text here, and prompts read back only
+the passages they use
+"""
+
+import json
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from app.config import settings, resolve_path
+
+MAGIC = b"CHUNKS01"
+ALIGNMENT = 64
+
+
+def write_store(path, ids: Sequence[str], texts: Sequence[str]):
+    """
+    Write the store atomically
+
+    Layout: magic, header length (uint64), JSON header (count, id width,
+    array offsets), then 64-byte aligned arrays: sorted ids (fixed-width
+    bytes), text offsets (int64, count + 1) and the UTF-8 text blob.
+    """
+    encoded = sorted(
+        (str(point_id).encode("utf-8"), text.encode("utf-8")) for point_id, text in zip(ids, texts)
+    )
+    width = max((len(point_id) for point_id, _ in encoded), default=1)
+    lengths = np.fromiter((len(text) for _, text in encoded), dtype=np.int64, count=len(encoded))
+    arrays = {
+        "ids": np.array([point_id for point_id, _ in encoded], dtype=f"S{width}"),
+        "offsets": np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+        "blob": np.frombuffer(b"".join(text for _, text in encoded), dtype=np.uint8),
+    }
+
+    layout, position = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "length": int(array.size), "offset": position}
+        position += array.nbytes + (-array.nbytes) % ALIGNMENT
+
+    header = json.dumps({"count": len(encoded), "id_width": width, "arrays": layout}).encode("utf-8")
+    data_start = len(MAGIC) + 8 + len(header)
+    data_start += (-data_start) % ALIGNMENT
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for array in arrays.values():
+            f.write(array.tobytes())
+            f.write(b"\0" * ((-array.nbytes) % ALIGNMENT))
+
+    # Atomic swap so running workers never map a half-written file
+    os.replace(tmp_path, path)
+
+
+class ChunkStore:
+    """Read-only view of a chunk store snapshot (reloaded when rewritten)"""
+
+    def __init__(self, path: str = None):
+        self.path = resolve_path(path or settings.CHUNK_STORE_PATH)
+        self.ids = np.zeros(0, dtype="S1")
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.blob = np.zeros(0, dtype=np.uint8)
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._warned = False
+
+        self._reload()
+
+    def __len__(self) -> int:
+        return int(self.ids.size)
+
+    def _reload(self):
+        """(Re)map the snapshot if it changed on disk"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return
+
+        if mtime == self._mtime:
+            return
+
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a chunk store: {self.path}")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+
+        data_start = len(MAGIC) + 8 + header_len
+        data_start += (-data_start) % ALIGNMENT
+
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            if spec["length"] == 0:
+                arrays[name] = np.zeros(0, dtype=spec["dtype"])
+            else:
+                arrays[name] = np.memmap(self.path, dtype=spec["dtype"], mode="r",
+                                         offset=data_start + spec["offset"], shape=(spec["length"],))
+
+        self.ids = arrays["ids"]
+        self.offsets = arrays["offsets"] if arrays["offsets"].size else np.zeros(1, dtype=np.int64)
+        self.blob = arrays["blob"]
+        self._mtime = mtime
+
+    def _maybe_reload(self):
+        """Pick up snapshots rewritten by the populate scripts"""
+        now = time.monotonic()
+        if now - self._checked_at >= settings.INDEX_VERSION_CHECK_INTERVAL:
+            self._checked_at = now
+            self._reload()
+
+    def get_many(self, point_ids: Sequence) -> List[Optional[str]]:
+        """Texts for several point ids (None where an id is not in the store)"""
+        self._maybe_reload()
+        if not len(self) or not point_ids:
+            return [None] * len(point_ids)
+
+        raw = [str(point_id).encode("utf-8") for point_id in point_ids]
+        keys = np.array(raw, dtype=self.ids.dtype)  # truncated to the id width
+        rows = np.minimum(np.searchsorted(self.ids, keys), len(self) - 1)
+        texts = []
+        for key, row in zip(raw, rows):
+            if self.ids[row] != key:
+                texts.append(None)
+                continue
+            start, end = self.offsets[row], self.offsets[row + 1]
+            texts.append(bytes(self.blob[start:end]).decode("utf-8"))
+        return texts
+
+    def hydrate(self, documents: List[Dict]):
+        """Fill in content (in place) for search results that came back without it"""
+        missing = [doc for doc in documents if not doc.get("content") and doc.get("id") is not None]
+        if not missing:
+            return
+
+        texts = self.get_many([doc["id"] for doc in missing])
+        for doc, text in zip(missing, texts):
+            doc["content"] = text or ""
+
+        if None in texts and not self._warned:
+            self._warned = True
+            print(f"Chunk store has no text for some results ({self.path}); "
+                  f"re-run a populate script or set LEAN_PAYLOADS=false")
+
+
+_chunk_store: Optional[ChunkStore] = None
+
+
+def get_chunk_store() -> ChunkStore:
+    """Process-wide chunk store"""
+    global _chunk_store
+    if _chunk_store is None:
+        _chunk_store = ChunkStore()
+    return _chunk_store
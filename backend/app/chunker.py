@@ -0,0 +1,247 @@
+"""
+Structure-aware markdown chunking
+Streams a doc line by line into blocks (headings, fenced code, paragraphs)
+and packs them into token-bounded chunks that never span a heading, so each
+chunk carries its heading path and a deep-link anchor
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+from app.context_packer import count_tokens
+
+FENCE = re.compile(r"^\s*(`{3,}|~{3,})(.*)$")
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+CUSTOM_ANCHOR = re.compile(r"\s*\{#([\w-]+)\}\s*$")
+SENTENCE_END = re.compile(r"(?<=[.!?:;])\s+")
+
+# Markdown that does not show up in rendered heading text
+INLINE_MARKUP = [
+    (re.compile(r"!?\[([^\]]*)\]\([^)]*\)"), r"\1"),  # links and images -> label
+    (re.compile(r"`([^`]*)`"), r"\1"),
+    (re.compile(r"(\*\*|__|\*|_|~~)(.+?)\1"), r"\2"),
+    (re.compile(r"<[^>]+>"), ""),
+]
+
+
+def heading_text(raw: str) -> str:
+    """Heading as rendered (inline markup and custom {#id} removed)"""
+    text = CUSTOM_ANCHOR.sub("", raw)
+    for pattern, replacement in INLINE_MARKUP:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+def heading_anchor(raw: str, used: Dict[str, int]) -> str:
+    """
+    Anchor id Docusaurus generates for a heading (github-slugger rules)
+
+    Args:
+        raw: Heading text as written
+        used: Anchors already used in this doc; duplicates get -1, -2, ...
+    """
+    custom = CUSTOM_ANCHOR.search(raw)
+    if custom:
+        slug = custom.group(1)
+    else:
+        slug = re.sub(r"[^\w\- ]", "", heading_text(raw).lower()).replace(" ", "-")
+
+    count = used.get(slug, 0)
+    used[slug] = count + 1
+    return slug if count == 0 else f"{slug}-{count}"
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[Tuple[str, str, int]]:
+    """
+    Split markdown into blocks without holding the whole doc
+
+    Yields:
+        (kind, text, heading level) with kind "frontmatter", "heading",
+        "code" or "text"; level is 0 except for headings
+    """
+    lines = iter(lines)
+    buffer: List[str] = []
+    fence = None
+    first = True
+
+    for line in lines:
+        line = line.rstrip("\n").rstrip("\r")
+
+        # Front matter: only a --- block on the very first line
+        if first:
+            first = False
+            if line.strip() == "---":
+                meta = []
+                for meta_line in lines:
+                    if meta_line.strip() == "---":
+                        break
+                    meta.append(meta_line.rstrip("\n"))
+                yield "frontmatter", "\n".join(meta), 0
+                continue
+
+        if fence is not None:
+            buffer.append(line)
+            if line.strip().startswith(fence) and not line.strip().strip(fence[0]):
+                yield "code", "\n".join(buffer), 0
+                buffer, fence = [], None
+            continue
+
+        opening = FENCE.match(line)
+        if opening:
+            if buffer:
+                yield "text", "\n".join(buffer), 0
+            buffer, fence = [line], opening.group(1)
+            continue
+
+        heading = HEADING.match(line)
+        if heading:
+            if buffer:
+                yield "text", "\n".join(buffer), 0
+                buffer = []
+            yield "heading", heading.group(2), len(heading.group(1))
+            continue
+
+        if not line.strip():
+            if buffer:
+                yield "text", "\n".join(buffer), 0
+                buffer = []
+            continue
+
+        buffer.append(line)
+
+    # An unterminated fence still counts as code
+    if buffer:
+        yield ("code" if fence else "text"), "\n".join(buffer), 0
+
+
+def _split_block(kind: str, text: str, max_tokens: int) -> Iterator[str]:
+    """Split a block larger than max_tokens (code by lines, prose by sentences, then words)"""
+    if kind == "code":
+        lines = text.split("\n")
+        opening, fence = lines[0], FENCE.match(lines[0]).group(1)
+        closed = len(lines) > 1 and lines[-1].strip().startswith(fence)
+        pieces, joiner = (lines[1:-1] if closed else lines[1:]), "\n"
+        # Each piece is re-fenced so it still renders as code
+        budget = max_tokens - count_tokens(opening) - count_tokens(fence)
+        wrap = lambda piece: f"{opening}\n{piece}\n{fence}"
+    else:
+        pieces, joiner = SENTENCE_END.split(text), " "
+        budget = max_tokens
+        wrap = lambda piece: piece
+
+    current: List[str] = []
+    current_tokens = 0
+    for piece in pieces:
+        tokens = count_tokens(piece)
+        if tokens > budget and kind != "code":
+            # A single run-on sentence: fall back to words
+            words = piece.split()
+            step = max(1, len(words) * budget // tokens)
+            sub_pieces = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        else:
+            sub_pieces = [piece]
+
+        for sub in sub_pieces:
+            sub_tokens = count_tokens(sub)
+            if current and current_tokens + sub_tokens > budget:
+                yield wrap(joiner.join(current))
+                current, current_tokens = [], 0
+            current.append(sub)
+            current_tokens += sub_tokens
+
+    if current:
+        yield wrap(joiner.join(current))
+
+
+def chunk_markdown(
+    lines: Iterable[str],
+    max_tokens: int = 512,
+    overlap_tokens: int = 64
+) -> Iterator[Dict]:
+    """
+    Chunk a markdown doc along its structure
+
+    Chunks end at every heading and hold whole blocks (a code block or
+    paragraph is only split when it alone exceeds max_tokens). Within a
+    section, trailing blocks up to overlap_tokens are repeated at the start
+    of the next chunk.
+
+    Args:
+        lines: Doc lines (e.g. an open file)
+        max_tokens: Upper bound on a chunk's token count
+        overlap_tokens: Context carried between chunks of one section
+
+    Yields:
+        {"title", "slug", "text", "heading_path", "anchor", "tokens"}; title
+        is the first H1 (or front matter title) seen so far, slug the front
+        matter slug ("" if none)
+    """
+    title = ""
+    slug = ""
+    titled_by_heading = False
+    path: List[Tuple[int, str]] = []
+    anchors: Dict[str, int] = {}
+    anchor = ""
+    blocks: List[Tuple[str, int]] = []  # (text, tokens) of the chunk being built
+    has_body = False
+
+    def flush():
+        text = "\n\n".join(text for text, _ in blocks)
+        return {
+            "title": title,
+            "slug": slug,
+            "text": text,
+            "heading_path": [heading for _, heading in path],
+            "anchor": anchor,
+            "tokens": count_tokens(text),
+        }
+
+    for kind, text, level in iter_blocks(lines):
+        if kind == "frontmatter":
+            match = re.search(r"^title:\s*(.+)$", text, re.MULTILINE)
+            if match:
+                title = match.group(1).strip().strip("'\"")
+            match = re.search(r"^slug:\s*(.+)$", text, re.MULTILINE)
+            if match:
+                slug = match.group(1).strip().strip("'\"")
+            continue
+
+        if kind == "heading":
+            if has_body:
+                yield flush()
+            blocks, has_body = [], False
+
+            # The first H1 is the page title, as Docusaurus renders it
+            name = heading_text(text)
+            if level == 1 and not titled_by_heading or not title:
+                title, titled_by_heading = name, level == 1
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, name))
+            anchor = heading_anchor(text, anchors)
+
+            markup = f"{'#' * level} {name}"
+            blocks.append((markup, count_tokens(markup)))
+            continue
+
+        tokens = count_tokens(text)
+        pieces = [(text, tokens)] if tokens <= max_tokens else [
+            (piece, count_tokens(piece)) for piece in _split_block(kind, text, max_tokens)
+        ]
+
+        for piece, piece_tokens in pieces:
+            if has_body and sum(t for _, t in blocks) + piece_tokens > max_tokens:
+                yield flush()
+                # Carry trailing blocks as overlap, as long as the new piece still fits
+                carried, carried_tokens = [], 0
+                for block in reversed(blocks):
+                    if carried_tokens + block[1] > overlap_tokens or \
+                            carried_tokens + block[1] + piece_tokens > max_tokens:
+                        break
+                    carried.insert(0, block)
+                    carried_tokens += block[1]
+                blocks = carried
+            blocks.append((piece, piece_tokens))
+            has_body = True
+
+    if has_body:
+        yield flush()
@@ -3,9 +3,12 @@ Configuration management using environment variables
 """
 
 import os
-from typing import List
+from pathlib import Path
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
+BACKEND_DIR = Path(__file__).parent.parent
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment"""
@@ -16,6 +19,17 @@ class Settings(BaseSettings):
     DEBUG: bool = False
     TEST_MODE: bool = False
 
+    # Test mode simulators (latencies are seconds or distributions, see app/latency.py)
+    TEST_LLM_LATENCY: str = "lognormal:0.3:0.3"  # time to first token
+    TEST_TOKEN_LATENCY: str = "0.002"  # per streamed word
+    TEST_EMBED_LATENCY: str = "lognormal:0.02:0.3"
+    TEST_SEARCH_LATENCY: str = "lognormal:0.01:0.3"
+    TEST_ERROR_RATE: float = 0.0  # fraction of LLM / search calls that fail
+    TEST_TIMEOUT_RATE: float = 0.0  # fraction that hang for TEST_TIMEOUT, then time out
+    TEST_TIMEOUT: float = 30.0  # seconds
+    TEST_SEED: Optional[int] = None  # fixed seed for reproducible runs
+    TEST_MODE_PROVIDERS: int = 1  # above 1, mock providers behind the failover router
+
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:3001"]
 
@@ -25,28 +39,146 @@ class Settings(BaseSettings):
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
     OPENAI_MAX_TOKENS: int = 1500
     OPENAI_TEMPERATURE: float = 0.7
+    OPENAI_BASE_URL: str = ""  # Override for proxies / local stub servers
+    OPENAI_MAX_CONCURRENCY: int = 32
 
     # Groq
     GROQ_API_KEY: str = ""
     GROQ_MODEL: str = "llama-3.3-70b-versatile"
+    GROQ_BASE_URL: str = ""  # Override for proxies / local stub servers
+    GROQ_MAX_CONCURRENCY: int = 32
 
     # Gemini
     GEMINI_API_KEY: str = ""
     GEMINI_MODEL: str = "gemini-1.5-flash"
+    GEMINI_BASE_URL: str = ""  # Override for proxies / local stub servers
+    GEMINI_MAX_CONCURRENCY: int = 32
+
+    # Provider router: every configured LLM provider, ordered by measured
+    # latency and error rate, with failover and per-provider circuit breakers
+    LLM_PROVIDERS: str = "groq,openai,gemini"  # priority order (ties, and before any latency is measured)
+    ROUTER_EWMA_ALPHA: float = 0.2  # weight of the newest sample in latency / error-rate averages
+    ROUTER_DEFAULT_LATENCY: float = 2.0  # seconds assumed for a provider not measured yet
+    ROUTER_ERROR_PENALTY: float = 4.0  # score = latency * (1 + penalty * error rate)
+    CIRCUIT_FAILURE_THRESHOLD: int = 3  # consecutive failures that open a circuit
+    CIRCUIT_COOLDOWN: float = 30.0  # seconds an open circuit waits before a half-open probe
+    HEDGE_REQUESTS: bool = False  # race the next provider once the first passes its p95
+    HEDGE_MIN_SAMPLES: int = 20  # latencies needed before a provider's p95 is trusted
+    LLM_MAX_RETRIES: int = 0  # SDK retries per chat call; the router fails over instead
+
+    # Admission control: per-client rate limit and a global, fairly queued
+    # cap on LLM calls (per process; 429 / 503 with Retry-After beyond them)
+    RATE_LIMIT_PER_MINUTE: float = 20.0  # chat requests per client IP; 0 disables
+    RATE_LIMIT_BURST: int = 10  # requests a client can make at once
+    RATE_LIMIT_MAX_CLIENTS: int = 10000  # buckets kept; least recently seen are forgotten
+    LLM_MAX_CONCURRENCY: int = 16  # LLM calls in flight across all providers
+    LLM_QUEUE_SIZE: int = 64  # requests waiting for an LLM slot before new ones get 503
+    LLM_QUEUE_TIMEOUT: float = 15.0  # seconds a request waits for an LLM slot before 503
+    TRUST_PROXY_HEADERS: bool = False  # key clients by X-Forwarded-For (behind Vercel or a reverse proxy)
+    WS_SEND_TIMEOUT: float = 10.0  # seconds a /ws/chat send may wait on a client that stopped reading
+    WS_MAX_PENDING_EVENTS: int = 100  # events queued for a /ws/chat client before it is closed (1008)
 
     # Qdrant
     QDRANT_URL: str = ""
     QDRANT_API_KEY: str = ""
     QDRANT_COLLECTION_NAME: str = "physical_ai_textbook"
     QDRANT_VECTOR_SIZE: int = 384  # sentence-transformers all-MiniLM-L6-v2 uses 384 dimensions
+    QDRANT_MAX_CONCURRENCY: int = 64
+
+    # Qdrant vector storage, applied by create_collection (see bench/quantization.py)
+    QDRANT_VECTOR_DATATYPE: str = "float32"  # "float32" or "float16" (half the memory for originals)
+    QDRANT_VECTORS_ON_DISK: bool = False  # originals memory-mapped from disk instead of held in RAM
+    QDRANT_QUANTIZATION: str = "none"  # "none", "scalar" (int8, 4x smaller) or "binary" (1 bit, 32x smaller)
+    QDRANT_QUANTIZATION_QUANTILE: float = 0.99  # scalar: value range kept, clipping outliers
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = True  # keep quantized vectors in RAM
+    QDRANT_QUANTIZATION_RESCORE: bool = True  # re-rank quantized candidates with the originals
+    QDRANT_QUANTIZATION_OVERSAMPLING: float = 2.0  # quantized candidates fetched per result before rescoring
+
+    # Vector backend: "qdrant" (remote cluster) or "local" (in-process snapshot)
+    VECTOR_BACKEND: str = "qdrant"
+    LOCAL_INDEX_PATH: str = "data/local_index.lidx"
+
+    # Shared HTTP connection pool (keep-alive) for provider clients
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_TIMEOUT: float = 60.0
+
+    # Collection version marker (bumped by the populate scripts)
+    INDEX_VERSION_PATH: str = "data/index_version"
+    INDEX_MANIFEST_PATH: str = "data/index_manifest.json"
+    INDEX_VERSION_CHECK_INTERVAL: float = 5.0  # seconds
+
+    # Embedding cache (in-memory LRU backed by append-only float32 files)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: str = "data/embedding_cache"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    EMBEDDING_CACHE_REFRESH_INTERVAL: float = 5.0  # seconds between scans for entries other workers wrote
+
+    # Response cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    RESPONSE_CACHE_TTL: int = 3600  # seconds
+    RESPONSE_CACHE_SEMANTIC: bool = False
+    RESPONSE_CACHE_SEMANTIC_THRESHOLD: float = 0.95  # cosine similarity
+
+    # Identical concurrent /api/chat/query requests share one pipeline run
+    COALESCE_REQUESTS: bool = True
 
     # Neon Postgres
     DATABASE_URL: str = ""
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 300  # seconds, Neon closes idle connections
+
+    # Write-behind conversation persistence
+    DB_WRITE_BATCH_SIZE: int = 100
+    DB_WRITE_FLUSH_INTERVAL: float = 1.0  # seconds
+    DB_WRITE_MAX_PENDING: int = 10000
+
+    # Conversation history
+    HISTORY_TURNS: int = 2  # previous exchanges sent to the LLM (0 = none)
+    HISTORY_PAGE_SIZE: int = 50
+    HISTORY_MAX_PAGE_SIZE: int = 200
+
+    # Observability
+    METRICS_ENABLED: bool = True
+    QUERY_LOG_SAMPLE_RATE: float = 0.1  # fraction of successful queries written to query_logs
 
     # RAG Settings
     TOP_K_RESULTS: int = 5
-    CHUNK_SIZE: int = 500
-    CHUNK_OVERLAP: int = 50
+    RETRIEVAL_MODE: str = "vector"  # "vector", "lexical" (BM25, no query embedding) or "hybrid" (RRF)
+    LEXICAL_INDEX_PATH: str = "data/lexical_index.bm25"
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    RRF_K: int = 60
+    HYBRID_CANDIDATES: int = 20  # results taken from each retriever before fusion
+    CHUNK_MAX_TOKENS: int = 512  # chunks also end at every markdown heading
+    CHUNK_OVERLAP_TOKENS: int = 64  # trailing blocks repeated between chunks of one section
+    SCOPED_SEARCH_MIN_SCORE: float = 0.3  # page/module-scoped vector searches with a weaker best match search the whole book
+
+    # Batch endpoint (/api/chat/batch)
+    BATCH_MAX_QUESTIONS: int = 500
+    BATCH_LLM_CONCURRENCY: int = 8  # completions in flight per batch
+
+    # Chunk text store: with lean payloads, vector payloads carry only
+    # citation fields and chunk text is read from a local memory-mapped file
+    # (which then has to ship with the deployment)
+    LEAN_PAYLOADS: bool = False
+    CHUNK_STORE_PATH: str = "data/chunk_store.chunks"
+
+    # Prompt context packing
+    CONTEXT_TOKEN_BUDGET: int = 2048  # estimated tokens of retrieved context per prompt
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8  # drop passages this much covered by better ones
+    CONTEXT_MIN_PASSAGE_TOKENS: int = 64  # smaller leftovers are dropped rather than truncated
+
+    # Ingestion pipeline (populate scripts)
+    INGEST_PARSE_WORKERS: int = 0  # 0 = one per CPU
+    INGEST_EMBED_BATCH_SIZE: int = 256
+    INGEST_UPLOAD_BATCH_SIZE: int = 64
+    INGEST_UPLOAD_PARALLEL: int = 1  # >1 spawns upload worker processes (worth it for large books)
+    INGEST_UPLOAD_MAX_RETRIES: int = 3
+    INGEST_QUEUE_SIZE: int = 2048  # chunks buffered between stages
 
     class Config:
         env_file = ".env"
@@ -55,3 +187,11 @@ class Settings(BaseSettings):
 
 # Global settings instance
 settings = Settings()
+
+
+def resolve_path(path: str) -> Path:
+    """Resolve a settings path relative to the backend directory"""
+    resolved = Path(path)
+    if not resolved.is_absolute():
+        resolved = BACKEND_DIR / resolved
+    return resolved
@@ -0,0 +1,190 @@
+"""
+Token-budgeted context assembly for prompts
+Retrieved chunks are merged where they overlap (adjacent chunks of a section
+share up to CHUNK_OVERLAP_TOKENS), near-duplicates are dropped, and the rest is
+fitted into CONTEXT_TOKEN_BUDGET using token counts stored at index time.
+Results without text (lean payloads) are filled in from the chunk store, best
+first, only as far as the budget can use them
+"""
+
+import re
+from typing import Dict, List, Set, Tuple
+from app.config import settings
+from app.metrics import PROMPT_CONTEXT_TOKENS
+
+TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Shortest suffix/prefix match treated as chunk overlap rather than coincidence
+MIN_OVERLAP_CHARS = 40
+SHINGLE_SIZE = 3
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate BPE token count (no tokenizer dependency)
+
+    Punctuation counts as one token and words as one token per four
+    characters, which tracks Llama/GPT tokenizers closely on English prose
+    and slightly overestimates on code.
+    """
+    return sum((len(piece) + 3) // 4 for piece in TOKEN_PIECES.findall(text))
+
+
+def _shingles(text: str) -> Set[str]:
+    words = text.lower().split()
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _overlap(head: str, tail: str) -> int:
+    """Length of the longest suffix of head that is a prefix of tail (0 if under MIN_OVERLAP_CHARS)"""
+    probe = tail[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+
+    start = head.find(probe)
+    while start != -1:
+        if tail.startswith(head[start:]):
+            return len(head) - start
+        start = head.find(probe, start + 1)
+    return 0
+
+
+def _merge(passage: Dict, other: Dict) -> bool:
+    """Merge other into passage if one contains or overlaps the other (same doc only)"""
+    if passage["source"] != other["source"]:
+        return False
+
+    text, other_text = passage["content"], other["content"]
+    if other_text in text:
+        return True
+    if text in other_text:
+        passage.update(content=other_text, tokens=other["tokens"])
+        return True
+
+    overlap = _overlap(text, other_text)
+    if overlap:
+        shared = other_text[:overlap]
+        passage["content"] = text + other_text[overlap:]
+    else:
+        overlap = _overlap(other_text, text)
+        if not overlap:
+            return False
+        shared = text[:overlap]
+        passage["content"] = other_text + text[overlap:]
+
+    passage["tokens"] += other["tokens"] - count_tokens(shared)
+    return True
+
+
+def pack_context(
+    documents: List[Dict],
+    budget: int = None,
+    dedup_threshold: float = None
+) -> List[Dict]:
+    """
+    Assemble retrieved documents into prompt passages
+
+    Args:
+        documents: Search results, best first (chapter, section, url, content,
+            and optionally file and tokens from the index payload); results
+            without content are hydrated from the chunk store by id
+        budget: Token budget for all passages (default CONTEXT_TOKEN_BUDGET)
+        dedup_threshold: Fraction of a passage's word shingles already covered
+            by a better passage above which it is dropped
+
+    Returns:
+        Passages best first: chapter, section, url, content, tokens
+    """
+    budget = budget if budget is not None else settings.CONTEXT_TOKEN_BUDGET
+    if dedup_threshold is None:
+        dedup_threshold = settings.CONTEXT_DEDUP_THRESHOLD
+
+    # Load text one budget's worth of documents at a time, and stop once
+    # the budget is full (merges and dedup can free room for more)
+    hydrated = 0
+    while True:
+        end, tokens = hydrated, 0
+        while end < len(documents) and tokens < budget:
+            tokens += documents[end].get("tokens") or 0
+            end += 1
+        if any(not doc.get("content") for doc in documents[hydrated:end]):
+            from app.chunk_store import get_chunk_store
+            get_chunk_store().hydrate(documents[hydrated:end])
+        hydrated = end
+
+        packed, remaining = _pack(documents[:hydrated], budget, dedup_threshold)
+        if hydrated >= len(documents) or remaining < settings.CONTEXT_MIN_PASSAGE_TOKENS:
+            break
+
+    PROMPT_CONTEXT_TOKENS.observe(budget - remaining)
+    return [{key: value for key, value in passage.items() if key != "source"} for passage in packed]
+
+
+def _pack(documents: List[Dict], budget: int, dedup_threshold: float) -> Tuple[List[Dict], int]:
+    """Merge, dedupe and fill; returns (passages, unused budget)"""
+    # Merge overlapping chunks of the same doc into the better-ranked one
+    passages: List[Dict] = []
+    for doc in documents:
+        content = doc.get("content", "")
+        if not content:
+            continue
+        candidate = {
+            "chapter": doc.get("chapter", "Unknown"),
+            "section": doc.get("section", "Unknown"),
+            "url": doc.get("url", "/"),
+            "source": doc.get("file") or doc.get("url", ""),
+            "content": content,
+            "tokens": doc.get("tokens") or count_tokens(content),
+        }
+        merged = False
+        for passage in passages:
+            if _merge(passage, candidate):
+                merged = True
+                break
+        if not merged:
+            passages.append(candidate)
+            continue
+
+        # A merge can bridge two passages that were separate before
+        changed = True
+        while changed:
+            changed = False
+            for i, passage in enumerate(passages):
+                for other in passages[i + 1:]:
+                    if _merge(passage, other):
+                        passages.remove(other)
+                        changed = True
+                        break
+                if changed:
+                    break
+
+    # Drop passages mostly covered by better-ranked ones (e.g. copied sections)
+    kept: List[Dict] = []
+    covered: Set[str] = set()
+    for passage in passages:
+        shingles = _shingles(passage["content"])
+        if shingles and len(shingles & covered) / len(shingles) >= dedup_threshold:
+            continue
+        covered |= shingles
+        kept.append(passage)
+
+    # Fill the budget in rank order
+    packed: List[Dict] = []
+    remaining = budget
+    for passage in kept:
+        header = count_tokens(f"[{passage['chapter']} - {passage['section']}]")
+        if passage["tokens"] + header <= remaining:
+            packed.append(passage)
+            remaining -= passage["tokens"] + header
+        elif remaining - header >= settings.CONTEXT_MIN_PASSAGE_TOKENS:
+            # Truncate at a word boundary to what is left of the budget
+            content, tokens = passage["content"], passage["tokens"]
+            while tokens > remaining - header:
+                content = content[:len(content) * (remaining - header) // (tokens + 1)].rsplit(" ", 1)[0]
+                tokens = count_tokens(content)
+            packed.append({**passage, "content": content, "tokens": tokens})
+            remaining -= tokens + header
+
+    return packed, remaining
@@ -3,7 +3,8 @@ Database models and connection for Neon Postgres
 """
 
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float
+from sqlalchemy import create_engine, make_url, Column, Integer, String, Text, DateTime, Float, Index
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
@@ -22,6 +23,11 @@ class Conversation(Base):
     context = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # Keyset pagination and "last N turns" reads walk this index
+    __table_args__ = (
+        Index("ix_conversations_session_created", "session_id", "created_at", "id"),
+    )
+
 
 class QueryLog(Base):
     """Query logs for analytics"""
@@ -35,16 +41,119 @@ class QueryLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
-# Database connection
+# Database connection (one pooled engine per process)
+_engine = None
+_SessionLocal = None
+_tables_created = False
+_async_engine = None
+
+
+def get_engine():
+    """Get the process-wide pooled engine (None if no database configured)"""
+    global _engine, _SessionLocal
+
+    if not settings.DATABASE_URL:
+        return None
+
+    if _engine is None:
+        _engine = create_engine(
+            settings.DATABASE_URL,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+        _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+
+    return _engine
+
+
+def init_database() -> bool:
+    """Create the engine and tables once (call at startup)"""
+    global _tables_created
+
+    engine = get_engine()
+    if engine is None:
+        return False
+
+    if not _tables_created:
+        Base.metadata.create_all(bind=engine)
+        # create_all skips indexes on tables that already exist
+        for index in Conversation.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+        _tables_created = True
+
+    return True
+
+
 def get_database():
-    """Get database session"""
+    """Get database session from the shared pool"""
+    if not init_database():
+        return None
+
+    return _SessionLocal()
+
+
+def async_database_url(url: str):
+    """
+    Map DATABASE_URL to its async driver (asyncpg / aiosqlite)
+
+    Returns:
+        (URL, connect_args); libpq-only query options such as sslmode are
+        translated for asyncpg
+    """
+    url = make_url(url)
+    connect_args = {}
+
+    if url.get_backend_name() == "postgresql":
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = sslmode
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+
+    return url, connect_args
+
+
+def get_async_engine():
+    """Get the process-wide async engine for reads on the request path (None if no database configured)"""
+    global _async_engine
+
     if not settings.DATABASE_URL:
         return None
 
-    engine = create_engine(settings.DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    if _async_engine is None:
+        url, connect_args = async_database_url(settings.DATABASE_URL)
+        _async_engine = create_async_engine(
+            url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+            connect_args=connect_args
+        )
+
+    return _async_engine
+
+
+async def dispose_async_database():
+    """Close the async engine's connections (call on shutdown)"""
+    global _async_engine
+
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+
 
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+def dispose_database():
+    """Close pooled connections (call on shutdown)"""
+    global _engine, _SessionLocal, _tables_created
 
-    return SessionLocal()
+    if _engine is not None:
+        _engine.dispose()
+    _engine = None
+    _SessionLocal = None
+    _tables_created = False
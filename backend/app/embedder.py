@@ -0,0 +1,161 @@
+"""
+Torch-free hashed n-gram embedder
+Signed feature hashing (the "hashing trick") over word unigrams, word
+bigrams and character n-grams, vectorised with NumPy across many texts.
+Hashes are FNV-1a, so vectors are identical in every process.
+"""
+
+import re
+from typing import List, Optional, Sequence
+import numpy as np
+from app.config import settings
+
+FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+FNV_PRIME = np.uint64(0x100000001B3)
+MAX_WORD_BYTES = 32
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._-][a-z0-9]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it
+its of on or so than that the their then there these this to was we what when where
+which while who why will with you your
+""".split())
+
+# Feature families hash into separate streams, with their own weights
+WORD, BIGRAM, CHAR = 1, 2, 3
+WEIGHTS = {WORD: 1.0, BIGRAM: 0.7, CHAR: 0.35}
+
+
+def _fnv1a_padded(flat: np.ndarray, starts: np.ndarray, lengths: np.ndarray, seed: int) -> np.ndarray:
+    """FNV-1a hash of many byte strings at once (column-wise over a padded view)"""
+    hashes = np.full(len(starts), FNV_OFFSET ^ np.uint64(seed), dtype=np.uint64)
+    if len(starts) == 0:
+        return hashes
+
+    width = int(lengths.max())
+    for col in range(width):
+        active = lengths > col
+        index = np.minimum(starts + col, len(flat) - 1)
+        mixed = (hashes ^ flat[index].astype(np.uint64)) * FNV_PRIME
+        hashes = np.where(active, mixed, hashes)
+
+    return hashes
+
+
+def _finalize(hashes: np.ndarray) -> np.ndarray:
+    """Avalanche step so low bits (bucket) and high bit (sign) are well mixed"""
+    hashes = hashes ^ (hashes >> np.uint64(33))
+    hashes = hashes * np.uint64(0xFF51AFD7ED558CCD)
+    return hashes ^ (hashes >> np.uint64(33))
+
+
+class HashingEmbedder:
+    """Deterministic bag of word and character n-gram embeddings"""
+
+    def __init__(self, dim: int = None, char_ngrams: Sequence[int] = (3, 4)):
+        self.dim = dim or settings.QDRANT_VECTOR_SIZE
+        self.char_ngrams = tuple(char_ngrams)
+        self.name = f"hashing-ngram-v1-{self.dim}"
+
+        stopwords = sorted(STOPWORDS)
+        stop_flat = np.frombuffer("".join(stopwords).encode(), dtype=np.uint8)
+        stop_lengths = np.array([len(w) for w in stopwords], dtype=np.int64)
+        stop_starts = np.concatenate([[0], np.cumsum(stop_lengths)[:-1]])
+        self._stopword_hashes = _fnv1a_padded(stop_flat, stop_starts, stop_lengths, WORD)
+
+    def tokenize(self, text: str) -> List[str]:
+        """Lowercased word tokens (keeps identifiers like rclpy.node, cmd_vel)"""
+        return TOKEN_PATTERN.findall(text.lower())
+
+    def embed(self, text: str) -> List[float]:
+        """Embed one text"""
+        return self.embed_batch([text])[0].tolist()
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed many texts at once
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            (len(texts), dim) float32 matrix of L2-normalised rows
+        """
+        n = len(texts)
+        if n == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        # Tokenize (the only per-text Python work); tokens are ASCII by construction
+        tokenized = [self.tokenize(text) for text in texts]
+        words = [token for tokens in tokenized for token in tokens]
+        if not words:
+            return np.zeros((n, self.dim), dtype=np.float32)
+
+        owner = np.repeat(np.arange(n), [len(tokens) for tokens in tokenized])
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+
+        # Words wrapped in boundary markers, e.g. "<node>", laid out end to end
+        flat = np.frombuffer(("<" + "><".join(words) + ">").encode(), dtype=np.uint8)
+        starts = np.concatenate([[0], np.cumsum(lengths + 2)[:-1]])
+
+        feature_hashes = []
+        feature_owners = []
+        feature_weights = []
+
+        # Word unigrams (stopwords skipped), hashed without the markers
+        word_hashes = _fnv1a_padded(flat, starts + 1, np.minimum(lengths, MAX_WORD_BYTES), WORD)
+        content = ~np.isin(word_hashes, self._stopword_hashes)
+        feature_hashes.append(word_hashes[content])
+        feature_owners.append(owner[content])
+        feature_weights.append(np.full(int(content.sum()), WEIGHTS[WORD]))
+
+        # Word bigrams within the same text
+        same_text = owner[1:] == owner[:-1]
+        bigram_hashes = (word_hashes[:-1] * FNV_PRIME) ^ word_hashes[1:] ^ np.uint64(BIGRAM)
+        feature_hashes.append(bigram_hashes[same_text])
+        feature_owners.append(owner[1:][same_text])
+        feature_weights.append(np.full(int(same_text.sum()), WEIGHTS[BIGRAM]))
+
+        # Character n-grams at every position of every marked word
+        ends = starts + lengths + 2
+        word_of_byte = np.repeat(np.arange(len(words)), lengths + 2)
+        positions = np.arange(len(flat))
+        for size in self.char_ngrams:
+            valid = positions + size <= ends[word_of_byte]
+            gram_starts = positions[valid]
+            gram_hashes = _fnv1a_padded(
+                flat, gram_starts, np.full(len(gram_starts), size), CHAR * 16 + size
+            )
+            feature_hashes.append(gram_hashes)
+            feature_owners.append(owner[word_of_byte[valid]])
+            feature_weights.append(np.full(len(gram_starts), WEIGHTS[CHAR]))
+
+        hashes = _finalize(np.concatenate(feature_hashes))
+        rows = np.concatenate(feature_owners)
+        weights = np.concatenate(feature_weights)
+
+        buckets = (hashes % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+
+        matrix = np.bincount(
+            rows * self.dim + buckets,
+            weights=signs * weights,
+            minlength=n * self.dim
+        ).reshape(n, self.dim).astype(np.float32)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+_embedder: Optional[HashingEmbedder] = None
+
+
+def get_embedder() -> HashingEmbedder:
+    """Get the shared embedder used for both indexing and querying"""
+    global _embedder
+
+    if _embedder is None:
+        _embedder = HashingEmbedder()
+    return _embedder
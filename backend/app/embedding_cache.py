@@ -0,0 +1,267 @@
+"""
+Persistent embedding cache
+In-memory LRU keyed by (model name, text hash), spilled to an append-only,
+memory-mapped float32 file per model so entries survive restarts and can
+be read by every worker process
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings, resolve_path
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are still single writes
+    fcntl = None
+
+KEY_BYTES = 16
+
+
+def record_dtype(dim: int) -> np.dtype:
+    """On-disk record layout: 16-byte key followed by dim float32 values"""
+    return np.dtype([("key", f"V{KEY_BYTES}"), ("vector", "<f4", (dim,))])
+
+
+class _ModelStore:
+    """Append-only record file for one (model, dimension) pair"""
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self.dtype = record_dtype(dim)
+        self.rows: Dict[bytes, int] = {}
+        self.records: Optional[np.ndarray] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+
+    def refresh(self):
+        """Map records appended (by any process) since the last refresh"""
+        try:
+            size = self.path.stat().st_size
+        except OSError:
+            return
+
+        # Ignore a trailing partial record from an in-progress append
+        size -= size % self.dtype.itemsize
+        if size <= self._mapped_size:
+            return
+
+        with open(self.path, "rb") as f:
+            new_mmap = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+        records = np.frombuffer(new_mmap, dtype=self.dtype)
+        start = self._mapped_size // self.dtype.itemsize
+        for row in range(start, len(records)):
+            self.rows.setdefault(records["key"][row].tobytes(), row)
+
+        self.records = records
+        if self._mmap is not None:
+            old_mmap, self._mmap = self._mmap, None
+            try:
+                old_mmap.close()
+            except BufferError:
+                pass  # Still referenced by an in-flight read; released on GC
+        self._mmap = new_mmap
+        self._mapped_size = size
+
+    def read(self, key: bytes) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        return np.array(self.records["vector"][row], dtype=np.float32)
+
+    def append(self, items: Sequence[Tuple[bytes, np.ndarray]]):
+        """Append records with a single write under an exclusive lock, then map them"""
+        records = np.empty(len(items), dtype=self.dtype)
+        for i, (key, vector) in enumerate(items):
+            records[i]["key"] = np.frombuffer(key, dtype=f"V{KEY_BYTES}")[0]
+            records[i]["vector"] = vector
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, records.tobytes())
+        finally:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+        # Index the new rows now rather than at the next rate-limited rescan,
+        # so entries evicted from memory meanwhile are found instead of re-appended
+        self.refresh()
+
+
+class EmbeddingCache:
+    """Two-tier (memory LRU + mmapped file) cache of embedding vectors"""
+
+    def __init__(self, cache_dir: str = None, max_entries: int = None, persist: bool = True):
+        self.cache_dir = resolve_path(cache_dir or settings.EMBEDDING_CACHE_DIR)
+        self.max_entries = max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES
+        self.persist = persist
+
+        self._memory: "OrderedDict[Tuple[str, bytes], np.ndarray]" = OrderedDict()
+        self._stores: Dict[Tuple[str, int], _ModelStore] = {}
+        self._refreshed_at: Dict[str, float] = {}  # model -> last scan of the cache directory
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        """Hash of (model name, text)"""
+        return hashlib.sha256(f"{model}\x00{text}".encode()).digest()[:KEY_BYTES]
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        Look up a cached embedding
+
+        Args:
+            model: Embedding model name
+            text: Embedded text
+
+        Returns:
+            Embedding vector or None
+        """
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Look up several texts; misses are returned as None"""
+        results: List[Optional[List[float]]] = []
+        stores = None
+
+        with self._lock:
+            for text in texts:
+                key = self.make_key(model, text)
+                vector = self._memory.get((model, key))
+
+                if vector is not None:
+                    self._memory.move_to_end((model, key))
+                    self.hits += 1
+                else:
+                    if stores is None:
+                        stores = self._refreshed_stores(model)
+                    vector = self._read_disk(stores, key)
+                    if vector is not None:
+                        self._remember(model, key, vector)
+                        self.disk_hits += 1
+                    else:
+                        self.misses += 1
+
+                results.append(vector.tolist() if vector is not None else None)
+
+        return results
+
+    def put(self, model: str, text: str, vector: Sequence[float]):
+        """Store one embedding"""
+        self.put_many(model, [text], [vector])
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store embeddings in memory and append new ones to disk"""
+        if not texts:
+            return
+
+        with self._lock:
+            stores = self._refreshed_stores(model)
+            new_items = []
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(model, text)
+                array = np.asarray(vector, dtype=np.float32)
+                if (model, key) not in self._memory and self._read_disk(stores, key) is None:
+                    new_items.append((key, array))
+                self._remember(model, key, array)
+
+            if new_items and self.persist:
+                try:
+                    self._store(model, len(new_items[0][1])).append(new_items)
+                except OSError as e:
+                    # Read-only filesystem (e.g. serverless): keep memory tier only
+                    print(f"Embedding cache disk write failed, using memory only: {e}")
+                    self.persist = False
+
+    def stats(self) -> Dict:
+        """Hit/miss counters"""
+        return {
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+    def _remember(self, model: str, key: bytes, vector: np.ndarray):
+        self._memory[(model, key)] = vector
+        self._memory.move_to_end((model, key))
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _read_disk(stores: List[_ModelStore], key: bytes) -> Optional[np.ndarray]:
+        for store in stores:
+            vector = store.read(key)
+            if vector is not None:
+                return vector
+        return None
+
+    def _refreshed_stores(self, model: str) -> List[_ModelStore]:
+        """
+        Every on-disk store for a model (one file per dimension)
+
+        The directory is scanned and records appended by other processes are
+        mapped at most every EMBEDDING_CACHE_REFRESH_INTERVAL seconds, not on
+        every miss; until then, other workers' new entries are just misses.
+        """
+        if not self.persist:
+            return []
+
+        stores = [store for (store_model, _), store in self._stores.items() if store_model == model]
+        now = time.monotonic()
+        if now - self._refreshed_at.get(model, float("-inf")) < settings.EMBEDDING_CACHE_REFRESH_INTERVAL:
+            return stores
+        self._refreshed_at[model] = now
+
+        prefix = self._slug(model) + "-"
+        if self.cache_dir.is_dir():
+            for path in self.cache_dir.glob(f"{prefix}*.f32"):
+                dim = path.stem[len(prefix):]
+                if dim.isdigit():
+                    self._store(model, int(dim))
+
+        stores = [store for (store_model, _), store in self._stores.items() if store_model == model]
+        for store in stores:
+            store.refresh()
+        return stores
+
+    def _store(self, model: str, dim: int) -> _ModelStore:
+        if (model, dim) not in self._stores:
+            path = self.cache_dir / f"{self._slug(model)}-{dim}.f32"
+            self._stores[(model, dim)] = _ModelStore(path, dim)
+        return self._stores[(model, dim)]
+
+    @staticmethod
+    def _slug(model: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.]+", "_", model)
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Get the process-wide embedding cache (None when disabled)"""
+    global _embedding_cache
+
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
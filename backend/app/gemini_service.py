@@ -0,0 +1,161 @@
+"""
+Gemini service for chat completions
+Calls the Generative Language REST API on the shared connection pool
+"""
+
+import json
+from typing import AsyncIterator, List, Dict
+from app.config import settings
+from app.context_packer import pack_context
+from app.http_client import get_http_client, get_limiter
+from app.local_embeddings import LocalEmbeddingMixin
+from app.metrics import PROVIDER_ERRORS, stage
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com"
+
+
+class GeminiService(LocalEmbeddingMixin):
+    """Service for interacting with Google Gemini"""
+
+    def __init__(self):
+        """Point at the Gemini REST API (or a stub via GEMINI_BASE_URL)"""
+        self.client = get_http_client()
+        self.base_url = (settings.GEMINI_BASE_URL or GEMINI_API_URL).rstrip("/")
+        self.model = settings.GEMINI_MODEL
+        self.headers = {"x-goog-api-key": settings.GEMINI_API_KEY}
+        self.limiter = get_limiter("gemini")
+        self.init_local_embeddings()
+
+    def _build_request(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> Dict:
+        """Build a generateContent body (system instruction, history, then context + question)"""
+        # Merge, dedupe and fit retrieved documents into the token budget
+        context_text = "\n\n".join([
+            f"[{passage['chapter']} - {passage['section']}]\n{passage['content']}"
+            for passage in pack_context(context_documents)
+        ])
+
+        system_prompt = """You are an expert teaching assistant for a Physical AI and Humanoid Robotics course.
+
+Your role is to help students learn about:
+- ROS 2 (Robot Operating System)
+- Gazebo and Unity simulation
+- NVIDIA Isaac platform
+- Vision-Language-Action systems
+
+Guidelines:
+1. Answer using the provided course context
+2. If the context doesn't contain relevant information, say so honestly
+3. Be clear, concise, and educational
+4. Keep responses 3-5 sentences unless more detail is needed"""
+
+        # Gemini names the assistant role "model"
+        contents = [
+            {
+                "role": "model" if message["role"] == "assistant" else "user",
+                "parts": [{"text": message["content"]}]
+            }
+            for message in conversation_history or []
+        ]
+        contents.append({
+            "role": "user",
+            "parts": [{"text": f"COURSE CONTEXT:\n{context_text}\n\nQUESTION: {user_message}"}]
+        })
+
+        return {
+            "systemInstruction": {"parts": [{"text": system_prompt}]},
+            "contents": contents,
+            "generationConfig": {"temperature": 0.7, "maxOutputTokens": 500, "topP": 0.9},
+        }
+
+    @staticmethod
+    def _text(payload: Dict) -> str:
+        """Concatenated text parts of the first candidate"""
+        candidates = payload.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    async def complete_chat(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        Generate chat response using Gemini with RAG context
+
+        Args:
+            user_message: User's question
+            context_documents: Retrieved documents from Qdrant
+            conversation_history: Previous messages (optional)
+
+        Returns:
+            AI-generated response (raises on provider errors)
+        """
+        with stage("prompt"):
+            body = self._build_request(user_message, context_documents, conversation_history)
+
+        try:
+            with stage("llm", provider="gemini"):
+                async with self.limiter:
+                    response = await self.client.post(
+                        f"{self.base_url}/v1beta/models/{self.model}:generateContent",
+                        json=body,
+                        headers=self.headers
+                    )
+                    response.raise_for_status()
+        except Exception:
+            PROVIDER_ERRORS.inc(provider="gemini", operation="chat")
+            raise
+
+        return self._text(response.json())
+
+    async def stream_chat(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream chat response deltas using server-sent events
+
+        Args:
+            user_message: User's question
+            context_documents: Retrieved documents from Qdrant
+            conversation_history: Previous messages (optional)
+
+        Yields:
+            Text deltas as they are generated (raises on provider errors)
+        """
+        with stage("prompt"):
+            body = self._build_request(user_message, context_documents, conversation_history)
+
+        try:
+            with stage("llm", provider="gemini"):
+                async with self.limiter:
+                    async with self.client.stream(
+                        "POST",
+                        f"{self.base_url}/v1beta/models/{self.model}:streamGenerateContent",
+                        params={"alt": "sse"},
+                        json=body,
+                        headers=self.headers
+                    ) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            delta = self._text(json.loads(line[len("data:"):]))
+                            if delta:
+                                yield delta
+        except Exception:
+            PROVIDER_ERRORS.inc(provider="gemini", operation="chat")
+            raise
+
+    generate_chat_response = complete_chat
+    stream_chat_response = stream_chat
@@ -3,40 +3,42 @@ Groq AI service for chat completions
 Uses Llama models via Groq API
 """
 
-from typing import List, Dict
-from groq import Groq
+from typing import AsyncIterator, List, Dict
+from groq import AsyncGroq
 from app.config import settings
+from app.context_packer import pack_context
+from app.http_client import get_http_client, get_limiter
+from app.local_embeddings import LocalEmbeddingMixin
+from app.metrics import PROVIDER_ERRORS, stage
+from app.models import ERROR_RESPONSE
 
 
-class GroqService:
+class GroqService(LocalEmbeddingMixin):
     """Service for interacting with Groq AI"""
 
     def __init__(self):
-        """Initialize Groq client"""
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        """Initialize async Groq client on the shared connection pool"""
+        self.client = AsyncGroq(
+            api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL or None,
+            http_client=get_http_client(),
+            max_retries=settings.LLM_MAX_RETRIES
+        )
         self.model = settings.GROQ_MODEL
+        self.limiter = get_limiter("groq")
+        self.init_local_embeddings()
 
-    async def generate_chat_response(
+    def _build_messages(
         self,
         user_message: str,
         context_documents: List[Dict[str, str]],
         conversation_history: List[Dict[str, str]] = None
-    ) -> str:
-        """
-        Generate chat response using Groq with RAG context
-
-        Args:
-            user_message: User's question
-            context_documents: Retrieved documents from Qdrant
-            conversation_history: Previous conversation (optional)
-
-        Returns:
-            AI-generated response
-        """
-        # Build context from retrieved documents
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages (static system prompt, history, then context + question)"""
+        # Merge, dedupe and fit retrieved documents into the token budget
         context_text = "\n\n".join([
-            f"[Source: {doc['chapter']} - {doc['section']}]\n{doc['content']}"
-            for doc in context_documents[:3]  # Top 3 most relevant
+            f"[Source: {passage['chapter']} - {passage['section']}]\n{passage['content']}"
+            for passage in pack_context(context_documents)
         ])
 
         # System prompt for educational assistant
@@ -74,49 +76,113 @@ Please answer the student's question based on the context provided. If the conte
 
         messages.append({"role": "user", "content": user_prompt})
 
+        return messages
+
+    async def complete_chat(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """Chat completion that raises on provider errors (the router fails over on them)"""
+        with stage("prompt"):
+            messages = self._build_messages(user_message, context_documents, conversation_history)
+
         try:
             # Call Groq API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500,
-                top_p=0.9
-            )
+            with stage("llm", provider="groq"):
+                async with self.limiter:
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=500,
+                        top_p=0.9
+                    )
+        except Exception:
+            PROVIDER_ERRORS.inc(provider="groq", operation="chat")
+            raise
+
+        return response.choices[0].message.content
+
+    async def stream_chat(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """Streaming completion that raises on provider errors"""
+        with stage("prompt"):
+            messages = self._build_messages(user_message, context_documents, conversation_history)
+
+        try:
+            with stage("llm", provider="groq"):
+                async with self.limiter:
+                    stream = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=500,
+                        top_p=0.9,
+                        stream=True
+                    )
+
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            yield delta
+        except Exception:
+            PROVIDER_ERRORS.inc(provider="groq", operation="chat")
+            raise
+
+    async def generate_chat_response(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        Generate chat response using Groq with RAG context
 
-            return response.choices[0].message.content
+        Args:
+            user_message: User's question
+            context_documents: Retrieved documents from Qdrant
+            conversation_history: Previous conversation (optional)
 
+        Returns:
+            AI-generated response
+        """
+        try:
+            return await self.complete_chat(user_message, context_documents, conversation_history)
         except Exception as e:
             print(f"Groq API error: {e}")
-            return f"I encountered an error processing your question. Please try again or rephrase your question."
+            return ERROR_RESPONSE
 
-    async def generate_embedding(self, text: str) -> List[float]:
+    async def stream_chat_response(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
         """
-        Generate embedding for text using simple hash-based approach
-        Note: Groq doesn't provide embeddings, so we use deterministic hash
+        Stream chat response deltas using Groq's streaming mode
+
+        Args:
+            user_message: User's question
+            context_documents: Retrieved documents from Qdrant
+            conversation_history: Previous conversation (optional)
+
+        Yields:
+            Text deltas as they are generated
         """
-        import hashlib
-
-        dim = 384  # Must match Qdrant vector size
-
-        # Create multiple hashes for better distribution
-        embeddings = []
-        for i in range(dim // 32):
-            hash_input = f"{text}_{i}"
-            hash_obj = hashlib.sha256(hash_input.encode())
-            hash_bytes = hash_obj.digest()
-
-            for j in range(0, len(hash_bytes), 4):
-                if len(embeddings) >= dim:
-                    break
-                # Convert 4 bytes to float
-                val = int.from_bytes(hash_bytes[j:j+4], 'big')
-                # Normalize to [-1, 1]
-                normalized = (val / (2**32)) * 2 - 1
-                embeddings.append(normalized)
-
-        # Ensure exact dimension
-        while len(embeddings) < dim:
-            embeddings.append(0.0)
-
-        return embeddings[:dim]
+        started = False
+        try:
+            async for delta in self.stream_chat(user_message, context_documents, conversation_history):
+                started = True
+                yield delta
+        except Exception as e:
+            print(f"Groq API error: {e}")
+            if not started:
+                yield ERROR_RESPONSE
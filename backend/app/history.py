@@ -0,0 +1,130 @@
+"""
+Conversation history reads over the async database driver
+Keyset-paginated pages for the history endpoint, and the last few turns of
+a session for multi-turn prompts
+"""
+
+import base64
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, tuple_
+from app.database import Conversation, get_async_engine
+from app.metrics import stage
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor pointing after (created_at, id)"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor (ValueError if malformed)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid history cursor")
+
+
+async def fetch_history_page(
+    session_id: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of a session's conversation, oldest first
+
+    Args:
+        session_id: Session to read
+        limit: Maximum rows in the page
+        cursor: next_cursor from the previous page (optional)
+
+    Returns:
+        (messages, next_cursor); next_cursor is None on the last page
+    """
+    engine = get_async_engine()
+    if engine is None:
+        return [], None
+
+    query = select(
+        Conversation.id, Conversation.user_message, Conversation.ai_response, Conversation.created_at
+    ).where(Conversation.session_id == session_id)
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.where(tuple_(Conversation.created_at, Conversation.id) > tuple_(created_at, row_id))
+
+    # One extra row tells us whether there is a next page
+    query = query.order_by(Conversation.created_at, Conversation.id).limit(limit + 1)
+
+    async with engine.connect() as conn:
+        rows = (await conn.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    messages = [
+        {
+            "user_message": row.user_message,
+            "ai_response": row.ai_response,
+            "created_at": row.created_at.isoformat()
+        }
+        for row in rows
+    ]
+    return messages, next_cursor
+
+
+async def fetch_recent_turns(
+    session_id: str,
+    turns: int,
+    unflushed: List[Dict] = None
+) -> List[Dict[str, str]]:
+    """
+    Last turns of a session as chat messages for the LLM
+
+    Args:
+        session_id: Session to read
+        turns: Number of question/answer exchanges
+        unflushed: Conversation rows still in the write-behind queue; taken
+            before the read so a row is either here or already committed
+
+    Returns:
+        [{"role": "user", ...}, {"role": "assistant", ...}, ...] oldest first
+    """
+    engine = get_async_engine()
+    if engine is None or turns <= 0:
+        return []
+
+    pending = [row for row in (unflushed or []) if row.get("session_id") == session_id]
+
+    with stage("history"):
+        query = select(
+            Conversation.user_message, Conversation.ai_response, Conversation.created_at
+        ).where(
+            Conversation.session_id == session_id
+        ).order_by(
+            Conversation.created_at.desc(), Conversation.id.desc()
+        ).limit(turns)
+
+        async with engine.connect() as conn:
+            rows = (await conn.execute(query)).all()
+
+    # Merge queued rows, skipping any committed while we were reading
+    seen = {(row.created_at, row.user_message) for row in rows}
+    exchanges = [(row.created_at, row.user_message, row.ai_response) for row in rows]
+    exchanges += [
+        (row["created_at"], row["user_message"], row["ai_response"])
+        for row in pending
+        if (row["created_at"], row["user_message"]) not in seen
+    ]
+    exchanges = sorted(exchanges, key=lambda exchange: exchange[0])[-turns:]
+
+    messages = []
+    for _, user_message, ai_response in exchanges:
+        messages.append({"role": "user", "content": user_message})
+        messages.append({"role": "assistant", "content": ai_response})
+    return messages
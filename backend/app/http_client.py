@@ -0,0 +1,69 @@
+"""
+Shared async HTTP connection pool and per-provider concurrency limits
+"""
+
+import asyncio
+from typing import Dict, Optional
+import httpx
+from app.config import settings
+
+_http_client: Optional[httpx.AsyncClient] = None
+_limiters: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_http_limits() -> httpx.Limits:
+    """Connection pool limits shared by every provider client"""
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the process-wide async HTTP client
+
+    Groq and OpenAI SDK clients (and Gemini's REST calls) are built on top
+    of this client so that they reuse the same pool of keep-alive connections.
+    """
+    global _http_client
+
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=get_http_limits(),
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=10.0)
+        )
+
+    return _http_client
+
+
+def get_limiter(provider: str) -> asyncio.Semaphore:
+    """
+    Get the concurrency limiter for a provider
+
+    Args:
+        provider: "groq", "openai", "gemini" or "qdrant"
+
+    Returns:
+        Semaphore capping in-flight calls to that provider
+    """
+    if provider not in _limiters:
+        caps = {
+            "groq": settings.GROQ_MAX_CONCURRENCY,
+            "openai": settings.OPENAI_MAX_CONCURRENCY,
+            "gemini": settings.GEMINI_MAX_CONCURRENCY,
+            "qdrant": settings.QDRANT_MAX_CONCURRENCY,
+        }
+        _limiters[provider] = asyncio.Semaphore(caps.get(provider, settings.HTTP_MAX_CONNECTIONS))
+
+    return _limiters[provider]
+
+
+async def close_http_client():
+    """Close the shared HTTP client (call on shutdown)"""
+    global _http_client
+
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
@@ -0,0 +1,30 @@
+"""
+Collection version token shared between the API and the populate scripts
+Repopulating the collection bumps the version, which invalidates caches
+"""
+
+import time
+import uuid
+from app.config import settings, resolve_path
+
+
+def read_index_version() -> str:
+    """Read the current collection version ("0" if never indexed)"""
+    try:
+        return resolve_path(settings.INDEX_VERSION_PATH).read_text(encoding="utf-8").strip() or "0"
+    except OSError:
+        return "0"
+
+
+def bump_index_version() -> str:
+    """Record that the collection was (re)populated and return the new version"""
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    path = resolve_path(settings.INDEX_VERSION_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write then rename so readers never see a partial version
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(version, encoding="utf-8")
+    tmp_path.replace(path)
+
+    return version
@@ -0,0 +1,426 @@
+"""
+Incremental, content-addressed indexing of the textbook docs
+A manifest maps (file, chunk hash) -> point id; re-runs only embed and
+upsert new or changed chunks and delete points whose chunks disappeared
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Tuple
+from app.config import settings, resolve_path
+from app.chunker import chunk_markdown
+from app.chunk_store import write_store as write_chunk_store
+from app.lexical_index import write_snapshot as write_lexical_snapshot
+from app.search_scope import chapter_for_path, page_for_doc
+
+DOCS_DIR = Path(__file__).parent.parent.parent / "frontend" / "docs"
+
+# Namespace for deterministic point ids (uuid5 of file + chunk hash)
+POINT_ID_NAMESPACE = uuid.UUID("6f1c1f5e-3f7a-4d1e-9a57-2b8c3f0d9e11")
+
+# 2: payloads carry token counts, 3: markdown-structure chunks, 4: page routes
+MANIFEST_FORMAT = 4
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash of a chunk"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def point_id_for(rel_path: str, content_hash: str) -> str:
+    """Deterministic UUID point id derived from file and chunk content"""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{rel_path}\x00{content_hash}"))
+
+
+def load_doc_chunks(md_file: Path, docs_dir: Path = DOCS_DIR) -> List[Dict]:
+    """Stream one doc through the markdown chunker into point records (id, text, payload)"""
+    rel_path = md_file.relative_to(docs_dir).as_posix()
+    chapter = chapter_for_path(str(md_file))
+
+    records = []
+    with open(md_file, "r", encoding="utf-8") as f:
+        for chunk in chunk_markdown(f, settings.CHUNK_MAX_TOKENS, settings.CHUNK_OVERLAP_TOKENS):
+            headings = chunk["heading_path"]
+            page_url = page_for_doc(rel_path, chunk["slug"])
+            title = chunk["title"] or "Untitled"
+            # Chunks under the page title link to the page, deeper ones to their heading
+            in_subsection = len(headings) > 1 or (headings and headings[0] != title)
+            section = f"{title} > {headings[-1]}" if in_subsection else title
+            url = f"{page_url}#{chunk['anchor']}" if in_subsection else page_url
+
+            # The heading path is embedded with the chunk so sections keep their topic
+            text = "\n".join([" > ".join(headings), chunk["text"]]) if headings else chunk["text"]
+            content_hash = chunk_hash(text)
+            records.append({
+                "id": point_id_for(rel_path, content_hash),
+                "hash": content_hash,
+                "text": text,
+                "payload": {
+                    "chapter": chapter,
+                    "section": section,
+                    "url": url,
+                    "page": page_url,
+                    "content": chunk["text"],
+                    "file": rel_path,
+                    "chunk_hash": content_hash,
+                    "tokens": chunk["tokens"],
+                    "heading_path": headings,
+                    "anchor": chunk["anchor"] if in_subsection else ""
+                }
+            })
+    return records
+
+
+def vector_payload(payload: Dict) -> Dict:
+    """Payload stored with the vector (without the chunk text when LEAN_PAYLOADS is on)"""
+    if not settings.LEAN_PAYLOADS:
+        return payload
+    return {key: value for key, value in payload.items() if key != "content"}
+
+
+class IndexManifest:
+    """On-disk map of file -> {chunk hash: point id} for one collection"""
+
+    def __init__(self, path: str = None, embedding_model: str = ""):
+        self.path = resolve_path(path or settings.INDEX_MANIFEST_PATH)
+        self.header = {
+            "format": MANIFEST_FORMAT,
+            "backend": settings.VECTOR_BACKEND,
+            "collection": settings.QDRANT_COLLECTION_NAME,
+            "embedding_model": embedding_model,
+            "lean_payloads": settings.LEAN_PAYLOADS,
+        }
+        self.files: Dict[str, Dict[str, str]] = {}
+
+    def load(self) -> bool:
+        """Load the manifest; False if missing or built for another collection/model"""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+
+        if any(data.get(key) != value for key, value in self.header.items()):
+            print("Manifest was built for a different collection, embedding model or payload layout, ignoring it")
+            return False
+
+        self.files = data.get("files", {})
+        return True
+
+    def save(self):
+        """Write atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({**self.header, "files": self.files}, indent=1), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def point_ids(self) -> set:
+        return {pid for chunks in self.files.values() for pid in chunks.values()}
+
+
+class StageStats:
+    """Chunks processed and busy time of one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.chunks = 0
+        self.busy = 0.0
+
+    def rate(self) -> float:
+        return self.chunks / self.busy if self.busy else 0.0
+
+    def as_dict(self) -> Dict:
+        return {"chunks": self.chunks, "busy_seconds": round(self.busy, 3),
+                "chunks_per_second": round(self.rate(), 1)}
+
+
+def format_stage_report(counts: Dict) -> str:
+    """Per-stage throughput table for an IncrementalIndexer.run() result"""
+    lines = [f"Pipeline: {counts['seconds']:.2f}s wall"]
+    for name, stage in counts["stages"].items():
+        lines.append(
+            f"  {name:<7}{stage['chunks']:>8} chunks {stage['busy_seconds']:>8.2f}s busy "
+            f"{stage['chunks_per_second']:>10.1f} chunks/s"
+        )
+    return "\n".join(lines)
+
+
+def _parse_file(md_file: Path, docs_dir: Path) -> Tuple[List[Dict], float]:
+    """Process pool entry point: chunk one file and time it"""
+    start = time.perf_counter()
+    records = load_doc_chunks(md_file, docs_dir)
+    return records, time.perf_counter() - start
+
+
+def _put_blocking(q: queue.Queue, item, closed: threading.Event):
+    """Put into a bounded queue, giving up once the pipeline is torn down"""
+    while not closed.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+class IncrementalIndexer:
+    """
+    Diff docs against the manifest and apply only the changes
+
+    Runs as a three-stage pipeline joined by bounded queues:
+    parse/chunk (process pool) -> embed (large batches) -> upload
+    (the vector service's parallel upload path with retries).
+    """
+
+    def __init__(
+        self,
+        vector_service,
+        embed: Callable[[List[str]], Awaitable[List[List[float]]]],
+        embedding_model: str,
+        manifest_path: str = None,
+        embed_batch_size: int = None,
+        lexical_path: str = None,
+        chunk_store_path: str = None
+    ):
+        """
+        Args:
+            vector_service: QdrantService-compatible service
+            embed: Async function embedding a batch of texts
+            embedding_model: Name recorded in the manifest
+            manifest_path: Override for INDEX_MANIFEST_PATH
+            embed_batch_size: Override for INGEST_EMBED_BATCH_SIZE
+            lexical_path: Override for LEXICAL_INDEX_PATH
+            chunk_store_path: Override for CHUNK_STORE_PATH
+        """
+        self.vector_service = vector_service
+        self.embed = embed
+        self.manifest = IndexManifest(manifest_path, embedding_model)
+        self.embed_batch_size = embed_batch_size or settings.INGEST_EMBED_BATCH_SIZE
+        self.lexical_path = resolve_path(lexical_path or settings.LEXICAL_INDEX_PATH)
+        self.chunk_store_path = resolve_path(chunk_store_path or settings.CHUNK_STORE_PATH)
+        self.stats: Dict[str, StageStats] = {}
+        self._chunks: Dict[str, List[Dict]] = {}
+
+    async def run(self, docs_dir: Path = DOCS_DIR, full: bool = False) -> Dict:
+        """
+        Bring the collection in line with the docs
+
+        New points are upserted before stale ones are deleted, so the
+        collection is never empty while re-indexing.
+
+        Returns:
+            Counts of files, chunks, upserted, deleted and unchanged points,
+            plus per-stage throughput
+        """
+        await self.vector_service.create_collection()
+
+        have_manifest = not full and self.manifest.load()
+        info = await self.vector_service.get_collection_info()
+        if have_manifest and not info.get("vector_count"):
+            print("Collection is empty, ignoring manifest")
+            have_manifest = False
+            self.manifest.files = {}
+
+        md_files = sorted(docs_dir.rglob("*.md"))
+        print(f"Found {len(md_files)} markdown files")
+
+        self.stats = {name: StageStats(name) for name in ("parse", "embed", "upload")}
+        self._chunks = {}
+        embed_queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        upload_queue = queue.Queue(maxsize=max(1, settings.INGEST_QUEUE_SIZE // self.embed_batch_size))
+        closed = threading.Event()
+
+        # Embed and upload only new or changed chunks, overlapping all three stages
+        started = time.perf_counter()
+        parse_task = asyncio.create_task(self._parse_stage(md_files, docs_dir, embed_queue))
+        tasks = [
+            parse_task,
+            asyncio.create_task(self._embed_stage(embed_queue, upload_queue, closed)),
+            asyncio.create_task(self._upload_stage(upload_queue, closed)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            closed.set()
+            for task in tasks:
+                task.cancel()
+            raise
+        elapsed = time.perf_counter() - started
+
+        new_files, unchanged = parse_task.result()
+
+        # Then delete points whose chunks disappeared
+        keep = {pid for chunks in new_files.values() for pid in chunks.values()}
+        if have_manifest:
+            stale = self.manifest.point_ids() - keep
+        else:
+            # No trustworthy manifest: reconcile against what the collection holds
+            stale = set(await self.vector_service.list_point_ids()) - keep
+
+        if stale:
+            await self.vector_service.delete_points(sorted(stale, key=str))
+
+        self.manifest.files = new_files
+        self.manifest.save()
+
+        # Rebuild the BM25 index and chunk store over every current chunk (cheap next to embedding)
+        snapshots_missing = not self.lexical_path.exists() or (
+            settings.LEAN_PAYLOADS and not self.chunk_store_path.exists()
+        )
+        if stale or self.stats["upload"].chunks or full or snapshots_missing:
+            records = [record for rel_path in sorted(self._chunks) for record in self._chunks[rel_path]]
+            unique = list({record["id"]: record for record in records}.values())
+            write_lexical_snapshot(
+                self.lexical_path,
+                [record["id"] for record in unique],
+                [record["text"] for record in unique],
+                [vector_payload(record["payload"]) for record in unique]
+            )
+            print(f"Wrote lexical index: {len(unique)} chunks -> {self.lexical_path}")
+
+            if settings.LEAN_PAYLOADS:
+                write_chunk_store(
+                    self.chunk_store_path,
+                    [record["id"] for record in unique],
+                    [record["payload"]["content"] for record in unique]
+                )
+                print(f"Wrote chunk store: {len(unique)} chunks -> {self.chunk_store_path}")
+
+        return {
+            "files": len(md_files),
+            "chunks": len(keep),
+            "upserted": self.stats["upload"].chunks,
+            "deleted": len(stale),
+            "unchanged": unchanged,
+            "seconds": round(elapsed, 3),
+            "stages": {name: stage.as_dict() for name, stage in self.stats.items()},
+        }
+
+    async def _parse_stage(self, md_files: List[Path], docs_dir: Path, embed_queue: asyncio.Queue):
+        """Chunk files in a process pool and queue the new or changed chunks"""
+        loop = asyncio.get_running_loop()
+        stats = self.stats["parse"]
+        workers = settings.INGEST_PARSE_WORKERS or os.cpu_count() or 1
+        workers = max(1, min(workers, len(md_files)))
+
+        new_files: Dict[str, Dict[str, str]] = {}
+        seen = set()
+        unchanged = 0
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            remaining = iter(md_files)
+            in_flight = {}
+
+            while True:
+                # Keep a small window of files in flight so results can't pile up
+                while len(in_flight) < workers * 2:
+                    md_file = next(remaining, None)
+                    if md_file is None:
+                        break
+                    future = loop.run_in_executor(pool, _parse_file, md_file, docs_dir)
+                    in_flight[future] = md_file
+
+                if not in_flight:
+                    break
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    md_file = in_flight.pop(future)
+                    records, parse_seconds = future.result()
+                    stats.chunks += len(records)
+                    stats.busy += parse_seconds / workers
+
+                    rel_path = md_file.relative_to(docs_dir).as_posix()
+                    known = self.manifest.files.get(rel_path, {})
+                    new_files[rel_path] = {record["hash"]: record["id"] for record in records}
+                    self._chunks[rel_path] = records
+
+                    changed = [
+                        record for record in records
+                        if known.get(record["hash"]) != record["id"] and record["id"] not in seen
+                    ]
+                    seen.update(record["id"] for record in changed)
+                    unchanged += len(records) - len(changed)
+
+                    if changed:
+                        print(f"  {rel_path}: {len(changed)} new/changed of {len(records)} chunks")
+                    for record in changed:
+                        await embed_queue.put(record)
+
+        await embed_queue.put(None)
+        return new_files, unchanged
+
+    async def _embed_stage(self, embed_queue: asyncio.Queue, upload_queue: queue.Queue, closed: threading.Event):
+        """Embed queued chunks in large batches and hand them to the uploader"""
+        stats = self.stats["embed"]
+        finished = False
+
+        while not finished:
+            batch = []
+            while len(batch) < self.embed_batch_size:
+                record = await embed_queue.get()
+                if record is None:
+                    finished = True
+                    break
+                batch.append(record)
+
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            embeddings = await self.embed([record["text"] for record in batch])
+            stats.busy += time.perf_counter() - start
+            stats.chunks += len(batch)
+
+            points = [
+                (record["id"], embedding, vector_payload(record["payload"]))
+                for record, embedding in zip(batch, embeddings)
+            ]
+            try:
+                upload_queue.put_nowait(points)
+            except queue.Full:
+                # Back-pressure: wait for the uploader without blocking the event loop
+                await asyncio.to_thread(_put_blocking, upload_queue, points, closed)
+
+        await asyncio.to_thread(_put_blocking, upload_queue, None, closed)
+
+    async def _upload_stage(self, upload_queue: queue.Queue, closed: threading.Event):
+        """Stream embedded points into the vector service's parallel upload"""
+        stats = self.stats["upload"]
+        waited = 0.0
+
+        def points():
+            nonlocal waited
+            while True:
+                start = time.perf_counter()
+                batch = None
+                while batch is None and not closed.is_set():
+                    try:
+                        batch = upload_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if batch is None:
+                        break
+                waited += time.perf_counter() - start
+                if not batch:
+                    return
+                stats.chunks += len(batch)
+                yield from batch
+
+        start = time.perf_counter()
+        ok = await self.vector_service.upload_points(
+            points(),
+            batch_size=settings.INGEST_UPLOAD_BATCH_SIZE,
+            parallel=settings.INGEST_UPLOAD_PARALLEL,
+            max_retries=settings.INGEST_UPLOAD_MAX_RETRIES
+        )
+        stats.busy = max(0.0, time.perf_counter() - start - waited)
+
+        if not ok or closed.is_set():
+            raise RuntimeError("Upload failed; manifest not updated")
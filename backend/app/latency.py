@@ -0,0 +1,46 @@
+"""
+Latency distributions for simulated providers
+Shared by the test mode simulators and the benchmark stub server; kept free
+of app settings so benchmarks can import it before configuring the app
+"""
+
+import math
+import random
+from typing import Callable, Union
+
+LATENCY_HELP = ("seconds, or a distribution: fixed:S, uniform:LO:HI, exp:MEAN, "
+                "normal:MEAN:SD, lognormal:MEDIAN:SIGMA")
+
+
+def parse_latency(spec: Union[float, str], rng: random.Random = None) -> Callable[[], float]:
+    """
+    Turn a latency spec into a sampler returning seconds
+
+    Args:
+        spec: A number of seconds, or "kind:params" (see LATENCY_HELP)
+        rng: Random source (seeded for reproducible runs)
+
+    Returns:
+        Function drawing one non-negative latency
+    """
+    rng = rng or random.Random()
+    if isinstance(spec, (int, float)):
+        return lambda: float(spec)
+
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        value = float(kind)
+        return lambda: value
+
+    args = [float(p) for p in params.split(":")]
+    if kind == "fixed":
+        return lambda: args[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(args[0], args[1])
+    if kind == "exp":
+        return lambda: rng.expovariate(1 / args[0]) if args[0] > 0 else 0.0
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(args[0], args[1]))
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(math.log(args[0]), args[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r} ({LATENCY_HELP})")
@@ -0,0 +1,267 @@
+"""
+In-memory BM25 lexical index over the indexed chunks
+Postings are stored as flat NumPy arrays (CSR by term) in a snapshot written
+by the populate scripts, so keyword questions can be answered without a
+query embedding, or fused with vector results (reciprocal rank fusion)
+"""
+
+import json
+import os
+import struct
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings, resolve_path
+from app.embedder import STOPWORDS, TOKEN_PATTERN
+from app.search_scope import payload_matches
+
+MAGIC = b"BM25IDX1"
+ALIGNMENT = 64
+
+# Payload fields kept in the snapshot (enough to build citations and prompts, and to scope searches)
+PAYLOAD_FIELDS = ("chapter", "section", "url", "page", "content", "file", "tokens")
+
+
+def lexical_terms(text: str) -> List[str]:
+    """Index terms: lowercased tokens minus stopwords, plus the parts of identifiers (cmd_vel -> cmd, vel)"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if any(sep in token for sep in "._-"):
+            terms.extend(part for part in token.replace(".", " ").replace("_", " ").replace("-", " ").split()
+                         if part not in STOPWORDS)
+    return terms
+
+
+def write_snapshot(path, ids: List, texts: Sequence[str], payloads: List[Dict]):
+    """
+    Build the inverted index and write it atomically
+
+    Layout: magic, header length (uint64), JSON header (ids, payloads, vocab,
+    array offsets), then 64-byte aligned arrays: term offsets (int64),
+    posting doc numbers (int32), term frequencies (float32), doc lengths (float32).
+    """
+    vocab: Dict[str, int] = {}
+    term_ids, doc_ids, freqs = [], [], []
+    doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+    for doc, text in enumerate(texts):
+        terms = lexical_terms(text)
+        doc_lengths[doc] = len(terms)
+        for term, count in Counter(terms).items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            doc_ids.append(doc)
+            freqs.append(count)
+
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    order = np.lexsort((np.asarray(doc_ids, dtype=np.int64), term_ids))
+    arrays = {
+        "offsets": np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(vocab)))]).astype(np.int64),
+        "docs": np.asarray(doc_ids, dtype=np.int32)[order],
+        "freqs": np.asarray(freqs, dtype=np.float32)[order],
+        "doc_lengths": doc_lengths,
+    }
+
+    # Lay the arrays out after the header, each aligned for memory mapping
+    layout, position = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "length": int(array.size), "offset": position}
+        position += array.nbytes + (-array.nbytes) % ALIGNMENT
+
+    header = json.dumps({
+        "count": len(texts),
+        "avg_length": float(doc_lengths.mean()) if len(texts) else 0.0,
+        "ids": ids,
+        "payloads": [{field: payload.get(field, "") for field in PAYLOAD_FIELDS} for payload in payloads],
+        "vocab": sorted(vocab, key=vocab.get),
+        "arrays": layout,
+    }).encode("utf-8")
+
+    data_start = len(MAGIC) + 8 + len(header)
+    data_start += (-data_start) % ALIGNMENT
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, array in arrays.items():
+            f.write(array.tobytes())
+            f.write(b"\0" * ((-array.nbytes) % ALIGNMENT))
+
+    # Atomic swap so running workers never map a half-written file
+    os.replace(tmp_path, path)
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], top_k: int, k: int = None) -> List[Dict]:
+    """
+    Fuse ranked result lists by reciprocal rank
+
+    The returned score is the fused score scaled to [0, 1], where 1 means
+    ranked first in every list.
+    """
+    k = k or settings.RRF_K
+    fused: Dict = {}
+    docs: Dict = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            fused[doc["id"]] = fused.get(doc["id"], 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(doc["id"], doc)
+
+    best = len(result_lists) / (k + 1)
+    ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [{**docs[doc_id], "score": fused[doc_id] / best} for doc_id in ranked]
+
+
+class LexicalIndex:
+    """BM25 search over a memory-mapped snapshot"""
+
+    def __init__(self, path: str = None):
+        """Load the snapshot (if any); search returns [] until one exists"""
+        self.path = resolve_path(path or settings.LEXICAL_INDEX_PATH)
+        self.k1 = settings.BM25_K1
+        self.b = settings.BM25_B
+
+        self.ids: List = []
+        self.payloads: List[Dict] = []
+        self.vocab: Dict[str, int] = {}
+        self._scopes: Dict[Tuple, np.ndarray] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+        self._reload()
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.ids)
+
+    def _reload(self):
+        """(Re)load the snapshot if it changed on disk"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return
+
+        if mtime == self._mtime:
+            return
+
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a lexical index snapshot: {self.path}")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+
+        data_start = len(MAGIC) + 8 + header_len
+        data_start += (-data_start) % ALIGNMENT
+
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            if spec["length"] == 0:
+                arrays[name] = np.zeros(0, dtype=spec["dtype"])
+            else:
+                arrays[name] = np.memmap(self.path, dtype=spec["dtype"], mode="r",
+                                         offset=data_start + spec["offset"], shape=(spec["length"],))
+
+        self.ids = header["ids"]
+        self.payloads = header["payloads"]
+        self.vocab = {term: i for i, term in enumerate(header["vocab"])}
+        self.avg_length = header["avg_length"] or 1.0
+        self.offsets = arrays["offsets"]
+        self.docs = arrays["docs"]
+        self.freqs = arrays["freqs"]
+        self.doc_lengths = arrays["doc_lengths"]
+
+        count = len(self.ids)
+        doc_freq = np.diff(self.offsets).astype(np.float64)
+        self.idf = np.log1p((count - doc_freq + 0.5) / (doc_freq + 0.5))
+        # Per-document length normalisation, precomputed once
+        self._length_norm = self.k1 * (1 - self.b + self.b * np.asarray(self.doc_lengths) / self.avg_length)
+        self._scopes = {}
+        self._mtime = mtime
+
+    def _maybe_reload(self):
+        """Pick up snapshots rewritten by the populate scripts"""
+        now = time.monotonic()
+        if now - self._checked_at >= settings.INDEX_VERSION_CHECK_INTERVAL:
+            self._checked_at = now
+            self._reload()
+
+    def _scope_mask(self, filters: Dict[str, str]) -> np.ndarray:
+        """Documents whose payload matches a scope filter (non-empty scopes cached until reload)"""
+        key = tuple(sorted(filters.items()))
+        mask = self._scopes.get(key)
+        if mask is None:
+            mask = np.fromiter((payload_matches(payload, filters) for payload in self.payloads),
+                               dtype=bool, count=len(self.payloads))
+            if mask.any():
+                self._scopes[key] = mask
+        return mask
+
+    def search(self, query_text: str, top_k: int = None, filters: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """
+        BM25 search
+
+        Args:
+            query_text: Raw query text
+            top_k: Number of results (default from settings)
+            filters: Payload values results must match (e.g. {"page": ...})
+
+        Returns:
+            Results in the same shape as QdrantService.search_similar; the
+            score is BM25 divided by its upper bound for this query (0-1)
+        """
+        if top_k is None:
+            top_k = settings.TOP_K_RESULTS
+
+        self._maybe_reload()
+        terms = {self.vocab[term] for term in lexical_terms(query_text) if term in self.vocab}
+        if not terms or not self.ids:
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float64)
+        for term in terms:
+            start, end = self.offsets[term], self.offsets[term + 1]
+            docs = self.docs[start:end]
+            freqs = self.freqs[start:end]
+            scores[docs] += self.idf[term] * freqs * (self.k1 + 1) / (freqs + self._length_norm[docs])
+        if filters:
+            scores[~self._scope_mask(filters)] = 0.0
+
+        matched = int(np.count_nonzero(scores))
+        k = min(top_k, matched)
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])][:k]
+
+        # Upper bound: every query term at saturation (tf -> infinity)
+        bound = float(sum(self.idf[term] for term in terms)) * (self.k1 + 1) or 1.0
+
+        return [
+            {
+                "id": self.ids[row],
+                "score": min(1.0, float(scores[row]) / bound),
+                "chapter": self.payloads[row].get("chapter", "Unknown"),
+                "section": self.payloads[row].get("section", "Unknown"),
+                "url": self.payloads[row].get("url", "/"),
+                "content": self.payloads[row].get("content", ""),
+                "file": self.payloads[row].get("file", ""),
+                "tokens": self.payloads[row].get("tokens")
+            }
+            for row in top
+        ]
+
+
+_lexical_index: Optional[LexicalIndex] = None
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Get the shared lexical index"""
+    global _lexical_index
+
+    if _lexical_index is None:
+        _lexical_index = LexicalIndex()
+    return _lexical_index
@@ -0,0 +1,64 @@
+"""
+Query embeddings with the local hashed n-gram embedder
+Shared by the providers without an embedding API (Groq, Gemini): they embed
+with the same embedder as populate_simple.py, so one index serves them all
+"""
+
+from typing import List
+from app.embedder import get_embedder
+from app.embedding_cache import get_embedding_cache
+from app.metrics import CACHE_REQUESTS, stage
+
+
+class LocalEmbeddingMixin:
+    """generate_embedding / generate_embeddings_batch on the local embedder, through the embedding cache"""
+
+    def init_local_embeddings(self):
+        """Attach the shared embedder and embedding cache (call from __init__)"""
+        self.embedding_cache = get_embedding_cache()
+        self.embedder = get_embedder()
+
+    async def generate_embedding(self, text: str) -> List[float]:
+        """Generate embedding for text with the local hashed n-gram embedder"""
+        with stage("embed", provider="local"):
+            if self.embedding_cache:
+                cached = self.embedding_cache.get(self.embedder.name, text)
+                CACHE_REQUESTS.inc(cache="embedding", result="miss" if cached is None else "hit")
+                if cached is not None:
+                    return cached
+
+            embedding = self.embedder.embed(text)
+            if self.embedding_cache:
+                self.embedding_cache.put(self.embedder.name, text, embedding)
+
+        return embedding
+
+    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for multiple texts in one vectorised pass
+
+        Args:
+            texts: List of texts to embed
+
+        Returns:
+            List of embedding vectors
+        """
+        with stage("embed", provider="local"):
+            if not self.embedding_cache:
+                return self.embedder.embed_batch(texts).tolist()
+
+            # Only embed texts that are not cached yet
+            embeddings = self.embedding_cache.get_many(self.embedder.name, texts)
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            CACHE_REQUESTS.inc(len(texts) - len(missing), cache="embedding", result="hit")
+            CACHE_REQUESTS.inc(len(missing), cache="embedding", result="miss")
+
+            if missing:
+                new_embeddings = self.embedder.embed_batch([texts[i] for i in missing]).tolist()
+                self.embedding_cache.put_many(
+                    self.embedder.name, [texts[i] for i in missing], new_embeddings
+                )
+                for i, embedding in zip(missing, new_embeddings):
+                    embeddings[i] = embedding
+
+        return embeddings
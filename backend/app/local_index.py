@@ -0,0 +1,379 @@
+"""
+In-process vector index, a drop-in replacement for QdrantService
+Holds an L2-normalised float32 matrix (memory-mapped from a snapshot file)
+plus a payload table and answers top-k with one matmul + argpartition
+"""
+
+import asyncio
+import json
+import os
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.config import settings, resolve_path
+from app.metrics import PROVIDER_ERRORS, stage
+from app.search_scope import payload_matches
+
+MAGIC = b"LIDX0001"
+ALIGNMENT = 64
+
+
+def write_snapshot(path, ids: List, payloads: List[Dict], matrix: np.ndarray):
+    """
+    Write an index snapshot
+
+    Layout: magic, header length (uint64), JSON header (ids, payloads, shape),
+    padding to a 64-byte boundary, then the float32 matrix in row-major order.
+    """
+    header = json.dumps({
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "ids": ids,
+        "payloads": payloads,
+    }).encode("utf-8")
+
+    offset = len(MAGIC) + 8 + len(header)
+    padding = (-offset) % ALIGNMENT
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(b"\0" * padding)
+        f.write(np.ascontiguousarray(matrix, dtype="<f4").tobytes())
+
+    # Atomic swap so running workers never map a half-written file
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path) -> Tuple[List, List[Dict], np.ndarray]:
+    """Load a snapshot; the matrix is memory-mapped read-only"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a local index snapshot: {path}")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+
+    offset = len(MAGIC) + 8 + header_len
+    offset += (-offset) % ALIGNMENT
+
+    if header["count"] == 0:
+        matrix = np.zeros((0, header["dim"]), dtype=np.float32)
+    else:
+        matrix = np.memmap(path, dtype="<f4", mode="r", offset=offset,
+                           shape=(header["count"], header["dim"]))
+
+    return header["ids"], header["payloads"], matrix
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """L2-normalise rows so a dot product is cosine similarity"""
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalIndexService:
+    """QdrantService-compatible vector search over a local snapshot file"""
+
+    def __init__(self, path: str = None):
+        """Load the snapshot (if any) for the configured collection"""
+        self.path = resolve_path(path or settings.LOCAL_INDEX_PATH)
+        self.collection_name = settings.QDRANT_COLLECTION_NAME
+        self.vector_size = settings.QDRANT_VECTOR_SIZE
+
+        self.ids: List = []
+        self.payloads: List[Dict] = []
+        self.matrix = np.zeros((0, self.vector_size), dtype=np.float32)
+        self._rows: Dict = {}
+        self._scopes: Dict[Tuple, np.ndarray] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+        self._reload()
+
+    def _reload(self):
+        """(Re)load the snapshot if it changed on disk"""
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            return
+
+        if mtime == self._mtime:
+            return
+
+        self.ids, self.payloads, self.matrix = load_snapshot(self.path)
+        self._rows = {vid: row for row, vid in enumerate(self.ids)}
+        self._scopes = {}
+        self._mtime = mtime
+        if self.matrix.shape[0]:
+            self.vector_size = self.matrix.shape[1]
+
+    def _maybe_reload(self):
+        """Pick up snapshots rewritten by the populate scripts"""
+        now = time.monotonic()
+        if now - self._checked_at >= settings.INDEX_VERSION_CHECK_INTERVAL:
+            self._checked_at = now
+            self._reload()
+
+    def _scope_rows(self, filters: Optional[Dict[str, str]]) -> Optional[np.ndarray]:
+        """
+        Rows whose payload matches a scope filter (None when unscoped)
+
+        Non-empty scopes are kept until the next reload, the local
+        counterpart of Qdrant's payload indexes; unknown pages are not cached.
+        """
+        if not filters:
+            return None
+        key = tuple(sorted(filters.items()))
+        rows = self._scopes.get(key)
+        if rows is None:
+            rows = np.array(
+                [row for row, payload in enumerate(self.payloads) if payload_matches(payload, filters)],
+                dtype=np.int64
+            )
+            if rows.size:
+                self._scopes[key] = rows
+        return rows
+
+    async def create_collection(self):
+        """Create an empty snapshot if none exists"""
+        if self.path.exists():
+            print(f"✓ Local index already exists: {self.path}")
+            return
+
+        write_snapshot(self.path, [], [], np.zeros((0, self.vector_size), dtype=np.float32))
+        self._reload()
+        print(f"✓ Created local index: {self.path}")
+
+    async def insert_embedding(
+        self,
+        vector_id: str,
+        embedding: List[float],
+        metadata: Dict[str, str]
+    ) -> bool:
+        """Insert single embedding into the local index"""
+        return await self.insert_embeddings_batch([vector_id], [embedding], [metadata])
+
+    async def insert_embeddings_batch(
+        self,
+        vector_ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, str]]
+    ) -> bool:
+        """
+        Upsert embeddings and rewrite the snapshot
+
+        Args:
+            vector_ids: List of unique identifiers
+            embeddings: List of embedding vectors
+            metadatas: List of metadata dicts
+
+        Returns:
+            Success status
+        """
+        try:
+            self._reload()
+            new_rows = normalize_rows(embeddings)
+            matrix = np.array(self.matrix, dtype=np.float32).reshape(-1, new_rows.shape[1])
+            ids = list(self.ids)
+            payloads = list(self.payloads)
+            rows = dict(self._rows)
+            appended = []
+
+            for vid, row, meta in zip(vector_ids, new_rows, metadatas):
+                if vid in rows:
+                    matrix[rows[vid]] = row
+                    payloads[rows[vid]] = meta
+                else:
+                    rows[vid] = len(ids)
+                    appended.append(row)
+                    ids.append(vid)
+                    payloads.append(meta)
+
+            if appended:
+                matrix = np.vstack([matrix, np.stack(appended)])
+
+            # Release the memory map before replacing the file (required on Windows)
+            self.matrix = matrix
+            write_snapshot(self.path, ids, payloads, matrix)
+            self._mtime = None
+            self._reload()
+
+            print(f"✓ Inserted {len(vector_ids)} embeddings")
+            return True
+
+        except Exception as e:
+            print(f"Error inserting batch: {e}")
+            self._mtime = None
+            self._reload()
+            return False
+
+    async def upload_points(
+        self,
+        points: Iterable[Tuple],
+        batch_size: int = 64,
+        parallel: int = 1,
+        max_retries: int = 3
+    ) -> bool:
+        """Collect streamed (id, embedding, metadata) points and upsert them in one snapshot rewrite"""
+        collected = await asyncio.to_thread(list, points)
+        if not collected:
+            return True
+        vector_ids, embeddings, metadatas = zip(*collected)
+        return await self.insert_embeddings_batch(list(vector_ids), list(embeddings), list(metadatas))
+
+    async def delete_points(self, vector_ids: List) -> bool:
+        """Delete points by id and rewrite the snapshot"""
+        try:
+            self._reload()
+            drop = set(vector_ids)
+            keep = [row for row, vid in enumerate(self.ids) if vid not in drop]
+
+            matrix = np.array(self.matrix[keep], dtype=np.float32).reshape(-1, self.vector_size)
+            ids = [self.ids[row] for row in keep]
+            payloads = [self.payloads[row] for row in keep]
+
+            self.matrix = matrix
+            write_snapshot(self.path, ids, payloads, matrix)
+            self._mtime = None
+            self._reload()
+
+            print(f"✓ Deleted {len(drop)} points")
+            return True
+
+        except Exception as e:
+            print(f"Error deleting points: {e}")
+            self._mtime = None
+            self._reload()
+            return False
+
+    async def list_point_ids(self) -> List:
+        """List every point id in the index"""
+        self._reload()
+        return list(self.ids)
+
+    async def search_similar(
+        self,
+        query_embedding: List[float],
+        top_k: int = None,
+        filters: Optional[Dict[str, str]] = None
+    ) -> List[Dict]:
+        """
+        Search for similar documents
+
+        Args:
+            query_embedding: Query vector
+            top_k: Number of results (default from settings)
+            filters: Payload values results must match (e.g. {"page": ...})
+
+        Returns:
+            List of similar documents with metadata and scores
+        """
+        if top_k is None:
+            top_k = settings.TOP_K_RESULTS
+
+        self._maybe_reload()
+        count = self.matrix.shape[0]
+        if count == 0:
+            return []
+
+        try:
+            with stage("search", provider="local"):
+                rows = self._scope_rows(filters)
+                if rows is None:
+                    return self._top_results(self.matrix @ normalize_rows(query_embedding)[0], top_k)
+                if not rows.size:
+                    return []
+                # Only the scope's rows are scored
+                scores = self.matrix[rows] @ normalize_rows(query_embedding)[0]
+                return self._top_results(scores, top_k, rows)
+
+        except Exception as e:
+            print(f"Error searching: {e}")
+            PROVIDER_ERRORS.inc(provider="local", operation="search")
+            return []
+
+    async def search_similar_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = None,
+        filters: Optional[List[Optional[Dict[str, str]]]] = None
+    ) -> List[List[Dict]]:
+        """
+        Search for several queries with one matrix product
+
+        Args:
+            query_embeddings: Query vectors
+            top_k: Number of results per query (default from settings)
+            filters: Per-query payload filters (None entries are unscoped)
+
+        Returns:
+            One result list per query, in order
+        """
+        if top_k is None:
+            top_k = settings.TOP_K_RESULTS
+
+        self._maybe_reload()
+        if self.matrix.shape[0] == 0 or not query_embeddings:
+            return [[] for _ in query_embeddings]
+
+        try:
+            with stage("search", provider="local"):
+                # (points, queries) similarity matrix
+                scores = self.matrix @ normalize_rows(query_embeddings).T
+                results = []
+                for j in range(scores.shape[1]):
+                    rows = self._scope_rows(filters[j] if filters else None)
+                    if rows is None:
+                        results.append(self._top_results(scores[:, j], top_k))
+                    else:
+                        results.append(self._top_results(scores[rows, j], top_k, rows) if rows.size else [])
+                return results
+
+        except Exception as e:
+            print(f"Error searching: {e}")
+            PROVIDER_ERRORS.inc(provider="local", operation="search")
+            return [[] for _ in query_embeddings]
+
+    def _top_results(self, scores: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None) -> List[Dict]:
+        """Best top_k points for one column of similarity scores (over rows, if given)"""
+        count = scores.shape[0]
+        k = min(top_k, count)
+        if k < count:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for i in top:
+            row = rows[i] if rows is not None else i
+            payload = self.payloads[row]
+            results.append({
+                "id": self.ids[row],
+                "score": float(scores[i]),
+                "chapter": payload.get("chapter", "Unknown"),
+                "section": payload.get("section", "Unknown"),
+                "url": payload.get("url", "/"),
+                "content": payload.get("content", ""),
+                "file": payload.get("file", ""),
+                "tokens": payload.get("tokens")
+            })
+
+        return results
+
+    async def get_collection_info(self) -> Dict:
+        """Get collection statistics"""
+        self._maybe_reload()
+        return {
+            "name": self.collection_name,
+            "vector_count": int(self.matrix.shape[0]),
+            "vector_size": int(self.vector_size),
+            "backend": "local",
+            "path": str(self.path)
+        }
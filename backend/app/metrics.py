@@ -0,0 +1,291 @@
+"""
+Request timing and Prometheus metrics
+A small in-process registry (counters, histograms, callback gauges) rendered
+in the Prometheus text format, plus per-request stage timing that feeds both
+the histograms and the Server-Timing response header
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets + (float("inf"),), series[:len(self.buckets)] + [series[-1]]):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time (returns a number or {label value: number})"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable, label: str = None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.label = label
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [
+                f"{self.name}{_format_labels((self.label,), (key,))} {_format_value(val)}"
+                for key, val in sorted(value.items())
+            ]
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Registry:
+    """Collection of metrics rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "chatbot_http_requests_total", "HTTP requests by endpoint, method and status",
+    ("endpoint", "method", "status")
+))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_http_request_duration_seconds", "HTTP request latency by endpoint",
+    ("endpoint", "method")
+))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_stage_duration_seconds", "Latency of each request stage by provider",
+    ("stage", "provider")
+))
+PROVIDER_ERRORS = REGISTRY.register(Counter(
+    "chatbot_provider_errors_total", "Failed provider calls", ("provider", "operation")
+))
+ROUTER_EVENTS = REGISTRY.register(Counter(
+    "chatbot_provider_router_events_total",
+    "Provider router decisions (failover, hedge, circuit_open) by the provider they affect",
+    ("provider", "event")
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "chatbot_cache_requests_total", "Cache lookups by cache and result", ("cache", "result")
+))
+COALESCED_REQUESTS = REGISTRY.register(Counter(
+    "chatbot_coalesced_requests_total",
+    "Chat requests by single-flight role (leader runs the pipeline, follower joins it)", ("role",)
+))
+SCOPED_SEARCHES = REGISTRY.register(Counter(
+    "chatbot_scoped_searches_total",
+    "Page / module scoped vector searches by outcome (scoped, or widened to the whole book)", ("result",)
+))
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "chatbot_admission_rejections_total",
+    "Chat requests refused by admission control (rate_limited, queue_full, queue_timeout)", ("reason",)
+))
+LLM_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "chatbot_llm_queue_wait_seconds", "Time requests waited for a global LLM slot",
+    buckets=(0.005, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+))
+PROMPT_CONTEXT_TOKENS = REGISTRY.register(Histogram(
+    "chatbot_prompt_context_tokens", "Estimated tokens of retrieved context packed into each prompt",
+    buckets=(128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096)
+))
+DB_FLUSH_LATENCY = REGISTRY.register(Histogram(
+    "chatbot_db_flush_duration_seconds", "Write-behind flush latency (one transaction per batch)"
+))
+DB_ROWS_WRITTEN = REGISTRY.register(Counter(
+    "chatbot_db_rows_written_total", "Rows persisted by the write-behind writer", ("table",)
+))
+DB_WRITE_ERRORS = REGISTRY.register(Counter(
+    "chatbot_db_write_errors_total", "Rows lost to failed write-behind flushes", ("table",)
+))
+
+
+class RequestTiming:
+    """Stage durations collected while serving one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, str, float]] = []
+
+    def add(self, name: str, provider: str, seconds: float):
+        self.stages.append((name, provider, seconds))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (repeated stages are summed)"""
+        totals: Dict[str, float] = {}
+        providers: Dict[str, str] = {}
+        for name, provider, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+            if provider:
+                providers[name] = provider
+
+        entries = []
+        for name, seconds in totals.items():
+            desc = f';desc="{providers[name]}"' if name in providers else ""
+            entries.append(f"{name}{desc};dur={seconds * 1000:.1f}")
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    """Timing of the request being served, if any"""
+    return _current_timing.get()
+
+
+@contextmanager
+def stage(name: str, provider: str = ""):
+    """Time a block as one stage of the current request (and in STAGE_LATENCY)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_LATENCY.observe(seconds, stage=name, provider=provider)
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.add(name, provider, seconds)
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware: per-request stage timing, Server-Timing header and HTTP metrics
+
+    The header is written when the response starts, so streaming responses
+    only report the stages finished before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timing.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(endpoint=endpoint, method=method, status=status)
+            HTTP_LATENCY.observe(timing.elapsed(), endpoint=endpoint, method=method)
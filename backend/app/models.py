@@ -2,9 +2,12 @@
 Pydantic models for request/response
 """
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
+# Fallback answer returned when the AI provider fails
+ERROR_RESPONSE = "I encountered an error processing your question. Please try again or rephrase your question."
+
 
 class Citation(BaseModel):
     """Citation for source reference"""
@@ -19,13 +22,17 @@ class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=5000)
     session_id: Optional[str] = None
     context: Optional[str] = None  # Selected text
+    page_url: Optional[str] = Field(None, max_length=2000)  # Book page the question was asked from
+    scope: Literal["page", "module"] = "page"  # Search that page first, or its whole module
 
     class Config:
         json_schema_extra = {
             "example": {
                 "message": "What is ROS 2?",
                 "session_id": "session_123",
-                "context": "ROS 2 is the Robot Operating System..."
+                "context": "ROS 2 is the Robot Operating System...",
+                "page_url": "/module-01-ros2/chapter-01-ros2-architecture",
+                "scope": "page"
             }
         }
 
@@ -51,3 +58,32 @@ class ChatResponse(BaseModel):
                 "session_id": "session_123"
             }
         }
+
+
+class BatchChatRequest(BaseModel):
+    """Many chat requests answered in one call"""
+    questions: List[ChatRequest] = Field(..., min_length=1)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "questions": [
+                    {"message": "What is ROS 2?"},
+                    {"message": "How does Gazebo simulate physics?"}
+                ]
+            }
+        }
+
+
+class BatchItemResult(BaseModel):
+    """Answer to one question of a batch (error is set if it failed)"""
+    index: int
+    response: Optional[str] = None
+    citations: List[Citation] = []
+    session_id: str
+    error: Optional[str] = None
+
+
+class BatchChatResponse(BaseModel):
+    """Batch answers in request order"""
+    results: List[BatchItemResult]
@@ -2,44 +2,48 @@
 OpenAI service for chat completions and embeddings
 """
 
-from typing import List, Dict
-from openai import OpenAI
+from typing import AsyncIterator, List, Dict
+from openai import AsyncOpenAI
 from app.config import settings
+from app.context_packer import pack_context
+from app.embedding_cache import get_embedding_cache
+from app.http_client import get_http_client, get_limiter
+from app.metrics import CACHE_REQUESTS, PROVIDER_ERRORS, stage
 
 
 class OpenAIService:
     """Service for interacting with OpenAI API"""
 
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            http_client=get_http_client()
+        )
+        # Chat calls fail fast so the router can move to another provider;
+        # embeddings keep the SDK's retries (they have no fallback)
+        self.chat_client = self.client.with_options(max_retries=settings.LLM_MAX_RETRIES)
         self.model = settings.OPENAI_MODEL
         self.embedding_model = settings.OPENAI_EMBEDDING_MODEL
+        self.limiter = get_limiter("openai")
+        self.embedding_cache = get_embedding_cache()
 
-    async def generate_chat_response(
+    def _build_messages(
         self,
         user_message: str,
         context_documents: List[Dict[str, str]],
         conversation_history: List[Dict[str, str]] = None
-    ) -> str:
-        """
-        Generate chat response using RAG
-
-        Args:
-            user_message: User's question
-            context_documents: Retrieved documents from Qdrant
-            conversation_history: Previous messages
-
-        Returns:
-            AI-generated response
-        """
-        # Build context from retrieved documents
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages (static system prompt, history, then context + question)"""
+        # Merge, dedupe and fit retrieved documents into the token budget
         context_text = "\n\n".join([
-            f"[{doc.get('chapter', 'Unknown')} - {doc.get('section', 'Unknown')}]\n{doc.get('content', '')}"
-            for doc in context_documents
+            f"[{passage['chapter']} - {passage['section']}]\n{passage['content']}"
+            for passage in pack_context(context_documents)
         ])
 
-        # System prompt optimized for educational context
-        system_prompt = f"""You are an expert teaching assistant for a Physical AI and Humanoid Robotics course.
+        # System prompt optimized for educational context; kept free of
+        # per-request content so it is an identical, cacheable prefix
+        system_prompt = """You are an expert teaching assistant for a Physical AI and Humanoid Robotics course.
 
 Your role is to help students learn about:
 - ROS 2 (Robot Operating System)
@@ -56,9 +60,6 @@ INSTRUCTIONS:
 5. Be concise but comprehensive
 6. Use examples and analogies when helpful
 
-COURSE CONTEXT:
-{context_text}
-
 Remember: You're helping students learn robotics and Physical AI. Be encouraging and supportive!
 """
 
@@ -69,19 +70,95 @@ Remember: You're helping students learn robotics and Physical AI. Be encouraging
         if conversation_history:
             messages.extend(conversation_history)
 
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
+        # Add retrieved context and the current user message
+        messages.append({
+            "role": "user",
+            "content": f"COURSE CONTEXT:\n{context_text}\n\nQUESTION: {user_message}"
+        })
+
+        return messages
+
+    async def complete_chat(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        Generate chat response using RAG
+
+        Args:
+            user_message: User's question
+            context_documents: Retrieved documents from Qdrant
+            conversation_history: Previous messages
+
+        Returns:
+            AI-generated response (raises on provider errors)
+        """
+        with stage("prompt"):
+            messages = self._build_messages(user_message, context_documents, conversation_history)
 
         # Generate response
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            max_tokens=settings.OPENAI_MAX_TOKENS,
-            temperature=settings.OPENAI_TEMPERATURE
-        )
+        try:
+            with stage("llm", provider="openai"):
+                async with self.limiter:
+                    response = await self.chat_client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=settings.OPENAI_MAX_TOKENS,
+                        temperature=settings.OPENAI_TEMPERATURE
+                    )
+        except Exception:
+            PROVIDER_ERRORS.inc(provider="openai", operation="chat")
+            raise
 
         return response.choices[0].message.content
 
+    async def stream_chat(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream chat response deltas using OpenAI's streaming mode
+
+        Args:
+            user_message: User's question
+            context_documents: Retrieved documents from Qdrant
+            conversation_history: Previous messages
+
+        Yields:
+            Text deltas as they are generated (raises on provider errors)
+        """
+        with stage("prompt"):
+            messages = self._build_messages(user_message, context_documents, conversation_history)
+
+        try:
+            with stage("llm", provider="openai"):
+                async with self.limiter:
+                    stream = await self.chat_client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=settings.OPENAI_MAX_TOKENS,
+                        temperature=settings.OPENAI_TEMPERATURE,
+                        stream=True
+                    )
+
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            yield delta
+        except Exception:
+            PROVIDER_ERRORS.inc(provider="openai", operation="chat")
+            raise
+
+    # OpenAI errors already propagate to the caller
+    generate_chat_response = complete_chat
+    stream_chat_response = stream_chat
+
     async def generate_embedding(self, text: str) -> List[float]:
         """
         Generate embedding vector for text
@@ -92,16 +169,32 @@ Remember: You're helping students learn robotics and Physical AI. Be encouraging
         Returns:
             Embedding vector (list of floats)
         """
-        response = self.client.embeddings.create(
-            model=self.embedding_model,
-            input=text
-        )
-
-        return response.data[0].embedding
+        with stage("embed", provider="openai"):
+            if self.embedding_cache:
+                cached = self.embedding_cache.get(self.embedding_model, text)
+                CACHE_REQUESTS.inc(cache="embedding", result="miss" if cached is None else "hit")
+                if cached is not None:
+                    return cached
+
+            try:
+                async with self.limiter:
+                    response = await self.client.embeddings.create(
+                        model=self.embedding_model,
+                        input=text
+                    )
+            except Exception:
+                PROVIDER_ERRORS.inc(provider="openai", operation="embed")
+                raise
+
+        embedding = response.data[0].embedding
+        if self.embedding_cache:
+            self.embedding_cache.put(self.embedding_model, text, embedding)
+
+        return embedding
 
     async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
         """
-        Generate embeddings for multiple texts
+        Generate embeddings for multiple texts in one API call
 
         Args:
             texts: List of texts to embed
@@ -109,9 +202,34 @@ Remember: You're helping students learn robotics and Physical AI. Be encouraging
         Returns:
             List of embedding vectors
         """
-        response = self.client.embeddings.create(
-            model=self.embedding_model,
-            input=texts
-        )
-
-        return [item.embedding for item in response.data]
+        with stage("embed", provider="openai"):
+            # Only send texts that are not cached yet
+            if self.embedding_cache:
+                embeddings = self.embedding_cache.get_many(self.embedding_model, texts)
+            else:
+                embeddings = [None] * len(texts)
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            if self.embedding_cache:
+                CACHE_REQUESTS.inc(len(texts) - len(missing), cache="embedding", result="hit")
+                CACHE_REQUESTS.inc(len(missing), cache="embedding", result="miss")
+
+            if missing:
+                try:
+                    async with self.limiter:
+                        response = await self.client.embeddings.create(
+                            model=self.embedding_model,
+                            input=[texts[i] for i in missing]
+                        )
+                except Exception:
+                    PROVIDER_ERRORS.inc(provider="openai", operation="embed")
+                    raise
+
+                new_embeddings = [item.embedding for item in response.data]
+                if self.embedding_cache:
+                    self.embedding_cache.put_many(
+                        self.embedding_model, [texts[i] for i in missing], new_embeddings
+                    )
+                for i, embedding in zip(missing, new_embeddings):
+                    embeddings[i] = embedding
+
+        return embeddings
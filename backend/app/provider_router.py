@@ -0,0 +1,266 @@
+"""
+Latency-aware LLM provider router
+Tracks EWMA latency and error rate per provider, opens a circuit after
+repeated failures, fails over to the next provider within a request and can
+hedge a slow call with a second provider once the first passes its p95
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+from app.config import settings
+from app.metrics import ROUTER_EVENTS
+from app.models import ERROR_RESPONSE
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Recent latencies kept per provider for the p95 hedge delay
+LATENCY_WINDOW = 200
+
+
+class ProviderHealth:
+    """Running latency / error statistics and circuit state for one provider"""
+
+    def __init__(self, name: str, priority: int):
+        self.name = name
+        self.priority = priority
+        self.latency: Optional[float] = None  # EWMA seconds of successful calls
+        self._error_rate = 0.0  # EWMA of failures (1) and successes (0)
+        self.updated_at = time.monotonic()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False  # a half-open probe is in flight
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at < settings.CIRCUIT_COOLDOWN:
+            return OPEN
+        return HALF_OPEN
+
+    def available(self) -> bool:
+        """Closed, or half-open with no probe already in flight"""
+        state = self.state
+        return state == CLOSED or state == HALF_OPEN and not self.probing
+
+    @property
+    def error_rate(self) -> float:
+        """
+        Error-rate EWMA, halved every CIRCUIT_COOLDOWN seconds without calls
+
+        A provider ranked below the others gets no traffic to earn back a
+        good score with, so its old failures fade instead.
+        """
+        idle = time.monotonic() - self.updated_at
+        return self._error_rate * 0.5 ** (idle / max(settings.CIRCUIT_COOLDOWN, 1e-3))
+
+    def score(self) -> float:
+        """Expected cost of a call (lower is better)"""
+        latency = self.latency if self.latency is not None else settings.ROUTER_DEFAULT_LATENCY
+        return latency * (1 + settings.ROUTER_ERROR_PENALTY * self.error_rate)
+
+    def p95(self) -> Optional[float]:
+        """95th percentile latency (None until HEDGE_MIN_SAMPLES calls have succeeded)"""
+        if len(self.latencies) < max(settings.HEDGE_MIN_SAMPLES, 1):
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def record_success(self, seconds: Optional[float] = None):
+        alpha = settings.ROUTER_EWMA_ALPHA
+        if seconds is not None:
+            self.latency = seconds if self.latency is None else alpha * seconds + (1 - alpha) * self.latency
+            self.latencies.append(seconds)
+        self._error_rate = self.error_rate * (1 - alpha)
+        self.updated_at = time.monotonic()
+        self.consecutive_failures = 0
+        if self.opened_at is not None:
+            print(f"Provider {self.name}: circuit closed")
+        self.opened_at = None
+
+    def record_failure(self):
+        alpha = settings.ROUTER_EWMA_ALPHA
+        self._error_rate = alpha + (1 - alpha) * self.error_rate
+        self.updated_at = time.monotonic()
+        self.consecutive_failures += 1
+        # A failed half-open probe re-opens the circuit for another cooldown
+        if self.state == HALF_OPEN or self.consecutive_failures >= settings.CIRCUIT_FAILURE_THRESHOLD:
+            if self.state != OPEN:
+                ROUTER_EVENTS.inc(provider=self.name, event="circuit_open")
+                print(f"Provider {self.name}: circuit open after {self.consecutive_failures} failures")
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "latency_ewma": round(self.latency, 4) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "p95": self.p95(),
+            "samples": len(self.latencies),
+        }
+
+
+class ProviderRouter:
+    """
+    Chat service over several LLM providers
+
+    Same interface as GroqService/OpenAIService. Each call goes to the
+    available provider with the best score, and on an error moves on to the
+    next one; the user only sees ERROR_RESPONSE when every provider failed.
+    """
+
+    def __init__(self, providers: Dict[str, object], embedding_provider: str = None):
+        """
+        Args:
+            providers: name -> service (with complete_chat / stream_chat), in priority order
+            embedding_provider: Provider that embeds queries (default: the first one);
+                never failed over, since the index was built in its vector space
+        """
+        if not providers:
+            raise ValueError("ProviderRouter needs at least one provider")
+        self.providers = providers
+        self.health = {name: ProviderHealth(name, i) for i, name in enumerate(providers)}
+        self.embedding_provider = embedding_provider or next(iter(providers))
+
+    def order(self) -> List[str]:
+        """Providers to try for one request, best first"""
+        ranked = sorted(self.health.values(), key=lambda health: (health.score(), health.priority))
+        candidates = [health.name for health in ranked if health.available()]
+        if candidates:
+            return candidates
+        # Every circuit is open: try the one that opened first rather than fail outright
+        return [min(ranked, key=lambda health: health.opened_at).name]
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: health.snapshot() for name, health in self.health.items()}
+
+    async def _call(self, name: str, user_message, context_documents, conversation_history) -> str:
+        """One timed complete_chat call, recorded in the provider's health"""
+        health = self.health[name]
+        probe = health.state == HALF_OPEN
+        health.probing |= probe
+        start = time.perf_counter()
+        try:
+            response = await self.providers[name].complete_chat(
+                user_message, context_documents, conversation_history
+            )
+        except asyncio.CancelledError:
+            # Lost a hedge race or the client went away: not the provider's fault
+            raise
+        except Exception as e:
+            print(f"Provider {name} error: {e}")
+            health.record_failure()
+            raise
+        finally:
+            if probe:
+                health.probing = False
+
+        health.record_success(time.perf_counter() - start)
+        return response
+
+    async def generate_chat_response(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """
+        Generate chat response on the best available provider
+
+        Args:
+            user_message: User's question
+            context_documents: Retrieved documents
+            conversation_history: Previous messages (optional)
+
+        Returns:
+            AI-generated response, or ERROR_RESPONSE if every provider failed
+        """
+        candidates = self.order()
+        call = lambda name: asyncio.ensure_future(
+            self._call(name, user_message, context_documents, conversation_history)
+        )
+
+        while candidates:
+            name = candidates.pop(0)
+            pending = {call(name)}
+
+            # Hedge: once the call runs past its p95, race the next provider
+            delay = self.health[name].p95() if settings.HEDGE_REQUESTS and candidates else None
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    backup = candidates.pop(0)
+                    ROUTER_EVENTS.inc(provider=backup, event="hedge")
+                    pending.add(call(backup))
+
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            return task.result()
+            finally:
+                # The loser of a hedge race is cancelled
+                for task in pending:
+                    task.cancel()
+
+            if candidates:
+                ROUTER_EVENTS.inc(provider=candidates[0], event="failover")
+
+        return ERROR_RESPONSE
+
+    async def stream_chat_response(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream chat response deltas from the best available provider
+
+        Fails over only until the first delta has been sent; after that an
+        error ends the stream, since the text already sent can't be taken back.
+
+        Yields:
+            Text deltas, or ERROR_RESPONSE if every provider failed
+        """
+        candidates = self.order()
+        for i, name in enumerate(candidates):
+            health = self.health[name]
+            probe = health.state == HALF_OPEN
+            health.probing |= probe
+            started = False
+            try:
+                async for delta in self.providers[name].stream_chat(
+                    user_message, context_documents, conversation_history
+                ):
+                    started = True
+                    yield delta
+            except Exception as e:
+                print(f"Provider {name} error: {e}")
+                health.record_failure()
+                if started:
+                    return
+                if i + 1 < len(candidates):
+                    ROUTER_EVENTS.inc(provider=candidates[i + 1], event="failover")
+                continue
+            finally:
+                if probe:
+                    health.probing = False
+
+            # Stream durations depend on answer length, so only errors are recorded
+            health.record_success()
+            return
+
+        yield ERROR_RESPONSE
+
+    async def generate_embedding(self, text: str) -> List[float]:
+        """Embed text with the embedding provider (no failover: vectors must match the index)"""
+        return await self.providers[self.embedding_provider].generate_embedding(text)
+
+    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed many texts in one call on the embedding provider"""
+        return await self.providers[self.embedding_provider].generate_embeddings_batch(texts)
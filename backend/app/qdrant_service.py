@@ -2,41 +2,141 @@
 Qdrant vector database service for semantic search
 """
 
-from typing import List, Dict, Optional
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter
+import asyncio
+from typing import Iterable, List, Dict, Optional, Tuple
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    BinaryQuantization, BinaryQuantizationConfig, Datatype, Disabled, Distance, FieldCondition, Filter,
+    MatchValue, PayloadSchemaType, PointIdsList, PointStruct, QuantizationSearchParams, QueryRequest,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchParams, VectorParams, VectorParamsDiff
+)
 from app.config import settings
+from app.http_client import get_http_limits, get_limiter
+from app.metrics import PROVIDER_ERRORS, stage
+
+
+# Payload fields a search needs for citations and prompt packing; chunk text
+# comes from the chunk store unless LEAN_PAYLOADS is off
+SEARCH_PAYLOAD_FIELDS = ["chapter", "section", "url", "file", "tokens"]
+
+# Keyword payload indexes backing page / module scoped searches
+SCOPE_INDEX_FIELDS = ["page", "chapter"]
 
 
 class QdrantService:
     """Service for interacting with Qdrant vector database"""
 
     def __init__(self):
-        """Initialize Qdrant client"""
-        self.client = QdrantClient(
+        """Initialize async Qdrant client with a keep-alive connection pool"""
+        self.client = AsyncQdrantClient(
             url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY
+            api_key=settings.QDRANT_API_KEY or None,
+            timeout=int(settings.HTTP_TIMEOUT),
+            limits=get_http_limits()
         )
         self.collection_name = settings.QDRANT_COLLECTION_NAME
         self.vector_size = settings.QDRANT_VECTOR_SIZE
+        self.limiter = get_limiter("qdrant")
+        self.search_params = self._search_params()
+        self.search_payload = SEARCH_PAYLOAD_FIELDS if settings.LEAN_PAYLOADS else True
+
+    async def close(self):
+        """Close the underlying HTTP connections"""
+        await self.client.close()
+
+    @staticmethod
+    def _quantization_config():
+        """Quantization from settings (None when QDRANT_QUANTIZATION is "none")"""
+        kind = settings.QDRANT_QUANTIZATION.lower()
+        if kind == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                quantile=settings.QDRANT_QUANTIZATION_QUANTILE,
+                always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM
+            ))
+        if kind == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(
+                always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM
+            ))
+        if kind != "none":
+            raise ValueError(f"Unknown QDRANT_QUANTIZATION: {settings.QDRANT_QUANTIZATION!r}")
+        return None
+
+    @staticmethod
+    def _search_params() -> Optional[SearchParams]:
+        """Rescoring / oversampling for quantized collections (None without quantization)"""
+        if settings.QDRANT_QUANTIZATION.lower() == "none":
+            return None
+        return SearchParams(quantization=QuantizationSearchParams(
+            rescore=settings.QDRANT_QUANTIZATION_RESCORE,
+            oversampling=settings.QDRANT_QUANTIZATION_OVERSAMPLING
+        ))
+
+    @staticmethod
+    def _filter(filters: Optional[Dict[str, str]]) -> Optional[Filter]:
+        """Qdrant filter matching every field of a scope filter (None when unscoped)"""
+        if not filters:
+            return None
+        return Filter(must=[
+            FieldCondition(key=key, match=MatchValue(value=value)) for key, value in filters.items()
+        ])
 
     async def create_collection(self):
-        """Create Qdrant collection if it doesn't exist"""
+        """
+        Create Qdrant collection if it doesn't exist
+
+        Vector datatype, on-disk originals and quantization come from
+        settings. For an existing collection, on-disk storage and
+        quantization are updated in place (Qdrant re-quantizes in the
+        background); the datatype can only change by re-creating it.
+        Keyword indexes on the scope fields are added when missing.
+        """
+        quantization = self._quantization_config()
+        datatype = Datatype.FLOAT16 if settings.QDRANT_VECTOR_DATATYPE.lower() == "float16" else Datatype.FLOAT32
+
         try:
-            collections = self.client.get_collections().collections
+            collections = (await self.client.get_collections()).collections
             collection_names = [col.name for col in collections]
 
             if self.collection_name not in collection_names:
-                self.client.create_collection(
+                await self.client.create_collection(
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
                         size=self.vector_size,
-                        distance=Distance.COSINE
-                    )
+                        distance=Distance.COSINE,
+                        datatype=datatype,
+                        on_disk=settings.QDRANT_VECTORS_ON_DISK
+                    ),
+                    quantization_config=quantization
                 )
-                print(f"✓ Created collection: {self.collection_name}")
+                print(f"✓ Created collection: {self.collection_name} "
+                      f"({datatype.value}, quantization: {settings.QDRANT_QUANTIZATION})")
             else:
                 print(f"✓ Collection already exists: {self.collection_name}")
+                config = (await self.client.get_collection(self.collection_name)).config
+                on_disk = bool(config.params.vectors.on_disk)
+                if on_disk != settings.QDRANT_VECTORS_ON_DISK or config.quantization_config != quantization:
+                    await self.client.update_collection(
+                        collection_name=self.collection_name,
+                        vectors_config={"": VectorParamsDiff(on_disk=settings.QDRANT_VECTORS_ON_DISK)},
+                        quantization_config=quantization or Disabled.DISABLED
+                    )
+                    print(f"✓ Updated storage: on_disk={settings.QDRANT_VECTORS_ON_DISK}, "
+                          f"quantization: {settings.QDRANT_QUANTIZATION}")
+                if config.params.vectors.datatype not in (None, datatype):
+                    print(f"  Note: collection stores {config.params.vectors.datatype.value}; "
+                          f"re-create it to switch to {datatype.value}")
+
+            # Filtered searches use these instead of scanning every payload
+            schema = (await self.client.get_collection(self.collection_name)).payload_schema or {}
+            for field in SCOPE_INDEX_FIELDS:
+                if field not in schema:
+                    await self.client.create_payload_index(
+                        collection_name=self.collection_name,
+                        field_name=field,
+                        field_schema=PayloadSchemaType.KEYWORD
+                    )
+                    print(f"✓ Created payload index: {field}")
 
         except Exception as e:
             print(f"Error creating collection: {e}")
@@ -66,10 +166,11 @@ class QdrantService:
                 payload=metadata
             )
 
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=[point]
-            )
+            async with self.limiter:
+                await self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=[point]
+                )
 
             return True
 
@@ -100,10 +201,11 @@ class QdrantService:
                 for vid, emb, meta in zip(vector_ids, embeddings, metadatas)
             ]
 
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=points
-            )
+            async with self.limiter:
+                await self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=points
+                )
 
             print(f"✓ Inserted {len(points)} embeddings")
             return True
@@ -112,10 +214,92 @@ class QdrantService:
             print(f"Error inserting batch: {e}")
             return False
 
+    async def upload_points(
+        self,
+        points: Iterable[Tuple],
+        batch_size: int = 64,
+        parallel: int = 1,
+        max_retries: int = 3
+    ) -> bool:
+        """
+        Bulk upload through qdrant-client's upload_points (parallel workers, retries)
+
+        Args:
+            points: Iterable of (id, embedding, metadata); consumed in a
+                worker thread, so it may block while waiting for input
+            batch_size: Points per upsert request
+            parallel: Number of upload workers
+            max_retries: Retries per failed batch
+
+        Returns:
+            Success status
+        """
+        structs = (
+            PointStruct(id=vector_id, vector=embedding, payload=metadata)
+            for vector_id, embedding, metadata in points
+        )
+        try:
+            await asyncio.to_thread(
+                self.client.upload_points,
+                collection_name=self.collection_name,
+                points=structs,
+                batch_size=batch_size,
+                parallel=parallel,
+                max_retries=max_retries,
+                wait=True
+            )
+            return True
+
+        except Exception as e:
+            print(f"Error uploading points: {e}")
+            return False
+
+    async def delete_points(self, vector_ids: List) -> bool:
+        """
+        Delete points by id
+
+        Args:
+            vector_ids: Point ids to remove
+
+        Returns:
+            Success status
+        """
+        try:
+            async with self.limiter:
+                await self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=PointIdsList(points=list(vector_ids))
+                )
+
+            print(f"✓ Deleted {len(vector_ids)} points")
+            return True
+
+        except Exception as e:
+            print(f"Error deleting points: {e}")
+            return False
+
+    async def list_point_ids(self) -> List:
+        """List every point id in the collection"""
+        ids = []
+        offset = None
+        while True:
+            async with self.limiter:
+                points, offset = await self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=1000,
+                    offset=offset,
+                    with_payload=False,
+                    with_vectors=False
+                )
+            ids.extend(point.id for point in points)
+            if offset is None:
+                return ids
+
     async def search_similar(
         self,
         query_embedding: List[float],
-        top_k: int = None
+        top_k: int = None,
+        filters: Optional[Dict[str, str]] = None
     ) -> List[Dict]:
         """
         Search for similar documents
@@ -123,6 +307,7 @@ class QdrantService:
         Args:
             query_embedding: Query vector
             top_k: Number of results (default from settings)
+            filters: Payload values results must match (e.g. {"page": ...})
 
         Returns:
             List of similar documents with metadata and scores
@@ -131,38 +316,96 @@ class QdrantService:
             top_k = settings.TOP_K_RESULTS
 
         try:
-            search_result = self.client.query_points(
-                collection_name=self.collection_name,
-                query=query_embedding,
-                limit=top_k
-            ).points
-
-            results = []
-            for scored_point in search_result:
-                result = {
-                    "id": scored_point.id,
-                    "score": scored_point.score,
-                    "chapter": scored_point.payload.get("chapter", "Unknown"),
-                    "section": scored_point.payload.get("section", "Unknown"),
-                    "url": scored_point.payload.get("url", "/"),
-                    "content": scored_point.payload.get("content", "")
-                }
-                results.append(result)
-
-            return results
+            with stage("search", provider="qdrant"):
+                async with self.limiter:
+                    search_result = (await self.client.query_points(
+                        collection_name=self.collection_name,
+                        query=query_embedding,
+                        query_filter=self._filter(filters),
+                        limit=top_k,
+                        search_params=self.search_params,
+                        with_payload=self.search_payload
+                    )).points
+
+            return [self._to_result(scored_point) for scored_point in search_result]
 
         except Exception as e:
             print(f"Error searching: {e}")
+            PROVIDER_ERRORS.inc(provider="qdrant", operation="search")
+            return []
+
+    async def search_similar_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = None,
+        filters: Optional[List[Optional[Dict[str, str]]]] = None
+    ) -> List[List[Dict]]:
+        """
+        Search for several queries in one request (query_batch_points)
+
+        Args:
+            query_embeddings: Query vectors
+            top_k: Number of results per query (default from settings)
+            filters: Per-query payload filters (None entries are unscoped)
+
+        Returns:
+            One result list per query, in order ([] for every query on error)
+        """
+        if top_k is None:
+            top_k = settings.TOP_K_RESULTS
+        if not query_embeddings:
             return []
+        if filters is None:
+            filters = [None] * len(query_embeddings)
+
+        try:
+            with stage("search", provider="qdrant"):
+                async with self.limiter:
+                    responses = await self.client.query_batch_points(
+                        collection_name=self.collection_name,
+                        requests=[
+                            QueryRequest(
+                                query=embedding, filter=self._filter(query_filters), limit=top_k,
+                                params=self.search_params, with_payload=self.search_payload
+                            )
+                            for embedding, query_filters in zip(query_embeddings, filters)
+                        ]
+                    )
+
+            return [[self._to_result(point) for point in response.points] for response in responses]
+
+        except Exception as e:
+            print(f"Error searching: {e}")
+            PROVIDER_ERRORS.inc(provider="qdrant", operation="search")
+            return [[] for _ in query_embeddings]
+
+    @staticmethod
+    def _to_result(scored_point) -> Dict:
+        """Search result dict from a scored point"""
+        return {
+            "id": scored_point.id,
+            "score": scored_point.score,
+            "chapter": scored_point.payload.get("chapter", "Unknown"),
+            "section": scored_point.payload.get("section", "Unknown"),
+            "url": scored_point.payload.get("url", "/"),
+            "content": scored_point.payload.get("content", ""),
+            "file": scored_point.payload.get("file", ""),
+            "tokens": scored_point.payload.get("tokens")
+        }
 
     async def get_collection_info(self) -> Dict:
         """Get collection statistics"""
         try:
-            info = self.client.get_collection(self.collection_name)
+            info = await self.client.get_collection(self.collection_name)
+            vectors = info.config.params.vectors
+            quantization = info.config.quantization_config
             return {
-                "name": info.name,
+                "name": self.collection_name,
                 "vector_count": info.points_count,
-                "vector_size": info.config.params.vectors.size
+                "vector_size": vectors.size,
+                "datatype": vectors.datatype.value if vectors.datatype else "float32",
+                "on_disk": bool(vectors.on_disk),
+                "quantization": type(quantization).__name__ if quantization else None
             }
         except Exception as e:
             print(f"Error getting info: {e}")
@@ -0,0 +1,238 @@
+"""
+Bounded answer cache in front of the RAG pipeline
+Exact tier keyed on normalized message + context + collection version,
+with an optional semantic tier matching on query embedding similarity
+"""
+
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from app.config import settings
+from app.index_version import read_index_version
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    if not text:
+        return ""
+    text = " ".join(text.lower().split())
+    return re.sub(r"[\s?!.]+$", "", text)
+
+
+class ResponseCache:
+    """LRU answer cache with a memory cap, TTL and hit/miss counters"""
+
+    def __init__(
+        self,
+        max_bytes: int = None,
+        ttl: float = None,
+        semantic_threshold: float = None,
+        version_check_interval: float = None
+    ):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.RESPONSE_CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else settings.RESPONSE_CACHE_TTL
+        if semantic_threshold is None and settings.RESPONSE_CACHE_SEMANTIC:
+            semantic_threshold = settings.RESPONSE_CACHE_SEMANTIC_THRESHOLD
+        self.semantic_threshold = semantic_threshold
+        self.version_check_interval = (
+            version_check_interval if version_check_interval is not None
+            else settings.INDEX_VERSION_CHECK_INTERVAL
+        )
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._bytes = 0
+        self._version = read_index_version()
+        self._version_checked_at = time.monotonic()
+
+        # Semantic tier: stacked unit vectors, rebuilt lazily after changes
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, message: str, context: Optional[str] = None) -> str:
+        """Cache key for a request under the current collection version"""
+        raw = "\x1f".join([normalize_text(message), normalize_text(context), self._version])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, message: str, context: Optional[str] = None) -> Optional[Dict]:
+        """
+        Look up an exact match
+
+        Args:
+            message: User's question
+            context: Selected text (optional)
+
+        Returns:
+            Cached value or None
+        """
+        self._check_version()
+        entry = self._lookup(self.make_key(message, context))
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry["value"]
+
+    def get_semantic(self, query_embedding: List[float], context: Optional[str] = None) -> Optional[Dict]:
+        """
+        Look up the closest cached query above the cosine threshold
+
+        Only entries with the same selected-text context are considered.
+        Counts as a hit when found; the exact-tier miss was already counted.
+        """
+        if not self.semantic_threshold or not self._entries:
+            return None
+
+        self._check_version()
+        matrix, keys = self._semantic_matrix()
+        if matrix is None:
+            return None
+
+        query = self._unit(query_embedding)
+        if query is None or query.shape[0] != matrix.shape[1]:
+            return None
+
+        context_hash = self._context_hash(context)
+        scores = matrix @ query
+        for idx in np.argsort(-scores):
+            if scores[idx] < self.semantic_threshold:
+                break
+            entry = self._lookup(keys[idx])
+            if entry is not None and entry["context_hash"] == context_hash:
+                self.semantic_hits += 1
+                return entry["value"]
+
+        return None
+
+    def put(
+        self,
+        message: str,
+        context: Optional[str],
+        value: Dict,
+        query_embedding: Optional[List[float]] = None
+    ):
+        """
+        Store a value, evicting least recently used entries over the memory cap
+
+        Args:
+            message: User's question
+            context: Selected text (optional)
+            value: JSON-serializable answer (response + citations)
+            query_embedding: Enables the semantic tier for this entry
+        """
+        self._check_version()
+        key = self.make_key(message, context)
+
+        embedding = None
+        if self.semantic_threshold and query_embedding is not None:
+            embedding = self._unit(query_embedding)
+
+        size = len(key) + len(json.dumps(value).encode())
+        if embedding is not None:
+            size += embedding.nbytes
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = {
+            "value": value,
+            "expires": time.monotonic() + self.ttl,
+            "size": size,
+            "embedding": embedding,
+            "context_hash": self._context_hash(context),
+        }
+        self._bytes += size
+        if embedding is not None:
+            self._matrix = None
+
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
+        self._bytes = 0
+        self._matrix = None
+        self._matrix_keys = []
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "collection_version": self._version,
+        }
+
+    def _lookup(self, key: str) -> Optional[Dict]:
+        """Return a live entry and mark it most recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry["expires"] < time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        if entry["embedding"] is not None:
+            self._matrix = None
+
+    def _check_version(self):
+        """Invalidate everything when the collection has been repopulated"""
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+
+        self._version_checked_at = now
+        version = read_index_version()
+        if version != self._version:
+            print(f"Collection version changed ({self._version} -> {version}), clearing response cache")
+            self._version = version
+            self.clear()
+
+    def _semantic_matrix(self):
+        if self._matrix is None:
+            keys = [key for key, entry in self._entries.items() if entry["embedding"] is not None]
+            if not keys:
+                return None, []
+            self._matrix = np.stack([self._entries[key]["embedding"] for key in keys])
+            self._matrix_keys = keys
+        return self._matrix, self._matrix_keys
+
+    @staticmethod
+    def _unit(vector: List[float]) -> Optional[np.ndarray]:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        if norm == 0:
+            return None
+        return array / norm
+
+    @staticmethod
+    def _context_hash(context: Optional[str]) -> str:
+        return hashlib.sha256(normalize_text(context).encode()).hexdigest()
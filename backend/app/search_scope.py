@@ -0,0 +1,71 @@
+"""
+Page and module scopes for retrieval
+Points carry the route of their page ("page") and their module ("chapter");
+a chat request from a book page can restrict search to either
+"""
+
+import posixpath
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+
+def chapter_for_path(file_path: str) -> str:
+    """Determine the chapter name from a doc path (or page route)"""
+    if 'module-01-ros2' in file_path:
+        return "Module 1: ROS 2"
+    elif 'module-02-simulation' in file_path:
+        return "Module 2: Simulation"
+    elif 'module-03-isaac' in file_path:
+        return "Module 3: NVIDIA Isaac"
+    elif 'module-04-vla' in file_path:
+        return "Module 4: VLA Systems"
+    return "General"
+
+
+def page_for_url(url: str) -> str:
+    """
+    Route of a book page, as stored in the "page" payload field
+
+    Drops the origin, query and heading anchor, a trailing slash and a
+    trailing /index, so "https://host/module-01-ros2/intro/#setup" and
+    "/module-01-ros2/intro" give the same page.
+    """
+    path = urlsplit(url.strip()).path or "/"
+    path = posixpath.normpath("/" + path.lstrip("/"))
+    if path.endswith("/index"):
+        path = path[:-len("/index")]
+    return path or "/"
+
+
+def page_for_doc(rel_path: str, slug: Optional[str] = None) -> str:
+    """Route Docusaurus serves a doc at (front matter slug, else its path)"""
+    stem = posixpath.splitext(rel_path)[0]
+    if slug:
+        # Relative slugs are resolved against the doc's folder
+        slug = slug if slug.startswith("/") else posixpath.join("/", posixpath.dirname(stem), slug)
+        return page_for_url(slug)
+    return page_for_url(stem)
+
+
+def scope_filters(page_url: Optional[str], scope: str = "page") -> Optional[Dict[str, str]]:
+    """
+    Payload filter for a request's scope
+
+    Args:
+        page_url: URL or route of the page the question was asked from
+        scope: "page" (that page only) or "module" (every page of its module)
+
+    Returns:
+        {payload field: value} to match, or None for an unscoped search
+    """
+    if not page_url:
+        return None
+    page = page_for_url(page_url)
+    if scope == "module":
+        return {"chapter": chapter_for_path(page)}
+    return {"page": page}
+
+
+def payload_matches(payload: Dict, filters: Optional[Dict[str, str]]) -> bool:
+    """Whether a payload satisfies every field of a scope filter"""
+    return not filters or all(payload.get(key) == value for key, value in filters.items())
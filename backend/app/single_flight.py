@@ -0,0 +1,62 @@
+"""
+Single-flight coalescing of identical in-flight work
+The first caller for a key runs the computation; callers arriving while it
+is still running wait for the same result instead of repeating it
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """Deduplicates concurrent async calls by key"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn() once for all concurrent callers with the same key
+
+        The computation runs in its own task, so a caller disconnecting
+        (being cancelled) never cancels it for the others.
+
+        Args:
+            key: Identity of the computation
+            fn: Coroutine function producing the result
+
+        Returns:
+            (result, shared) where shared is True if this caller joined a
+            computation started by another caller; exceptions propagate to
+            every caller
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict:
+        """In-flight keys and how many calls were collapsed"""
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
@@ -0,0 +1,49 @@
+"""
+Outgoing event queue for a chat WebSocket
+The answer pipeline never waits on the client: while the socket is behind,
+queued token deltas merge into one event, so a slow reader costs memory
+bounded by the answer, not an LLM slot held open. Other events are capped;
+past the cap the connection is given up
+"""
+
+import asyncio
+from collections import deque
+from typing import Deque, Dict
+
+
+class SocketOutboxFull(Exception):
+    """More events queued than the client is reading"""
+
+
+class SocketOutbox:
+    """Events waiting to be sent, oldest first"""
+
+    def __init__(self, max_events: int):
+        self.max_events = max_events
+        self.overflowed = False
+        self._events: Deque[Dict] = deque()
+        self._ready = asyncio.Event()
+        self.merged = 0
+
+    def put(self, event: str, data: Dict):
+        """Queue an event (a token delta joins a token event still waiting to be sent)"""
+        if event == "token" and self._events and self._events[-1]["type"] == "token":
+            self._events[-1]["delta"] += data["delta"]
+            self.merged += 1
+        elif len(self._events) >= self.max_events:
+            self.overflowed = True
+        else:
+            self._events.append({"type": event, **data})
+        self._ready.set()
+
+    async def get(self) -> Dict:
+        """Wait for the next event (raises SocketOutboxFull once the queue has overflowed)"""
+        while not self._events and not self.overflowed:
+            self._ready.clear()
+            await self._ready.wait()
+        if self.overflowed:
+            raise SocketOutboxFull(f"more than {self.max_events} events waiting to be sent")
+        return self._events.popleft()
+
+    def __len__(self) -> int:
+        return len(self._events)
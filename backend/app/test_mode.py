@@ -1,30 +1,67 @@
 """
-Test mode services with mock responses
+Test mode simulators standing in for the LLM providers and Qdrant
+Latency is drawn from configurable distributions and awaited (never blocking
+the event loop), answers stream token by token, and calls fail or time out
+at configurable rates, so TEST_MODE can be benchmarked and chaos-tested
+offline. Vector search is a real top-k over the book's chunks
 """
 
-from typing import List, Dict
-import time
+import asyncio
+import random
+from typing import AsyncIterator, List, Dict, Optional, Union
+from app.config import settings
+from app.latency import parse_latency
+from app.metrics import PROVIDER_ERRORS, stage
+from app.models import ERROR_RESPONSE
+from app.search_scope import payload_matches
 
 
-class MockOpenAIService:
-    """Mock OpenAI service for testing"""
+class SimulatedProviderError(Exception):
+    """Fault injected by a simulator"""
 
-    async def generate_chat_response(
-        self,
-        user_message: str,
-        context_documents: List[Dict[str, str]],
-        conversation_history: List[Dict[str, str]] = None
-    ) -> str:
-        """Generate mock response"""
 
-        # Simulate processing time
-        time.sleep(0.5)
+class Simulator:
+    """Latency and fault injection for one kind of simulated call"""
+
+    def __init__(self, latency: Union[float, str], error_rate: float, timeout_rate: float,
+                 rng: random.Random):
+        self.latency = parse_latency(latency, rng)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.rng = rng
+
+    def draw_fault(self) -> Optional[str]:
+        """"error", "timeout" or None for one call"""
+        roll = self.rng.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.timeout_rate:
+            return "timeout"
+        return None
+
+    async def fail(self, fault: str, operation: str):
+        """Raise an injected fault (a timeout first hangs for TEST_TIMEOUT, like a stalled connection)"""
+        if fault == "timeout":
+            await asyncio.sleep(settings.TEST_TIMEOUT)
+            raise asyncio.TimeoutError(f"Simulated {operation} timeout")
+        await asyncio.sleep(self.latency())
+        raise SimulatedProviderError(f"Simulated {operation} error")
+
+    async def call(self, operation: str):
+        """Wait out one call's latency, or fail it at the configured rates"""
+        fault = self.draw_fault()
+        if fault:
+            await self.fail(fault, operation)
+        await asyncio.sleep(self.latency())
+
+
+def test_rng(offset: int = 0) -> random.Random:
+    """Random source for a simulator (TEST_SEED makes runs reproducible)"""
+    return random.Random(None if settings.TEST_SEED is None else settings.TEST_SEED + offset)
 
-        # Simple keyword-based responses
-        message_lower = user_message.lower()
 
-        if "ros" in message_lower or "ros 2" in message_lower:
-            return """ROS 2 (Robot Operating System 2) is a flexible framework for writing robot software. It's a collection of tools, libraries, and conventions designed to simplify the task of creating complex robot behavior.
+CANNED_ANSWERS = [
+    (('ros', 'ros 2'), """ROS 2 (Robot Operating System 2) is a flexible framework for writing robot software. It's a collection of tools, libraries, and conventions designed to simplify the task of creating complex robot behavior.
 
 Key features of ROS 2:
 - **Distributed Architecture**: No single point of failure
@@ -34,10 +71,8 @@ Key features of ROS 2:
 
 ROS 2 uses nodes (independent processes) that communicate via topics (streaming data), services (request-response), and actions (long-running tasks with feedback).
 
-For installation and getting started, check out Chapter 1 of Module 1!"""
-
-        elif "topic" in message_lower or "publish" in message_lower or "subscribe" in message_lower:
-            return """Topics in ROS 2 enable asynchronous, many-to-many communication between nodes.
+For installation and getting started, check out Chapter 1 of Module 1!"""),
+    (('topic', 'publish', 'subscribe'), """Topics in ROS 2 enable asynchronous, many-to-many communication between nodes.
 
 **How Topics Work:**
 - Publishers send messages to a topic
@@ -52,10 +87,8 @@ For installation and getting started, check out Chapter 1 of Module 1!"""
 
 Example use case: A camera node publishes images on `/camera/image_raw` topic, while multiple vision processing nodes can subscribe to process those images.
 
-See Chapter 2 for detailed examples with code!"""
-
-        elif "gazebo" in message_lower or "simulation" in message_lower:
-            return """Gazebo is a powerful physics-based robot simulator. It allows you to test robots in realistic environments before deploying to hardware.
+See Chapter 2 for detailed examples with code!"""),
+    (('gazebo', 'simulation'), """Gazebo is a powerful physics-based robot simulator. It allows you to test robots in realistic environments before deploying to hardware.
 
 **Key Features:**
 - Realistic physics engines (ODE, Bullet, Simbody)
@@ -69,10 +102,8 @@ See Chapter 2 for detailed examples with code!"""
 - Test edge cases and failures
 - Generate synthetic training data
 
-Module 2 covers Gazebo in depth with hands-on labs!"""
-
-        elif "isaac" in message_lower or "nvidia" in message_lower:
-            return """NVIDIA Isaac is a comprehensive platform for AI-powered robotics development.
+Module 2 covers Gazebo in depth with hands-on labs!"""),
+    (('isaac', 'nvidia'), """NVIDIA Isaac is a comprehensive platform for AI-powered robotics development.
 
 **Isaac Platform Components:**
 - **Isaac Sim**: Photorealistic simulation with Omniverse
@@ -85,10 +116,8 @@ Module 2 covers Gazebo in depth with hands-on labs!"""
 - Synthetic data generation at scale
 - Sim-to-real transfer capabilities
 
-Module 3 explores the Isaac ecosystem with practical examples!"""
-
-        elif "vla" in message_lower or "llm" in message_lower or "gpt" in message_lower:
-            return """Vision-Language-Action (VLA) systems combine computer vision, natural language understanding, and robot control.
+Module 3 explores the Isaac ecosystem with practical examples!"""),
+    (('vla', 'llm', 'gpt'), """Vision-Language-Action (VLA) systems combine computer vision, natural language understanding, and robot control.
 
 **VLA Pipeline:**
 1. **Vision**: Perceive the environment (cameras, sensors)
@@ -102,16 +131,43 @@ Module 3 explores the Isaac ecosystem with practical examples!"""
 - Vision system locates red cup
 - Robot executes pick-and-place
 
-Module 4 covers VLA with the Autonomous Humanoid capstone project!"""
+Module 4 covers VLA with the Autonomous Humanoid capstone project!"""),
+]
 
-        else:
-            # Generic response with context
-            context_summary = ""
-            if context_documents:
-                chapters = [doc.get("chapter", "Unknown") for doc in context_documents[:2]]
-                context_summary = f"\n\nBased on the course content (particularly {', '.join(chapters)}), "
 
-            return f"""I'm here to help you learn about Physical AI and Humanoid Robotics!{context_summary}
+class MockOpenAIService:
+    """Simulated LLM provider: canned answers with latency, token streaming and faults"""
+
+    def __init__(self, name: str = "mock", seed_offset: int = 0):
+        """
+        Args:
+            name: Provider label for metrics (several can sit behind the router)
+            seed_offset: Added to TEST_SEED so simulated providers differ
+        """
+        from app.embedder import get_embedder
+
+        self.name = name
+        rng = test_rng(seed_offset)
+        self.llm = Simulator(settings.TEST_LLM_LATENCY, settings.TEST_ERROR_RATE, settings.TEST_TIMEOUT_RATE, rng)
+        self.token_latency = parse_latency(settings.TEST_TOKEN_LATENCY, rng)
+        self.embed = Simulator(settings.TEST_EMBED_LATENCY, 0.0, 0.0, rng)
+        self.rng = rng
+        self.embedder = get_embedder()
+
+    def _answer(self, user_message: str, context_documents: List[Dict[str, str]]) -> str:
+        """Keyword-matched canned answer"""
+        message_lower = user_message.lower()
+        for keywords, answer in CANNED_ANSWERS:
+            if any(keyword in message_lower for keyword in keywords):
+                return answer
+
+        # Generic response with context
+        context_summary = ""
+        if context_documents:
+            chapters = [doc.get("chapter", "Unknown") for doc in context_documents[:2]]
+            context_summary = f"\n\nBased on the course content (particularly {', '.join(chapters)}), "
+
+        return f"""I'm here to help you learn about Physical AI and Humanoid Robotics!{context_summary}
 
 This course covers:
 - **Module 1**: ROS 2 (Robot Operating System)
@@ -129,81 +185,251 @@ Could you be more specific? For example:
 
 Feel free to select any text from the course and ask me about it!"""
 
+    def _tokens(self, user_message: str, context_documents: List[Dict[str, str]]) -> List[str]:
+        """The answer split into word-sized deltas"""
+        words = self._answer(user_message, context_documents).split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    async def complete_chat(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """Simulated completion: time to first token plus every token's latency (raises injected faults)"""
+        tokens = self._tokens(user_message, context_documents)
+        try:
+            with stage("llm", provider=self.name):
+                await self.llm.call("chat")
+                await asyncio.sleep(sum(self.token_latency() for _ in tokens))
+        except Exception:
+            PROVIDER_ERRORS.inc(provider=self.name, operation="chat")
+            raise
+        return "".join(tokens)
+
+    async def stream_chat(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """Simulated stream; an injected fault hits before the first token or part way through"""
+        tokens = self._tokens(user_message, context_documents)
+        fault = self.llm.draw_fault()
+        fail_at = self.rng.randrange(len(tokens)) if fault else None
+        try:
+            with stage("llm", provider=self.name):
+                await asyncio.sleep(self.llm.latency())
+                for i, token in enumerate(tokens):
+                    if i == fail_at:
+                        await self.llm.fail(fault, "chat")
+                    await asyncio.sleep(self.token_latency())
+                    yield token
+        except Exception:
+            PROVIDER_ERRORS.inc(provider=self.name, operation="chat")
+            raise
+
+    async def generate_chat_response(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> str:
+        """Simulated answer (ERROR_RESPONSE on an injected fault, like GroqService)"""
+        try:
+            return await self.complete_chat(user_message, context_documents, conversation_history)
+        except Exception as e:
+            print(f"[Test Mode] {e}")
+            return ERROR_RESPONSE
+
+    async def stream_chat_response(
+        self,
+        user_message: str,
+        context_documents: List[Dict[str, str]],
+        conversation_history: List[Dict[str, str]] = None
+    ) -> AsyncIterator[str]:
+        """Simulated stream (ERROR_RESPONSE if a fault hits before the first token, like GroqService)"""
+        started = False
+        try:
+            async for delta in self.stream_chat(user_message, context_documents, conversation_history):
+                started = True
+                yield delta
+        except Exception as e:
+            print(f"[Test Mode] {e}")
+            if not started:
+                yield ERROR_RESPONSE
+
     async def generate_embedding(self, text: str) -> List[float]:
-        """Generate mock embedding"""
-        # Return 1536-dimensional mock embedding (OpenAI size)
-        import random
-        random.seed(hash(text) % 2**32)
-        return [random.random() for _ in range(1536)]
+        """Embed with the local hashed n-gram embedder (the mock index uses it too)"""
+        with stage("embed", provider=self.name):
+            await self.embed.call("embed")
+            return self.embedder.embed(text)
+
+    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts in one simulated call"""
+        if not texts:
+            return []
+        with stage("embed", provider=self.name):
+            await self.embed.call("embed")
+            return self.embedder.embed_batch(texts).tolist()
+
+
+FALLBACK_DOCS = [
+    {
+        "id": "doc_1",
+        "chapter": "Module 1: ROS 2",
+        "section": "Introduction to ROS 2 Architecture",
+        "url": "/module-01-ros2/chapter-01-ros2-architecture",
+        "page": "/module-01-ros2/chapter-01-ros2-architecture",
+        "content": "ROS 2 is a flexible framework for writing robot software..."
+    },
+    {
+        "id": "doc_2",
+        "chapter": "Module 1: ROS 2",
+        "section": "Topics, Services, and Actions",
+        "url": "/module-01-ros2/chapter-02-topics-services-actions",
+        "page": "/module-01-ros2/chapter-02-topics-services-actions",
+        "content": "Topics enable asynchronous communication between nodes..."
+    },
+    {
+        "id": "doc_3",
+        "chapter": "Module 1: ROS 2",
+        "section": "Building with rclpy",
+        "url": "/module-01-ros2/chapter-03-building-with-rclpy",
+        "page": "/module-01-ros2/chapter-03-building-with-rclpy",
+        "content": "rclpy is the Python client library for ROS 2..."
+    },
+    {
+        "id": "doc_4",
+        "chapter": "Module 2: Simulation",
+        "section": "Gazebo Physics Simulation",
+        "url": "/module-02-simulation/intro",
+        "page": "/module-02-simulation/intro",
+        "content": "Gazebo provides realistic physics simulation..."
+    },
+    {
+        "id": "doc_5",
+        "chapter": "Module 3: NVIDIA Isaac",
+        "section": "Isaac Sim Overview",
+        "url": "/module-03-isaac/intro",
+        "page": "/module-03-isaac/intro",
+        "content": "NVIDIA Isaac Sim offers photorealistic simulation..."
+    }
+]
 
 
 class MockQdrantService:
-    """Mock Qdrant service for testing"""
+    """
+    Simulated vector database: exact top-k over the book's chunks
+
+    The docs under frontend/docs are chunked and embedded (hashed n-gram
+    embedder) in memory on first use; without them a few sample passages
+    stand in. Searches take TEST_SEARCH_LATENCY and fail at the test
+    error / timeout rates, returning [] like QdrantService.
+    """
+
+    def __init__(self):
+        self.search = Simulator(
+            settings.TEST_SEARCH_LATENCY, settings.TEST_ERROR_RATE, settings.TEST_TIMEOUT_RATE, test_rng(1000)
+        )
+        self.ids: List = []
+        self.payloads: List[Dict] = []
+        self.matrix = None
+        self._load_lock = asyncio.Lock()
+
+    async def _ensure_loaded(self):
+        """Index the docs once (in a thread, so the event loop keeps serving)"""
+        if self.matrix is not None:
+            return
+        async with self._load_lock:
+            if self.matrix is None:
+                self.ids, self.payloads, self.matrix = await asyncio.to_thread(self._build)
+                print(f"✓ [Test Mode] Mock index: {len(self.ids)} chunks")
+
+    @staticmethod
+    def _build():
+        from app.embedder import get_embedder
+        from app.indexer import DOCS_DIR, load_doc_chunks
+
+        records = [record for md_file in sorted(DOCS_DIR.rglob("*.md")) for record in load_doc_chunks(md_file)]
+        if records:
+            texts = [record["text"] for record in records]
+            ids, payloads = [record["id"] for record in records], [record["payload"] for record in records]
+        else:
+            texts = [f"{doc['section']}\n{doc['content']}" for doc in FALLBACK_DOCS]
+            ids, payloads = [doc["id"] for doc in FALLBACK_DOCS], FALLBACK_DOCS
+        return ids, payloads, get_embedder().embed_batch(texts)
 
     async def create_collection(self):
         """Mock collection creation"""
         print("✓ [Test Mode] Mock Qdrant collection created")
         return True
 
+    def _top_k(self, query, top_k: int, filters: Optional[Dict[str, str]]) -> List[Dict]:
+        """Best top_k chunks for one query vector"""
+        import numpy as np
+
+        rows = [row for row, payload in enumerate(self.payloads) if payload_matches(payload, filters)]
+        if not rows:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(query)) or 1.0
+        scores = self.matrix[rows] @ (query / norm)
+        results = []
+        for i in np.argsort(-scores)[:top_k]:
+            payload = self.payloads[rows[i]]
+            results.append({
+                "id": self.ids[rows[i]],
+                "score": float(scores[i]),
+                "chapter": payload.get("chapter", "Unknown"),
+                "section": payload.get("section", "Unknown"),
+                "url": payload.get("url", "/"),
+                "content": payload.get("content", ""),
+                "file": payload.get("file", ""),
+                "tokens": payload.get("tokens")
+            })
+        return results
+
     async def search_similar(
         self,
         query_embedding: List[float],
-        top_k: int = 5
+        top_k: int = None,
+        filters: Optional[Dict[str, str]] = None
     ) -> List[Dict]:
-        """Return mock search results"""
-
-        # Mock relevant documents
-        mock_results = [
-            {
-                "id": "doc_1",
-                "score": 0.95,
-                "chapter": "Module 1: ROS 2",
-                "section": "Introduction to ROS 2 Architecture",
-                "url": "/module-01-ros2/chapter-01-ros2-architecture",
-                "content": "ROS 2 is a flexible framework for writing robot software..."
-            },
-            {
-                "id": "doc_2",
-                "score": 0.88,
-                "chapter": "Module 1: ROS 2",
-                "section": "Topics, Services, and Actions",
-                "url": "/module-01-ros2/chapter-02-topics-services-actions",
-                "content": "Topics enable asynchronous communication between nodes..."
-            },
-            {
-                "id": "doc_3",
-                "score": 0.82,
-                "chapter": "Module 1: ROS 2",
-                "section": "Building with rclpy",
-                "url": "/module-01-ros2/chapter-03-building-with-rclpy",
-                "content": "rclpy is the Python client library for ROS 2..."
-            },
-            {
-                "id": "doc_4",
-                "score": 0.76,
-                "chapter": "Module 2: Simulation",
-                "section": "Gazebo Physics Simulation",
-                "url": "/module-02-simulation/intro",
-                "content": "Gazebo provides realistic physics simulation..."
-            },
-            {
-                "id": "doc_5",
-                "score": 0.70,
-                "chapter": "Module 3: NVIDIA Isaac",
-                "section": "Isaac Sim Overview",
-                "url": "/module-03-isaac/intro",
-                "content": "NVIDIA Isaac Sim offers photorealistic simulation..."
-            }
-        ]
-
-        return mock_results[:top_k]
+        """Simulated search: exact top-k by cosine similarity"""
+        return (await self.search_similar_batch([query_embedding], top_k, [filters]))[0]
+
+    async def search_similar_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = None,
+        filters: Optional[List[Optional[Dict[str, str]]]] = None
+    ) -> List[List[Dict]]:
+        """Simulated batched search (one latency draw for the whole batch)"""
+        if top_k is None:
+            top_k = settings.TOP_K_RESULTS
+        filters = filters or [None] * len(query_embeddings)
+        await self._ensure_loaded()
+
+        try:
+            with stage("search", provider="mock"):
+                await self.search.call("search")
+                return [
+                    self._top_k(embedding, top_k, query_filters)
+                    for embedding, query_filters in zip(query_embeddings, filters)
+                ]
+        except Exception as e:
+            print(f"[Test Mode] Error searching: {e}")
+            PROVIDER_ERRORS.inc(provider="mock", operation="search")
+            return [[] for _ in query_embeddings]
 
     async def get_collection_info(self) -> Dict:
         """Return mock collection info"""
+        await self._ensure_loaded()
         return {
-            "name": "physical_ai_textbook",
-            "vector_count": 150,
-            "vector_size": 1536,
+            "name": settings.QDRANT_COLLECTION_NAME,
+            "vector_count": len(self.ids),
+            "vector_size": int(self.matrix.shape[1]),
             "status": "test_mode"
         }
 
@@ -221,3 +447,18 @@ class MockQdrantService:
         """Mock batch insert"""
         print(f"✓ [Test Mode] Mock batch insert: {len(vector_ids)} embeddings")
         return True
+
+    async def upload_points(self, points, batch_size: int = 64, parallel: int = 1, max_retries: int = 3) -> bool:
+        """Mock bulk upload"""
+        count = len(await asyncio.to_thread(list, points))
+        print(f"✓ [Test Mode] Mock upload: {count} points")
+        return True
+
+    async def delete_points(self, vector_ids: List) -> bool:
+        """Mock delete"""
+        print(f"✓ [Test Mode] Mock delete: {len(vector_ids)} points")
+        return True
+
+    async def list_point_ids(self) -> List:
+        """Mock point listing"""
+        return []
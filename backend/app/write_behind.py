@@ -0,0 +1,150 @@
+"""
+Write-behind persistence for conversation rows
+Requests enqueue rows and return immediately; a background task batches
+them into multi-row inserts so chat latency never includes Postgres
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.metrics import DB_FLUSH_LATENCY, DB_ROWS_WRITTEN, DB_WRITE_ERRORS
+
+
+class WriteBehindWriter:
+    """Bounded queue of pending rows flushed by a background task"""
+
+    def __init__(
+        self,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_pending: int = None
+    ):
+        self.batch_size = batch_size or settings.DB_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.DB_WRITE_FLUSH_INTERVAL
+        self.max_pending = max_pending or settings.DB_WRITE_MAX_PENDING
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Rows accepted but not yet committed, in enqueue order (readers merge these)
+        self._unflushed: Dict[int, Tuple] = {}
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def enqueue(self, model, row: Dict) -> bool:
+        """
+        Queue a row for insertion without waiting for the database
+
+        Args:
+            model: SQLAlchemy model class (e.g. Conversation)
+            row: Column values
+
+        Returns:
+            False if the queue is full and the row was dropped
+        """
+        self.start()
+        row.setdefault("created_at", datetime.utcnow())
+
+        try:
+            self._queue.put_nowait((model, row))
+            self._unflushed[id(row)] = (model, row)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def stop(self):
+        """Flush everything still queued and stop the background task"""
+        if self._task is None or self._task.done():
+            return
+
+        await self._queue.put(None)  # Shutdown sentinel
+        await self._task
+        self._task = None
+
+    def unflushed(self, model) -> List[Dict]:
+        """Rows of a table that are queued or being written (not yet visible to readers)"""
+        return [row for row_model, row in self._unflushed.values() if row_model is model]
+
+    def stats(self) -> Dict:
+        """Queue depth and write counters"""
+        return {
+            "pending": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    async def _run(self):
+        closing = False
+        while not closing:
+            # Wait for the first row, then give the batch a moment to fill up
+            first = await self._queue.get()
+            if first is not None and self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.flush_interval)
+
+            batch = [first] + self._drain(limit=self.batch_size - 1)
+            closing = None in batch
+            batch = [item for item in batch if item is not None]
+            if batch:
+                await self._flush(batch)
+
+        # Shutting down: flush whatever is left
+        rest = [item for item in self._drain(limit=None) if item is not None]
+        for start in range(0, len(rest), self.batch_size):
+            await self._flush(rest[start:start + self.batch_size])
+
+    async def _flush(self, batch: List[Tuple]):
+        try:
+            await asyncio.to_thread(self._insert, batch)
+        finally:
+            for _, row in batch:
+                self._unflushed.pop(id(row), None)
+
+    def _drain(self, limit: Optional[int]) -> List[Tuple]:
+        batch = []
+        while not self._queue.empty() and (limit is None or len(batch) < limit):
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    def _insert(self, batch: List[Tuple]):
+        """Insert a batch with one multi-row INSERT per table"""
+        # Imported here so processes that never write skip loading SQLAlchemy
+        from sqlalchemy import insert
+        from app.database import get_database
+
+        rows_by_model = defaultdict(list)
+        for model, row in batch:
+            rows_by_model[model].append(row)
+
+        start = time.perf_counter()
+        try:
+            db = get_database()
+            if not db:
+                return
+            try:
+                for model, rows in rows_by_model.items():
+                    db.execute(insert(model), rows)
+                db.commit()
+                self.written += len(batch)
+                for model, rows in rows_by_model.items():
+                    DB_ROWS_WRITTEN.inc(len(rows), table=model.__tablename__)
+            finally:
+                db.close()
+                DB_FLUSH_LATENCY.observe(time.perf_counter() - start)
+        except Exception as db_error:
+            self.failed += len(batch)
+            for model, rows in rows_by_model.items():
+                DB_WRITE_ERRORS.inc(len(rows), table=model.__tablename__)
+            print(f"Database error (non-critical): {db_error}")
@@ -0,0 +1,98 @@
+"""
+Concurrency benchmark for /api/chat/query against the local stub server
+
+Usage (from backend/):
+    python -m bench.concurrency --llm-latency 0.5 --levels 1 4 16 64
+
+With blocking provider clients throughput stays at ~1/latency regardless
+of in-flight requests; with async clients it grows with concurrency.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bench.stub_server import StubServer
+
+
+async def run_level(client, concurrency: int, requests_per_worker: int) -> dict:
+    """Drive the chat endpoint with a fixed number of concurrent workers"""
+    latencies = []
+    errors = 0
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        for i in range(requests_per_worker):
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/chat/query",
+                json={"message": f"What is ROS 2? ({worker_id}-{i})"}
+            )
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+async def main(args):
+    import httpx
+
+    with StubServer(llm_latency=args.llm_latency, embed_latency=args.embed_latency,
+                    search_latency=args.search_latency) as stub:
+        # Point every provider at the stub before the app reads its settings
+        os.environ.update({
+            "TEST_MODE": "false",
+            "GROQ_API_KEY": "" if args.provider == "openai" else "stub",
+            "GROQ_BASE_URL": stub.url,
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": f"{stub.url}/v1",
+            "QDRANT_URL": stub.url,
+            "QDRANT_API_KEY": "",
+            "DATABASE_URL": "",
+            "RATE_LIMIT_PER_MINUTE": "0",  # one client drives the whole run
+        })
+        import main as backend
+
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     timeout=120) as client:
+            ideal = 1 / (args.llm_latency + args.embed_latency + args.search_latency)
+            print(f"Serial ceiling (1/latency): {ideal:.2f} req/s\n")
+            print(f"{'in-flight':>9} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'max ms':>9}")
+            for level in args.levels:
+                result = await run_level(client, level, args.requests_per_worker)
+                print(f"{result['concurrency']:>9} {result['requests']:>9} {result['errors']:>7} "
+                      f"{result['throughput_rps']:>9.2f} {result['p50_ms']:>9.1f} {result['max_ms']:>9.1f}")
+
+        from app.http_client import close_http_client
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--provider", choices=["groq", "openai"], default="groq")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests-per-worker", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
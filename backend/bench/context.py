@@ -0,0 +1,71 @@
+"""
+Prompt context size before and after packing
+
+Usage (from backend/):
+    python -m bench.context --top-k 5 --budget 2048
+    python -m bench.context --top-k 10 --budget 1024 --chunk-tokens 128
+
+Retrieves the top-k chunks for the keyword questions from bench.embedder
+(hashing-embedder vector search over frontend/docs) and compares the tokens
+of the raw concatenated chunks with the context after merging overlapping
+chunks and dropping duplicates, and after fitting the budget, plus packing
+time. Chunks end at every heading, so with the default chunk size most
+sections are one chunk and only the budget trims anything; smaller chunks
+split sections into overlapping pieces for merging to join.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.config import settings
+from app.context_packer import _pack, count_tokens, pack_context
+from app.embedder import HashingEmbedder
+from app.indexer import DOCS_DIR, load_doc_chunks
+from bench.embedder import KEYWORD_QUERIES
+
+
+def main(args):
+    if args.chunk_tokens:
+        settings.CHUNK_MAX_TOKENS = args.chunk_tokens
+    records = [record for md_file in sorted(DOCS_DIR.rglob("*.md")) for record in load_doc_chunks(md_file)]
+    embedder = HashingEmbedder()
+    matrix = embedder.embed_batch([record["text"] for record in records])
+
+    raw_total, merged_total, packed_total, timings = 0, 0, 0, []
+    print(f"{'question':<48}{'raw':>7}{'merged':>8}{'packed':>8}{'passages':>10}")
+    for question, _ in KEYWORD_QUERIES:
+        scores = matrix @ np.asarray(embedder.embed(question), dtype=np.float32)
+        docs = [{**records[row]["payload"], "score": float(scores[row])} for row in np.argsort(-scores)[:args.top_k]]
+
+        start = time.perf_counter()
+        passages = pack_context(docs, budget=args.budget)
+        timings.append(time.perf_counter() - start)
+
+        raw = sum(count_tokens(doc["content"]) for doc in docs)
+        # Merging and dedup alone, without a budget
+        merged = sum(passage["tokens"] for passage in _pack(docs, 10 ** 9, settings.CONTEXT_DEDUP_THRESHOLD)[0])
+        packed = sum(passage["tokens"] for passage in passages)
+        raw_total += raw
+        merged_total += merged
+        packed_total += packed
+        print(f"{question[:46]:<48}{raw:>7}{merged:>8}{packed:>8}{len(passages):>10}")
+
+    print(f"\nContext tokens: {raw_total} raw -> {merged_total} merged and deduplicated "
+          f"({1 - merged_total / max(raw_total, 1):.0%} fewer) -> {packed_total} packed "
+          f"({1 - packed_total / max(raw_total, 1):.0%} fewer), "
+          f"pack p50 {np.median(timings) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=2048)
+    parser.add_argument("--chunk-tokens", type=int, default=None,
+                        help="CHUNK_MAX_TOKENS for this run (smaller chunks overlap within sections)")
+    main(parser.parse_args())
@@ -0,0 +1,156 @@
+"""
+Microbenchmark and recall check for the hashed n-gram embedder
+
+Usage (from backend/):
+    python -m bench.embedder
+
+Compares the legacy SHA-256 embedding (previously in GroqService and
+populate_simple.py) with HashingEmbedder on the frontend/docs chunks:
+embedding throughput, single-query latency, and retrieval recall for
+perturbed passages (@1, @5) and keyword questions (@3).
+"""
+
+import argparse
+import hashlib
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.embedder import HashingEmbedder
+from app.indexer import load_doc_chunks
+
+DOCS_DIR = Path(__file__).parent.parent.parent / "frontend" / "docs"
+
+# (question, doc expected among the top-3 results)
+KEYWORD_QUERIES = [
+    ("quality of service reliability durability", "module-01-ros2/chapter-02-topics-services-actions"),
+    ("create a service server and client", "module-01-ros2/chapter-02-topics-services-actions"),
+    ("action goal feedback result", "module-01-ros2/chapter-02-topics-services-actions"),
+    ("rclpy node timer callback", "module-01-ros2/chapter-03-building-with-rclpy"),
+    ("DDS middleware architecture", "module-01-ros2/chapter-01-ros2-architecture"),
+    ("GPU RAM workstation requirements", "hardware-requirements"),
+    ("Jetson edge kit", "hardware-requirements"),
+    ("install ubuntu and ROS 2 humble", "lab-setup"),
+    ("Isaac Sim photorealistic simulation", "module-03-isaac/intro"),
+    ("Gazebo physics simulation", "module-02-simulation/intro"),
+]
+
+
+def legacy_embedding(text: str, dim: int = 384) -> List[float]:
+    """The previous SHA-256 based embedding, kept as a baseline"""
+    embeddings = []
+    for i in range(dim // 32):
+        hash_bytes = hashlib.sha256(f"{text}_{i}".encode()).digest()
+        for j in range(0, len(hash_bytes), 4):
+            val = int.from_bytes(hash_bytes[j:j+4], 'big')
+            embeddings.append((val / (2**32)) * 2 - 1)
+    return embeddings[:dim]
+
+
+def load_chunks():
+    chunks, files = [], []
+    for md_file in sorted(DOCS_DIR.rglob("*.md")):
+        for record in load_doc_chunks(md_file, DOCS_DIR):
+            chunks.append(record["text"])
+            files.append(md_file.relative_to(DOCS_DIR).with_suffix("").as_posix())
+    return chunks, files
+
+
+def perturb(words: List[str], rng: random.Random) -> str:
+    """Lowercase, strip punctuation and drop one word from a passage"""
+    words = [re.sub(r"[^\w]", "", w.lower()) for w in words]
+    del words[rng.randrange(len(words))]
+    return "  ".join(w for w in words if w)
+
+
+def unit_rows(matrix) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def recall(doc_matrix, query_matrix, is_hit, k: int) -> float:
+    scores = query_matrix @ doc_matrix.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    return float(np.mean([any(is_hit(q, d) for d in row) for q, row in enumerate(top)]))
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    chunks, files = load_chunks()
+    embedder = HashingEmbedder()
+    embedder.embed_batch(chunks[:2])  # Warm up NumPy
+    print(f"Corpus: {len(chunks)} chunks from {len(set(files))} files\n")
+
+    # Throughput
+    start = time.perf_counter()
+    legacy_docs = unit_rows([legacy_embedding(c) for c in chunks])
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hashed_docs = embedder.embed_batch(chunks)
+    hashed_time = time.perf_counter() - start
+
+    query = "How do I set QoS durability for a ROS 2 publisher?"
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        embedder.embed(query)
+        timings.append(time.perf_counter() - start)
+
+    print("Embedding speed")
+    print(f"  legacy sha256 (per-text loop): {legacy_time * 1000:8.1f} ms total")
+    print(f"  hashed n-gram (batch):         {hashed_time * 1000:8.1f} ms total")
+    print(f"  hashed n-gram single query:    {np.median(timings) * 1e6:8.1f} us p50\n")
+
+    # Recall on perturbed passages drawn from each chunk
+    passages, sources = [], []
+    for idx, chunk in enumerate(chunks):
+        words = chunk.split()
+        for _ in range(args.passages_per_chunk):
+            start = rng.randrange(max(1, len(words) - args.passage_words))
+            window = words[start:start + args.passage_words]
+            passages.append(perturb(window, rng))
+            sources.append(" ".join(window))
+
+    # Chunks keep their newlines and code fences; compare on single spaces
+    flat_chunks = [" ".join(chunk.split()) for chunk in chunks]
+
+    def passage_hit(q, d):
+        return sources[q] in flat_chunks[d]
+
+    keyword_questions = [q for q, _ in KEYWORD_QUERIES]
+
+    def keyword_hit(q, d):
+        return files[d] == KEYWORD_QUERIES[q][1]
+
+    print(f"Recall ({len(passages)} perturbed {args.passage_words}-word passages, "
+          f"{len(KEYWORD_QUERIES)} keyword questions)")
+    print(f"  {'embedder':<16}{'passage@1':>10}{'passage@5':>10}{'keyword@3':>10}")
+    for name, doc_matrix, embed in [
+        ("legacy sha256", legacy_docs, lambda texts: unit_rows([legacy_embedding(t) for t in texts])),
+        ("hashed n-gram", hashed_docs, embedder.embed_batch),
+    ]:
+        passage_matrix = embed(passages)
+        keyword_matrix = embed(keyword_questions)
+        print(f"  {name:<16}"
+              f"{recall(doc_matrix, passage_matrix, passage_hit, 1):>10.2f}"
+              f"{recall(doc_matrix, passage_matrix, passage_hit, 5):>10.2f}"
+              f"{recall(doc_matrix, keyword_matrix, keyword_hit, 3):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--passage-words", type=int, default=12)
+    parser.add_argument("--passages-per-chunk", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,87 @@
+"""
+Import-time budget for the API entry points
+
+Usage (from backend/):
+    python -m bench.importtime --budget-ms 800
+
+Imports each entry point in a fresh interpreter under `python -X importtime`
+(with provider keys set, as in production) and reports the total import time
+and the slowest top-level imports. Exits non-zero if an entry point goes over
+the budget or imports a module that should only load on first use.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+REPO_DIR = BACKEND_DIR.parent
+
+ENTRY_POINTS = {
+    "main": (BACKEND_DIR, "import main"),
+    "serverless_main": (BACKEND_DIR, "import serverless_main"),
+    "vercel_app": (BACKEND_DIR, "import vercel_app"),
+    "api/index": (REPO_DIR / "api", "import index"),
+    "api/chat": (REPO_DIR / "api", "import chat"),
+}
+
+# Must not be imported until a request needs them
+LAZY_MODULES = ("groq", "openai", "qdrant_client", "sqlalchemy", "numpy", "httpx")
+
+
+def measure(cwd: Path, statement: str):
+    """Run one import under -X importtime; returns (total us, {module: cumulative us}, direct imports)"""
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": "budget",
+        "OPENAI_API_KEY": "budget",
+        "DATABASE_URL": "postgresql://budget@localhost/budget",
+        "TEST_MODE": "false",
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=cwd, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules, depth0, depth1 = {}, [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = int(cumulative)
+        if depth == 0:
+            depth0.append(int(cumulative))
+        elif depth == 1:
+            depth1.append((int(cumulative), name.strip()))
+
+    return sum(depth0), modules, depth1
+
+
+def main(args):
+    failed = False
+    for name, (cwd, statement) in ENTRY_POINTS.items():
+        total_us, modules, top_level = measure(cwd, statement)
+        eager = [module for module in LAZY_MODULES if module in modules]
+        over = total_us / 1000 > args.budget_ms
+        failed |= over or bool(eager)
+
+        status = "FAIL" if over or eager else "ok"
+        print(f"{name:<18}{total_us / 1000:>8.0f} ms  {status}")
+        for us, module in sorted(top_level, reverse=True)[:args.top]:
+            print(f"    {us / 1000:>8.1f} ms  {module}")
+        if eager:
+            print(f"    imported eagerly: {', '.join(eager)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=800, help="Maximum import time per entry point")
+    parser.add_argument("--top", type=int, default=5, help="Slowest top-level imports to show")
+    main(parser.parse_args())
@@ -0,0 +1,351 @@
+"""
+Load generator for the chat API against stubbed providers
+
+Usage (from backend/):
+    python -m bench.load --target main --concurrency 32 --duration 20 --json main.json
+    python -m bench.load --target app --rate 50 --duration 20 --json app.json
+    python -m bench.load --compare main.json app.json
+
+The target app (main.py, app.py or serverless_main.py) is imported in
+process with every provider pointed at bench.stub_server, whose LLM,
+embedding and vector search latencies follow the given distributions.
+Closed-loop mode keeps --concurrency requests in flight; open-loop mode
+(--rate) starts requests on a Poisson schedule and measures latency from
+the scheduled start, so a slow server can't hide queueing delay.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.latency import LATENCY_HELP
+from bench.stub_server import StubServer
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+TARGETS = {
+    "main": "main.py",
+    "app": "app.py",
+    "serverless": "serverless_main.py",
+}
+
+# name -> (method, path); {session} is filled from the pool of query sessions
+ENDPOINTS = {
+    "query": ("POST", "/api/chat/query"),
+    "history": ("GET", "/api/chat/history/{session}"),
+    "collection": ("GET", "/api/collection/info"),
+    "health": ("GET", "/health"),
+}
+
+QUESTIONS = [
+    "What is ROS 2?",
+    "How do topics differ from services?",
+    "How do I write a node with rclpy?",
+    "What hardware do I need for the course?",
+    "What is NVIDIA Isaac Sim used for?",
+    "How does Gazebo simulate physics?",
+    "What are Vision-Language-Action models?",
+    "How do I set QoS durability for a publisher?",
+]
+
+
+def target_environment(target: str, stub_url: str, provider: str, database_url: str) -> Dict[str, str]:
+    """Environment that points the target's providers at the stub"""
+    env = {
+        "TEST_MODE": "false",
+        "GROQ_API_KEY": "" if provider == "openai" else "stub",
+        "GROQ_BASE_URL": stub_url,
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"{stub_url}/v1",
+        "QDRANT_URL": stub_url,
+        "QDRANT_API_KEY": "",
+        "VECTOR_BACKEND": "qdrant",
+        "DATABASE_URL": database_url,
+        # One client drives the whole run; set it to measure rate limiting
+        "RATE_LIMIT_PER_MINUTE": os.environ.get("RATE_LIMIT_PER_MINUTE", "0"),
+    }
+    if target == "app":
+        env["SPACE_ID"] = "bench"  # HF mode uses the real services
+    return env
+
+
+def load_target(target: str):
+    """Import a target entry point as a fresh module and return its app"""
+    path = BACKEND_DIR / TARGETS[target]
+    spec = importlib.util.spec_from_file_location(f"bench_target_{target}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def available_endpoints(app, names: List[str]) -> List[str]:
+    """Endpoints from the mix that the target actually routes"""
+    # The OpenAPI schema also covers routes mounted through routers
+    routes = {(method.upper(), path) for path, item in app.openapi()["paths"].items() for method in item}
+    available = []
+    for name in names:
+        method, path = ENDPOINTS[name]
+        if (method, path.replace("{session}", "{session_id}")) in routes:
+            available.append(name)
+        else:
+            print(f"  skipping {name}: {method} {path} not served by this target")
+    return available
+
+
+class Recorder:
+    """Latency samples, error and admission-rejection (429 / 503) counts per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+
+    def record(self, endpoint: str, latency: float, ok: bool, rejected: bool = False):
+        self.latencies.setdefault(endpoint, []).append(latency)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        if rejected:
+            self.rejected[endpoint] = self.rejected.get(endpoint, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict:
+        """Throughput and latency percentiles, per endpoint and overall"""
+        def stats(samples: List[float], errors: int, rejected: int) -> Dict:
+            ms = np.asarray(samples) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0.0, 0.0, 0.0)
+            return {
+                "requests": len(samples),
+                "errors": errors,
+                "rejected": rejected,
+                "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+                "mean_ms": round(float(ms.mean()), 2) if len(ms) else 0.0,
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "max_ms": round(float(ms.max()), 2) if len(ms) else 0.0,
+            }
+
+        endpoints = {
+            name: stats(samples, self.errors.get(name, 0), self.rejected.get(name, 0))
+            for name, samples in sorted(self.latencies.items())
+        }
+        everything = [s for samples in self.latencies.values() for s in samples]
+        total = stats(everything, sum(self.errors.values()), sum(self.rejected.values()))
+        return {"endpoints": endpoints, "total": total}
+
+
+class LoadGenerator:
+    """Issues a weighted mix of requests and records their latencies"""
+
+    def __init__(self, client, mix: Dict[str, float], sessions: int, repeat_questions: bool, seed: int):
+        self.client = client
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.sessions = [f"bench-session-{i}" for i in range(sessions)]
+        self.repeat_questions = repeat_questions
+        self.rng = random.Random(seed)
+        self.recorder = Recorder()
+        self.sent = 0
+
+    def next_request(self):
+        endpoint = self.rng.choices(self.names, self.weights)[0]
+        session = self.rng.choice(self.sessions)
+        method, path = ENDPOINTS[endpoint]
+        body = None
+        if endpoint == "query":
+            message = self.rng.choice(QUESTIONS)
+            if not self.repeat_questions:
+                # Unique text so the answer cache doesn't serve the run
+                message = f"{message} (request {self.sent})"
+            body = {"message": message, "session_id": session}
+        self.sent += 1
+        return endpoint, method, path.format(session=session), body
+
+    async def send(self, started: float = None):
+        """Send one request; latency counts from `started` when given (open loop)"""
+        endpoint, method, path, body = self.next_request()
+        started = started or time.perf_counter()
+        rejected = False
+        try:
+            response = await self.client.request(method, path, json=body)
+            ok = response.status_code < 400
+            rejected = response.status_code in (429, 503)
+        except Exception:
+            ok = False
+        self.recorder.record(endpoint, time.perf_counter() - started, ok, rejected)
+
+    async def closed_loop(self, concurrency: int, duration: float, max_requests: int):
+        """Keep `concurrency` requests in flight until the deadline"""
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline and (not max_requests or self.sent < max_requests):
+                await self.send()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def open_loop(self, rate: float, duration: float, max_requests: int):
+        """Start requests at Poisson arrival times regardless of completions"""
+        start = time.perf_counter()
+        scheduled = start
+        tasks = []
+        while True:
+            scheduled += self.rng.expovariate(rate)
+            if scheduled - start >= duration or (max_requests and len(tasks) >= max_requests):
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.send(started=scheduled)))
+        await asyncio.gather(*tasks)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'query=8,history=1' -> {'query': 8.0, 'history': 1.0}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def print_summary(result: Dict):
+    print(f"\n{'endpoint':<12}{'requests':>9}{'errors':>7}{'rejected':>9}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    rows = list(result["endpoints"].items()) + [("total", result["total"])]
+    for name, row in rows:
+        print(f"{name:<12}{row['requests']:>9}{row['errors']:>7}{row.get('rejected', 0):>9}{row['throughput_rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}")
+
+
+def compare(old_path: str, new_path: str):
+    """Print per-endpoint deltas between two JSON results"""
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{old['target']}@{old['commit']} -> {new['target']}@{new['commit']}\n")
+    print(f"{'endpoint':<12}{'metric':<16}{'old':>10}{'new':>10}{'change':>9}")
+    names = sorted(set(old["endpoints"]) & set(new["endpoints"])) + ["total"]
+    for name in names:
+        before = old["total"] if name == "total" else old["endpoints"][name]
+        after = new["total"] if name == "total" else new["endpoints"][name]
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = (after[metric] / before[metric] - 1) if before[metric] else 0.0
+            print(f"{name:<12}{metric:<16}{before[metric]:>10.1f}{after[metric]:>10.1f}{change:>+9.0%}")
+
+
+async def main(args):
+    import httpx
+
+    mix = parse_mix(args.mix)
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubServer(llm_latency=args.llm_latency, embed_latency=args.embed_latency,
+                       search_latency=args.search_latency, seed=args.seed) as stub:
+        database_url = args.database_url or f"sqlite:///{tmp}/bench.db"
+        os.environ.update(target_environment(args.target, stub.url, args.provider, database_url))
+
+        print(f"Loading {TARGETS[args.target]}...")
+        app = load_target(args.target)
+        mix = {name: mix[name] for name in available_endpoints(app, list(mix))}
+        if not mix:
+            raise SystemExit("None of the requested endpoints are served by this target")
+
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app), \
+                httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            generator = LoadGenerator(client, mix, args.sessions, args.repeat_questions, args.seed)
+
+            if args.warmup:
+                for _ in range(args.warmup):
+                    await generator.send()
+                generator.recorder = Recorder()
+
+            mode = f"open loop at {args.rate} req/s" if args.rate else f"{args.concurrency} in flight"
+            print(f"Running {args.duration:.0f}s, {mode}...")
+            start = time.perf_counter()
+            if args.rate:
+                await generator.open_loop(args.rate, args.duration, args.requests)
+            else:
+                await generator.closed_loop(args.concurrency, args.duration, args.requests)
+            elapsed = time.perf_counter() - start
+
+        from app.http_client import close_http_client
+        await close_http_client()
+
+    result = {
+        "target": args.target,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "mode": "open" if args.rate else "closed",
+        "concurrency": None if args.rate else args.concurrency,
+        "rate_rps": args.rate,
+        "duration_s": round(elapsed, 3),
+        "provider": args.provider,
+        "latency": {"llm": str(args.llm_latency), "embed": str(args.embed_latency),
+                    "search": str(args.search_latency)},
+        "mix": mix,
+        **generator.recorder.summary(elapsed),
+    }
+
+    print_summary(result)
+    if args.json:
+        text = json.dumps(result, indent=2)
+        if args.json == "-":
+            print(text)
+        else:
+            Path(args.json).write_text(text + "\n")
+            print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", choices=list(TARGETS), default="main")
+    parser.add_argument("--provider", choices=["groq", "openai"], default="groq")
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed loop: requests in flight")
+    parser.add_argument("--rate", type=float, default=None, help="Open loop: arrivals per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = no cap)")
+    parser.add_argument("--warmup", type=int, default=5, help="Unrecorded requests sent first")
+    parser.add_argument("--mix", default="query=8,history=1,collection=1",
+                        help="Weighted endpoint mix, from: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--sessions", type=int, default=50, help="Distinct session ids")
+    parser.add_argument("--repeat-questions", action="store_true",
+                        help="Reuse question texts so the answer cache can hit")
+    parser.add_argument("--llm-latency", default="lognormal:0.5:0.3", help=LATENCY_HELP)
+    parser.add_argument("--embed-latency", default="lognormal:0.05:0.3", help=LATENCY_HELP)
+    parser.add_argument("--search-latency", default="lognormal:0.02:0.3", help=LATENCY_HELP)
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write the result as JSON to this path ('-' for stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two JSON results and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,144 @@
+"""
+Recall vs memory report for Qdrant vector storage settings
+
+Usage (from backend/):
+    python -m bench.quantization --top-k 5 --oversampling 2 --json quantization.json
+
+Embeds the frontend/docs chunks, then emulates each storage setting the way
+Qdrant applies it: float16 originals, int8 scalar quantization (values
+clipped to the QDRANT_QUANTIZATION_QUANTILE range and mapped onto 256 levels)
+and binary quantization (one bit per dimension, set when the value is
+positive). Quantized search is run with and without rescoring the top
+top_k * oversampling candidates against the originals. Recall@k is measured
+against exact float32 search over the chunk-section and keyword queries.
+RAM and disk are per million vectors, excluding the HNSW graph and payloads
+(the same for every setting).
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.embedder import HashingEmbedder
+from app.indexer import DOCS_DIR, load_doc_chunks
+from bench.embedder import KEYWORD_QUERIES
+
+MIB = 1024 * 1024
+
+
+def scalar_quantize(matrix: np.ndarray, quantile: float):
+    """int8 codes plus the (offset, step) that map them back to floats"""
+    low = float(np.quantile(matrix, (1 - quantile) / 2))
+    high = float(np.quantile(matrix, 1 - (1 - quantile) / 2))
+    step = (high - low) / 255 or 1.0
+    quantize = lambda values: np.clip(np.round((values - low) / step), 0, 255).astype(np.uint8)
+    return quantize, lambda codes: codes.astype(np.float32) * step + low
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row indices of the k best scores per query column, best first"""
+    k = min(k, scores.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=0)[:k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=0), axis=0)
+    return np.take_along_axis(top, order, axis=0)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    """Mean fraction of the exact top-k found, over queries (columns)"""
+    hits = [len(set(found[:, q]) & set(truth[:, q])) / truth.shape[0] for q in range(truth.shape[1])]
+    return float(np.mean(hits))
+
+
+def rescore(candidates: np.ndarray, originals: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Re-rank quantized candidates with the original vectors"""
+    results = []
+    for q in range(queries.shape[1]):
+        rows = candidates[:, q]
+        exact = originals[rows].astype(np.float32) @ queries[:, q]
+        results.append(rows[np.argsort(-exact)[:k]])
+    return np.stack(results, axis=1)
+
+
+def main(args):
+    records = [record for md_file in sorted(DOCS_DIR.rglob("*.md")) for record in load_doc_chunks(md_file)]
+    embedder = HashingEmbedder()
+    matrix = embedder.embed_batch([record["text"] for record in records])
+    dim = matrix.shape[1]
+
+    # Section titles stand in for questions about each chunk, plus the keyword set
+    query_texts = sorted({record["payload"]["section"] for record in records}) + [q for q, _ in KEYWORD_QUERIES]
+    queries = embedder.embed_batch(query_texts).T  # (dim, queries)
+
+    k = args.top_k
+    candidates = int(k * args.oversampling)
+    truth = top_k(matrix @ queries, k)
+
+    float16 = matrix.astype(np.float16)
+    quantize, dequantize = scalar_quantize(matrix, args.quantile)
+    int8 = dequantize(quantize(matrix))
+    int8_queries = dequantize(quantize(queries))
+    binary = (matrix > 0).astype(np.float32) * 2 - 1
+    binary_queries = (queries > 0).astype(np.float32) * 2 - 1
+
+    # (name, datatype, quantization, recall, quantized bytes/vector)
+    rows = [
+        ("float32", "float32", "none", recall(top_k(matrix @ queries, k), truth), 0),
+        ("float16", "float16", "none", recall(top_k(float16.astype(np.float32) @ queries, k), truth), 0),
+    ]
+    for name, approx, approx_queries, quantized_bytes in (
+        ("scalar", int8, int8_queries, dim),
+        ("binary", binary, binary_queries, dim / 8),
+    ):
+        scores = approx @ approx_queries
+        for datatype, originals in (("float32", matrix), ("float16", float16)):
+            rows.append((f"{name}", datatype, f"{name}", recall(top_k(scores, k), truth), quantized_bytes))
+            rows.append((
+                f"{name}+rescore", datatype, f"{name} (x{args.oversampling:g})",
+                recall(rescore(top_k(scores, candidates), originals, queries, k), truth), quantized_bytes
+            ))
+
+    report = []
+    for name, datatype, quantization, value, quantized_bytes in rows:
+        original_bytes = dim * (2 if datatype == "float16" else 4)
+        if name.endswith("+rescore") or quantization == "none":
+            datatypes = [(False, original_bytes + quantized_bytes, 0)]
+            if quantization != "none":
+                # Rescoring reads originals, which can stay on disk
+                datatypes.append((True, quantized_bytes, original_bytes))
+        else:
+            datatypes = [(True, quantized_bytes, original_bytes)]
+        for on_disk, ram, disk in datatypes:
+            report.append({
+                "setting": name,
+                "datatype": datatype,
+                "quantization": quantization,
+                "on_disk": on_disk,
+                f"recall@{k}": round(value, 4),
+                "ram_mib_per_million": round(ram * 1e6 / MIB, 1),
+                "disk_mib_per_million": round(disk * 1e6 / MIB, 1),
+            })
+
+    print(f"Corpus: {len(records)} chunks x {dim} dims, {len(query_texts)} queries, "
+          f"recall@{k} vs exact float32 (quantile {args.quantile}, oversampling {args.oversampling:g})\n")
+    print(f"{'datatype':<9}{'quantization':<20}{'on_disk':<9}{f'recall@{k}':>10}{'RAM MiB/1M':>12}{'disk MiB/1M':>13}")
+    for row in report:
+        print(f"{row['datatype']:<9}{row['quantization']:<20}{str(row['on_disk']):<9}"
+              f"{row[f'recall@{k}']:>10.3f}{row['ram_mib_per_million']:>12.1f}{row['disk_mib_per_million']:>13.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--oversampling", type=float, default=2.0, help="Candidates per result before rescoring")
+    parser.add_argument("--quantile", type=float, default=0.99, help="Scalar quantization value range")
+    parser.add_argument("--json", help="Also write the report as JSON")
+    main(parser.parse_args())
@@ -0,0 +1,68 @@
+"""
+Compare vector, lexical (BM25) and hybrid (RRF) retrieval on the docs
+
+Usage (from backend/):
+    python -m bench.retrieval
+
+Builds both indexes over the frontend/docs chunks in a temporary directory,
+then reports per-query latency (including the query embedding where one is
+needed) and hit rate @3 on the keyword questions from bench.embedder.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.embedder import HashingEmbedder
+from app.indexer import DOCS_DIR, load_doc_chunks
+from app.lexical_index import LexicalIndex, reciprocal_rank_fusion, write_snapshot
+from bench.embedder import KEYWORD_QUERIES
+
+
+def main(args):
+    records = [record for md_file in sorted(DOCS_DIR.rglob("*.md")) for record in load_doc_chunks(md_file)]
+    embedder = HashingEmbedder()
+    matrix = embedder.embed_batch([record["text"] for record in records])
+
+    def vector_search(query, top_k):
+        scores = matrix @ np.asarray(embedder.embed(query), dtype=np.float32)
+        top = np.argsort(-scores)[:top_k]
+        return [{**records[row]["payload"], "id": records[row]["id"], "score": float(scores[row])} for row in top]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "lexical.bm25"
+        write_snapshot(path, [r["id"] for r in records], [r["text"] for r in records], [r["payload"] for r in records])
+        lexical = LexicalIndex(str(path))
+
+        modes = {
+            "vector": lambda q, k: vector_search(q, k),
+            "lexical": lambda q, k: lexical.search(q, k),
+            "hybrid": lambda q, k: reciprocal_rank_fusion(
+                [vector_search(q, args.candidates), lexical.search(q, args.candidates)], k
+            ),
+        }
+
+        print(f"Corpus: {len(records)} chunks, {len(KEYWORD_QUERIES)} keyword questions\n")
+        print(f"{'mode':<10}{'hit@3':>8}{'p50 us':>10}")
+        for name, search in modes.items():
+            hits, timings = 0, []
+            for question, expected in KEYWORD_QUERIES:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    results = search(question, 3)
+                    timings.append(time.perf_counter() - start)
+                hits += any(r["url"].split("#")[0].lstrip("/") == expected for r in results)
+            print(f"{name:<10}{hits / len(KEYWORD_QUERIES):>8.2f}{np.median(timings) * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--candidates", type=int, default=20, help="Results per retriever before fusion")
+    parser.add_argument("--repeat", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,126 @@
+"""
+Provider router benchmark with per-provider stub servers
+
+Usage (from backend/):
+    python -m bench.router --groq-latency lognormal:0.3:0.8 --groq-error-rate 0.3 --hedge
+
+Runs one stub server per provider (Groq, OpenAI, Gemini), each with its own
+latency distribution and fault rate, and sends chat requests through the
+ProviderRouter. Reports which provider answered, how many requests still
+failed, latency percentiles and the router's failover / hedge counts.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+# Add backend directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.latency import LATENCY_HELP
+from bench.stub_server import StubServer
+
+PROVIDERS = ("groq", "openai", "gemini")
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main(args):
+    with ExitStack() as stack:
+        stubs = {
+            name: stack.enter_context(StubServer(
+                llm_latency=getattr(args, f"{name}_latency"),
+                error_rate=getattr(args, f"{name}_error_rate"),
+                seed=args.seed
+            ))
+            for name in PROVIDERS
+        }
+
+        # Point every provider at its stub before the app reads its settings
+        os.environ.update({
+            "TEST_MODE": "false",
+            "GROQ_API_KEY": "stub",
+            "GROQ_BASE_URL": stubs["groq"].url,
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": f"{stubs['openai'].url}/v1",
+            "GEMINI_API_KEY": "stub",
+            "GEMINI_BASE_URL": stubs["gemini"].url,
+            "LLM_PROVIDERS": ",".join(PROVIDERS),
+            "HEDGE_REQUESTS": str(args.hedge).lower(),
+            "HEDGE_MIN_SAMPLES": str(args.hedge_min_samples),
+            "CIRCUIT_COOLDOWN": str(args.circuit_cooldown),
+            "RATE_LIMIT_PER_MINUTE": "0",  # one client drives the whole run
+        })
+        from app.http_client import close_http_client
+        from app.metrics import ROUTER_EVENTS
+        from app.models import ERROR_RESPONSE
+        import main as backend
+
+        router = backend.get_ai_service()
+        documents = [{
+            "chapter": "Module 1: ROS 2", "section": "Nodes", "url": "/module-01-ros2",
+            "content": "ROS 2 nodes communicate over topics, services and actions."
+        }]
+
+        # Attribute each answer to a provider by wrapping complete_chat
+        winners = Counter()
+        for name, service in router.providers.items():
+            def wrap(call, name=name):
+                async def complete_chat(*call_args, **kwargs):
+                    response = await call(*call_args, **kwargs)
+                    winners[name] += 1
+                    return response
+                return complete_chat
+            service.complete_chat = wrap(service.complete_chat)
+
+        latencies, failures = [], 0
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(i: int):
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                response = await router.generate_chat_response(f"What is ROS 2? ({i})", documents)
+                latencies.append(time.perf_counter() - start)
+                failures += response == ERROR_RESPONSE
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+        print(f"{args.requests} requests in {elapsed:.1f}s, {failures} answered with ERROR_RESPONSE")
+        print(f"latency p50 {percentile(latencies, 0.5) * 1000:.0f} ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms\n")
+        print(f"{'provider':<8} {'answers':>8} {'failovers':>10} {'hedges':>7} {'circuit':>10} "
+              f"{'ewma ms':>8} {'errors':>7}")
+        for name, health in router.stats().items():
+            latency = health["latency_ewma"]
+            print(f"{name:<8} {winners[name]:>8} {ROUTER_EVENTS.value(provider=name, event='failover'):>10.0f} "
+                  f"{ROUTER_EVENTS.value(provider=name, event='hedge'):>7.0f} {health['state']:>10} "
+                  f"{latency * 1000 if latency is not None else float('nan'):>8.0f} {health['error_rate']:>7.2f}")
+
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    for name, latency, error_rate in (("groq", "0.3", 0.0), ("openai", "0.6", 0.0), ("gemini", "0.5", 0.0)):
+        parser.add_argument(f"--{name}-latency", default=latency, help=LATENCY_HELP)
+        parser.add_argument(f"--{name}-error-rate", type=float, default=error_rate,
+                            help="Fraction of calls answered with HTTP 500")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hedge", action="store_true", help="Hedge calls that pass the provider's p95")
+    parser.add_argument("--hedge-min-samples", type=int, default=20)
+    parser.add_argument("--circuit-cooldown", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=None)
+    asyncio.run(main(parser.parse_args()))
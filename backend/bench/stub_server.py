@@ -0,0 +1,229 @@
+"""
+Local stub server that imitates the Groq, OpenAI, Gemini and Qdrant HTTP APIs
+Every endpoint sleeps for a latency drawn from a configurable distribution
+before answering, so benchmarks measure how the backend overlaps provider
+calls rather than provider speed; chat endpoints can also inject faults
+"""
+
+import asyncio
+import importlib.metadata
+import json
+import random
+import socket
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Union
+from app.latency import parse_latency
+
+ANSWER = "ROS 2 is a middleware framework for robots."
+
+
+def create_stub_app(llm_latency: Union[float, str] = 0.5, embed_latency: Union[float, str] = 0.05,
+                    search_latency: Union[float, str] = 0.02, vector_size: int = 384,
+                    seed: int = None, error_rate: float = 0.0) -> FastAPI:
+    """
+    Build the stub provider app
+
+    Args:
+        llm_latency, embed_latency, search_latency: Seconds or distribution specs
+        vector_size: Embedding dimensions
+        seed: Seed for latencies and faults (reproducible runs)
+        error_rate: Fraction of chat calls answered with HTTP 500
+    """
+    stub = FastAPI()
+    rng = random.Random(seed)
+    llm_delay = parse_latency(llm_latency, rng)
+    embed_delay = parse_latency(embed_latency, rng)
+    search_delay = parse_latency(search_latency, rng)
+
+    def completion(model: str) -> dict:
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": ANSWER},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}
+        }
+
+    async def completion_stream(model: str):
+        # Spread the latency over the tokens, like a real provider
+        words = ANSWER.split(" ")
+        latency = llm_delay()
+        for i, word in enumerate(words):
+            await asyncio.sleep(latency / len(words))
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else " " + word},
+                    "finish_reason": None
+                }]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    def fault():
+        if error_rate and rng.random() < error_rate:
+            return JSONResponse({"error": {"message": "Injected stub fault", "code": 500}}, status_code=500)
+        return None
+
+    @stub.post("/openai/v1/chat/completions")  # Groq
+    @stub.post("/v1/chat/completions")  # OpenAI
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub")
+        failure = fault()
+        if failure:
+            await asyncio.sleep(llm_delay() / 10)
+            return failure
+        if body.get("stream"):
+            return StreamingResponse(completion_stream(model), media_type="text/event-stream")
+        await asyncio.sleep(llm_delay())
+        return completion(model)
+
+    def gemini_chunk(text: str) -> dict:
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 10, "totalTokenCount": 20}
+        }
+
+    async def gemini_stream():
+        words = ANSWER.split(" ")
+        latency = llm_delay()
+        for i, word in enumerate(words):
+            await asyncio.sleep(latency / len(words))
+            yield f"data: {json.dumps(gemini_chunk(word if i == 0 else ' ' + word))}\r\n\r\n"
+
+    @stub.post("/v1beta/models/{model_action}")  # Gemini: {model}:generateContent / :streamGenerateContent
+    async def gemini_generate(model_action: str):
+        failure = fault()
+        if failure:
+            await asyncio.sleep(llm_delay() / 10)
+            return failure
+        if model_action.endswith(":streamGenerateContent"):
+            return StreamingResponse(gemini_stream(), media_type="text/event-stream")
+        await asyncio.sleep(llm_delay())
+        return gemini_chunk(ANSWER)
+
+    @stub.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(embed_delay())
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": [0.01] * vector_size}
+                for i in range(len(inputs))
+            ],
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": 1, "total_tokens": 1}
+        }
+
+    @stub.get("/")
+    async def qdrant_root():
+        # Report the installed client version so the compatibility check passes
+        return {"title": "qdrant - vector search engine",
+                "version": importlib.metadata.version("qdrant-client")}
+
+    def stub_points(limit: int) -> list:
+        return [
+            {
+                "id": i + 1,
+                "version": 0,
+                "score": 0.9 - i * 0.05,
+                "payload": {
+                    "chapter": "Module 1: ROS 2",
+                    "section": f"Stub section {i + 1}",
+                    "url": "/module-01-ros2/chapter-01-ros2-architecture",
+                    "content": "ROS 2 nodes communicate over topics, services and actions."
+                }
+            }
+            for i in range(limit)
+        ]
+
+    @stub.post("/collections/{name}/points/query")
+    async def qdrant_query(name: str, request: Request):
+        body = await request.json()
+        latency = search_delay()
+        await asyncio.sleep(latency)
+        return {"result": {"points": stub_points(body.get("limit", 5))}, "status": "ok", "time": latency}
+
+    @stub.post("/collections/{name}/points/query/batch")
+    async def qdrant_query_batch(name: str, request: Request):
+        # One round trip for every search in the batch
+        body = await request.json()
+        latency = search_delay()
+        await asyncio.sleep(latency)
+        return {
+            "result": [{"points": stub_points(search.get("limit", 5))} for search in body["searches"]],
+            "status": "ok",
+            "time": latency
+        }
+
+    @stub.get("/collections/{name}")
+    async def qdrant_collection(name: str):
+        latency = search_delay()
+        await asyncio.sleep(latency)
+        return {
+            "result": {
+                "status": "green",
+                "optimizer_status": "ok",
+                "points_count": 1000,
+                "indexed_vectors_count": 1000,
+                "segments_count": 1,
+                "config": {
+                    "params": {"vectors": {"size": vector_size, "distance": "Cosine"}},
+                    "hnsw_config": {"m": 16, "ef_construct": 100, "full_scan_threshold": 10000},
+                    "optimizer_config": {
+                        "deleted_threshold": 0.2, "vacuum_min_vector_number": 1000,
+                        "default_segment_number": 0, "flush_interval_sec": 5
+                    },
+                    "wal_config": {"wal_capacity_mb": 32, "wal_segments_ahead": 0}
+                },
+                "payload_schema": {}
+            },
+            "status": "ok",
+            "time": latency
+        }
+
+    return stub
+
+
+class StubServer:
+    """Run the stub app with uvicorn in a background thread"""
+
+    def __init__(self, **latencies):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        config = uvicorn.Config(create_stub_app(**latencies), host="127.0.0.1",
+                                port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
@@ -3,60 +3,242 @@ FastAPI Backend for Physical AI Chatbot with RAG
 Supports both production and test modes
 """
 
+import asyncio
+import hashlib
+import json
+import random
 import uuid
 import os
-from fastapi import FastAPI, HTTPException
+import sys
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.requests import HTTPConnection
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.models import ChatRequest, ChatResponse, Citation
+from app.models import (
+    BatchChatRequest, BatchChatResponse, BatchItemResult, ChatRequest, ChatResponse, Citation, ERROR_RESPONSE
+)
 
-# Check if test mode
+# Check if test mode (no AI provider configured also means test mode)
 TEST_MODE = os.getenv("TEST_MODE", "false").lower() == "true"
+if not TEST_MODE and not (settings.GROQ_API_KEY or settings.OPENAI_API_KEY or settings.GEMINI_API_KEY):
+    print("No AI service configured, falling back to test mode")
+    TEST_MODE = True
 
-if TEST_MODE:
-    print("TEST MODE: Running with mock responses")
-    from app.test_mode import MockOpenAIService as AIService
-    from app.test_mode import MockQdrantService as QdrantService
-else:
-    print("PRODUCTION MODE: Running with real APIs")
-    # Use Groq if available, otherwise fallback to OpenAI
-    if settings.GROQ_API_KEY:
-        print("Using Groq AI (Llama 3.1)")
-        from app.groq_service import GroqService as AIService
-    elif settings.OPENAI_API_KEY:
-        print("Using OpenAI")
-        from app.openai_service import OpenAIService as AIService
-    else:
-        print("No AI service configured, falling back to test mode")
-        TEST_MODE = True
-        from app.test_mode import MockOpenAIService as AIService
+print("TEST MODE: Running with mock responses" if TEST_MODE else "PRODUCTION MODE: Running with real APIs")
 
-    from app.qdrant_service import QdrantService
+# Provider SDKs, SQLAlchemy and NumPy are imported on first use, so cold
+# starts (serverless) only pay for what a request actually touches
+from app.metrics import (
+    CACHE_REQUESTS, COALESCED_REQUESTS, CONTENT_TYPE, REGISTRY, SCOPED_SEARCHES, Gauge, TimingMiddleware,
+    current_timing, stage
+)
+from app.admission import AdmissionRejected, get_llm_limiter, get_rate_limiter
+from app.search_scope import scope_filters
+from app.write_behind import WriteBehindWriter
+from app.single_flight import SingleFlight
+from app.socket_outbox import SocketOutbox, SocketOutboxFull
 
-from app.database import get_database, Conversation
+router = APIRouter()
 
-# Initialize FastAPI app
-app = FastAPI(
-    title=settings.API_TITLE,
-    version=settings.API_VERSION,
-    description="RAG-powered chatbot for Physical AI & Humanoid Robotics textbook"
-)
+# Services (created on first use)
+_ai_service = None
+_qdrant_service = None
+_response_cache = None
+_lexical_index = None
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.CORS_ORIGINS + ["*"],  # Allow all in test mode
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+conversation_writer = WriteBehindWriter()
+in_flight_answers = SingleFlight() if settings.COALESCE_REQUESTS else None
+chat_sockets = set()  # open /ws/chat connections
+
+
+def configured_providers() -> List[str]:
+    """LLM providers with an API key, in LLM_PROVIDERS priority order"""
+    keys = {
+        "groq": settings.GROQ_API_KEY,
+        "openai": settings.OPENAI_API_KEY,
+        "gemini": settings.GEMINI_API_KEY,
+    }
+    names = [name.strip().lower() for name in settings.LLM_PROVIDERS.split(",")]
+    return [name for name in dict.fromkeys(names) if keys.get(name)]
+
+
+def get_ai_service():
+    """Chat/embedding service: a router over every configured provider (mock in test mode)"""
+    global _ai_service
+
+    if _ai_service is None:
+        if TEST_MODE and settings.TEST_MODE_PROVIDERS > 1:
+            from app.provider_router import ProviderRouter
+            from app.test_mode import MockOpenAIService
+            names = [f"mock{i + 1}" for i in range(settings.TEST_MODE_PROVIDERS)]
+            _ai_service = ProviderRouter({name: MockOpenAIService(name, i) for i, name in enumerate(names)})
+        elif TEST_MODE:
+            from app.test_mode import MockOpenAIService
+            _ai_service = MockOpenAIService()
+        else:
+            from app.provider_router import ProviderRouter
+            providers = {}
+            for name in configured_providers():
+                if name == "groq":
+                    from app.groq_service import GroqService as AIService
+                elif name == "openai":
+                    from app.openai_service import OpenAIService as AIService
+                else:
+                    from app.gemini_service import GeminiService as AIService
+                providers[name] = AIService()
+
+            # Queries are embedded as before (Groq's local embedder if Groq is
+            # configured, otherwise OpenAI's) so the existing index still matches
+            embedding_provider = next(
+                (name for name in ("groq", "openai", "gemini") if name in providers), None
+            )
+            print(f"Using LLM providers: {', '.join(providers)} (embeddings: {embedding_provider})")
+            _ai_service = ProviderRouter(providers, embedding_provider)
+
+    return _ai_service
+
+
+def get_qdrant_service():
+    """Vector search backend: Qdrant, or the local snapshot index (mock in test mode)"""
+    global _qdrant_service
+
+    if _qdrant_service is None:
+        if TEST_MODE:
+            from app.test_mode import MockQdrantService as QdrantService
+        elif settings.VECTOR_BACKEND == "local":
+            print("Using local in-process vector index")
+            from app.local_index import LocalIndexService as QdrantService
+        else:
+            from app.qdrant_service import QdrantService
+        _qdrant_service = QdrantService()
+
+    return _qdrant_service
+
+
+def get_response_cache():
+    """Answer cache (None if disabled)"""
+    global _response_cache
+
+    if _response_cache is None and settings.RESPONSE_CACHE_ENABLED:
+        from app.response_cache import ResponseCache
+        _response_cache = ResponseCache()
+
+    return _response_cache
+
+
+def get_lexical_index():
+    """BM25 index (None unless RETRIEVAL_MODE uses it)"""
+    global _lexical_index
+
+    if _lexical_index is None and settings.RETRIEVAL_MODE in ("lexical", "hybrid"):
+        from app.lexical_index import get_lexical_index as load_lexical_index
+        _lexical_index = load_lexical_index()
+
+    return _lexical_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the database engine once; flush writes and release pools on shutdown"""
+    if not TEST_MODE and settings.DATABASE_URL:
+        try:
+            from app.database import init_database
+            await asyncio.to_thread(init_database)
+        except Exception as db_error:
+            print(f"Database error (non-critical): {db_error}")
+
+    yield
 
-# Initialize services
-ai_service = AIService()
-qdrant_service = QdrantService()
+    await conversation_writer.stop()
+    if hasattr(_qdrant_service, "close"):
+        await _qdrant_service.close()
 
+    # Only release what was actually created
+    if "app.http_client" in sys.modules:
+        from app.http_client import close_http_client
+        await close_http_client()
+    if "app.database" in sys.modules:
+        from app.database import dispose_async_database, dispose_database
+        await dispose_async_database()
+        dispose_database()
 
-@app.get("/")
+
+def create_app() -> FastAPI:
+    """
+    Build the API app (shared by uvicorn, Vercel and the serverless entry points)
+
+    Cheap to call: services and provider clients are created on first use.
+    """
+    app = FastAPI(
+        title=settings.API_TITLE,
+        version=settings.API_VERSION,
+        description="RAG-powered chatbot for Physical AI & Humanoid Robotics textbook",
+        lifespan=lifespan
+    )
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.CORS_ORIGINS + ["*"],  # Allow all in test mode
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Server-Timing"],
+    )
+
+    # Per-stage timing (Server-Timing header) and Prometheus metrics
+    if settings.METRICS_ENABLED:
+        app.add_middleware(TimingMiddleware)
+
+    app.include_router(router)
+    return app
+
+
+REGISTRY.register(Gauge(
+    "chatbot_db_write_pending", "Rows queued for write-behind persistence",
+    lambda: conversation_writer.stats()["pending"]
+))
+REGISTRY.register(Gauge(
+    "chatbot_db_write_dropped_total", "Rows dropped because the write-behind queue was full",
+    lambda: conversation_writer.stats()["dropped"]
+))
+REGISTRY.register(Gauge(
+    "chatbot_provider_circuit_open", "1 while a provider's circuit breaker is open or half-open",
+    lambda: {
+        name: int(health["state"] != "closed") for name, health in _ai_service.stats().items()
+    } if hasattr(_ai_service, "stats") else None,
+    label="provider"
+))
+REGISTRY.register(Gauge(
+    "chatbot_provider_latency_ewma_seconds", "Smoothed latency the router ranks providers by",
+    lambda: {
+        name: health["latency_ewma"] for name, health in _ai_service.stats().items()
+        if health["latency_ewma"] is not None
+    } if hasattr(_ai_service, "stats") else None,
+    label="provider"
+))
+REGISTRY.register(Gauge(
+    "chatbot_llm_slots_in_use", "LLM calls holding a global admission slot",
+    lambda: get_llm_limiter().stats()["active"]
+))
+REGISTRY.register(Gauge(
+    "chatbot_llm_queue_depth", "Requests waiting for a global LLM slot",
+    lambda: get_llm_limiter().stats()["waiting"]
+))
+REGISTRY.register(Gauge(
+    "chatbot_chat_sockets", "Open /ws/chat connections",
+    lambda: len(chat_sockets)
+))
+REGISTRY.register(Gauge(
+    "chatbot_coalesce_in_flight", "Distinct chat queries currently being answered (single-flight keys)",
+    lambda: in_flight_answers.stats()["in_flight"] if in_flight_answers else None
+))
+
+
+@router.get("/")
 def root():
     """Root endpoint"""
     return {
@@ -68,23 +250,424 @@ def root():
     }
 
 
-@app.get("/health")
+@router.get("/health")
 def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
         "version": settings.API_VERSION,
         "mode": "TEST" if TEST_MODE else "PRODUCTION",
-        "ai_service": "Groq" if settings.GROQ_API_KEY else ("OpenAI" if settings.OPENAI_API_KEY else "None"),
+        "ai_service": ", ".join(configured_providers()) or "None",
         "groq_configured": bool(settings.GROQ_API_KEY),
         "openai_configured": bool(settings.OPENAI_API_KEY),
+        "gemini_configured": bool(settings.GEMINI_API_KEY),
+        "providers": _ai_service.stats() if hasattr(_ai_service, "stats") else None,
         "qdrant_configured": bool(settings.QDRANT_URL),
-        "database_configured": bool(settings.DATABASE_URL)
+        "database_configured": bool(settings.DATABASE_URL),
+        "response_cache": _response_cache.stats() if _response_cache else None,
+        "llm_admission": get_llm_limiter().stats(),
+        "conversation_writer": conversation_writer.stats()
     }
 
 
-@app.post("/api/chat/query", response_model=ChatResponse)
-async def chat_query(request: ChatRequest):
+def query_text_for(request: ChatRequest) -> str:
+    """The user query together with any selected text"""
+    if request.context:
+        return f"{request.context}\n\nQuestion: {request.message}"
+    return request.message
+
+
+async def embed_query(request: ChatRequest) -> List[float]:
+    """Embed the user query together with any selected text"""
+    return await get_ai_service().generate_embedding(query_text_for(request))
+
+
+async def embed_queries(requests: List[ChatRequest]) -> List[List[float]]:
+    """Embed many queries in one batched call"""
+    if not requests:
+        return []
+    return await get_ai_service().generate_embeddings_batch([query_text_for(request) for request in requests])
+
+
+def search_filters(request: ChatRequest) -> Optional[Dict[str, str]]:
+    """Payload filter for the page / module the question was asked from (None if unscoped)"""
+    return scope_filters(request.page_url, request.scope)
+
+
+def cache_context(request: ChatRequest) -> Optional[str]:
+    """Selected text plus the search scope: both shape the answer, so both key the answer caches"""
+    filters = search_filters(request)
+    if not filters:
+        return request.context
+    scope = ",".join(f"{key}={value}" for key, value in sorted(filters.items()))
+    return f"{request.context or ''}\n[scope {scope}]"
+
+
+def lexical_search(request: ChatRequest, top_k: int, filters: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """BM25 search ([] if the lexical index is disabled or not built yet)"""
+    lexical_index = get_lexical_index()
+    if lexical_index is None or not lexical_index.ready:
+        return []
+    with stage("search", provider="bm25"):
+        return lexical_index.search(query_text_for(request), top_k=top_k, filters=filters)
+
+
+def scoped_results_ok(results: List[Dict]) -> bool:
+    """Whether a scoped vector search found a strong enough match to skip the unscoped one"""
+    ok = bool(results) and results[0]["score"] >= settings.SCOPED_SEARCH_MIN_SCORE
+    SCOPED_SEARCHES.inc(result="scoped" if ok else "widened")
+    return ok
+
+
+async def retrieve_context(request: ChatRequest, query_embedding: Optional[List[float]] = None) -> List[Dict]:
+    """
+    Retrieve context for the query according to RETRIEVAL_MODE
+
+    - vector: embed the query (if needed) and search Qdrant
+    - lexical: BM25 only, no embedding call; falls back to vector search
+      when no query term is in the index
+    - hybrid: BM25 and vector results fused by reciprocal rank
+
+    Questions asked from a book page search that page (or its module)
+    first, and the whole book only when the best scoped match is weaker
+    than SCOPED_SEARCH_MIN_SCORE (lexical mode: when nothing matched).
+    """
+    top_k = settings.TOP_K_RESULTS
+    filters = search_filters(request)
+
+    if settings.RETRIEVAL_MODE == "lexical":
+        results = lexical_search(request, top_k, filters)
+        if filters and not results:
+            results = lexical_search(request, top_k)
+        if results:
+            return results
+
+    if query_embedding is None:
+        query_embedding = await embed_query(request)
+
+    hybrid = settings.RETRIEVAL_MODE == "hybrid"
+    vector_top_k = settings.HYBRID_CANDIDATES if hybrid else top_k
+    vector_results = []
+    if filters:
+        vector_results = await get_qdrant_service().search_similar(
+            query_embedding=query_embedding,
+            top_k=vector_top_k,
+            filters=filters
+        )
+        if not scoped_results_ok(vector_results):
+            filters = None
+    if not filters:
+        vector_results = await get_qdrant_service().search_similar(
+            query_embedding=query_embedding,
+            top_k=vector_top_k
+        )
+
+    if hybrid:
+        lexical_results = lexical_search(request, settings.HYBRID_CANDIDATES, filters)
+        if lexical_results:
+            from app.lexical_index import reciprocal_rank_fusion
+            return reciprocal_rank_fusion([vector_results, lexical_results], top_k)
+
+    return vector_results[:top_k]
+
+
+async def retrieve_context_batch(
+    requests: List[ChatRequest],
+    query_embeddings: Optional[List[List[float]]] = None
+) -> List[List[Dict]]:
+    """
+    retrieve_context for many queries with one embedding call and one vector search
+
+    Scoped queries with weak matches add one more batched search, over the
+    whole book, for just those queries.
+
+    Args:
+        requests: Queries
+        query_embeddings: Their embeddings, if already computed
+
+    Returns:
+        One result list per request, in order
+    """
+    top_k = settings.TOP_K_RESULTS
+    results: List[Optional[List[Dict]]] = [None] * len(requests)
+    filters = [search_filters(request) for request in requests]
+
+    if settings.RETRIEVAL_MODE == "lexical":
+        for i, request in enumerate(requests):
+            results[i] = lexical_search(request, top_k, filters[i]) or None
+            if results[i] is None and filters[i]:
+                results[i] = lexical_search(request, top_k) or None
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+
+    if query_embeddings is None:
+        embeddings = await embed_queries([requests[i] for i in pending])
+    else:
+        embeddings = [query_embeddings[i] for i in pending]
+
+    hybrid = settings.RETRIEVAL_MODE == "hybrid"
+    vector_top_k = settings.HYBRID_CANDIDATES if hybrid else top_k
+    vector_results = await get_qdrant_service().search_similar_batch(
+        query_embeddings=embeddings,
+        top_k=vector_top_k,
+        filters=[filters[i] for i in pending]
+    )
+
+    # Widen weak scoped searches to the whole book
+    widen = [n for n, i in enumerate(pending) if filters[i] and not scoped_results_ok(vector_results[n])]
+    if widen:
+        widened = await get_qdrant_service().search_similar_batch(
+            query_embeddings=[embeddings[n] for n in widen],
+            top_k=vector_top_k
+        )
+        for n, vector_docs in zip(widen, widened):
+            vector_results[n] = vector_docs
+            filters[pending[n]] = None
+
+    for i, vector_docs in zip(pending, vector_results):
+        lexical_results = lexical_search(requests[i], settings.HYBRID_CANDIDATES, filters[i]) if hybrid else []
+        if lexical_results:
+            from app.lexical_index import reciprocal_rank_fusion
+            results[i] = reciprocal_rank_fusion([vector_docs, lexical_results], top_k)
+        else:
+            results[i] = vector_docs[:top_k]
+
+    return results
+
+
+def build_citations(similar_docs: List[Dict]) -> List[Citation]:
+    """Build citations from the top retrieved documents"""
+    return [
+        Citation(
+            chapter=doc["chapter"],
+            section=doc["section"],
+            url=doc["url"],
+            relevance_score=doc["score"]
+        )
+        for doc in similar_docs[:3]  # Top 3 citations
+    ]
+
+
+async def lookup_cached_answer(request: ChatRequest) -> Tuple[Optional[Dict], Optional[List[float]]]:
+    """
+    Check the answer cache (exact tier, then semantic tier if enabled)
+
+    Returns:
+        (cached answer or None, query embedding if one was computed)
+    """
+    response_cache = get_response_cache()
+    if response_cache is None:
+        return None, None
+
+    with stage("cache"):
+        cached = response_cache.get(request.message, cache_context(request))
+    if cached is not None or not response_cache.semantic_threshold:
+        CACHE_REQUESTS.inc(cache="response", result="miss" if cached is None else "hit")
+        return cached, None
+
+    query_embedding = await embed_query(request)
+    with stage("cache"):
+        cached = response_cache.get_semantic(query_embedding, cache_context(request))
+    CACHE_REQUESTS.inc(cache="response", result="miss" if cached is None else "semantic_hit")
+    return cached, query_embedding
+
+
+def cache_answer(
+    request: ChatRequest,
+    response_text: str,
+    citations: List[Citation],
+    similar_docs: List[Dict],
+    query_embedding: Optional[List[float]] = None
+):
+    """Cache a successful answer (never provider errors or empty retrievals)"""
+    response_cache = get_response_cache()
+    if response_cache is None or not similar_docs or response_text == ERROR_RESPONSE:
+        return
+
+    response_cache.put(
+        request.message,
+        cache_context(request),
+        {
+            "response": response_text,
+            "citations": [citation.model_dump() for citation in citations]
+        },
+        query_embedding=query_embedding
+    )
+
+
+def save_conversation(session_id: str, request: ChatRequest, response_text: str):
+    """Queue conversation for write-behind persistence (optional, non-critical)"""
+    if TEST_MODE or not settings.DATABASE_URL:
+        return
+
+    from app.database import Conversation
+
+    with stage("persist"):
+        conversation_writer.enqueue(Conversation, {
+            "session_id": session_id,
+            "user_message": request.message,
+            "ai_response": response_text,
+            "context": request.context
+        })
+
+
+def log_query(session_id: str, request: ChatRequest, success: bool):
+    """Queue a query_logs row for a sample of successful queries and every failure"""
+    if TEST_MODE or not settings.DATABASE_URL:
+        return
+    if success and random.random() >= settings.QUERY_LOG_SAMPLE_RATE:
+        return
+
+    from app.database import QueryLog
+
+    timing = current_timing()
+    conversation_writer.enqueue(QueryLog, {
+        "session_id": session_id,
+        "query": request.message,
+        "response_time": timing.elapsed() if timing else None,
+        "success": int(success)
+    })
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def uses_history(request: ChatRequest) -> bool:
+    """Whether the answer depends on the session's earlier turns"""
+    return bool(request.session_id and settings.HISTORY_TURNS and settings.DATABASE_URL and not TEST_MODE)
+
+
+async def load_history(session_id: str) -> List[Dict[str, str]]:
+    """Last turns of the session, including rows still queued for writing (non-critical)"""
+    try:
+        from app.database import Conversation
+        from app.history import fetch_recent_turns
+
+        return await fetch_recent_turns(
+            session_id,
+            settings.HISTORY_TURNS,
+            unflushed=conversation_writer.unflushed(Conversation)
+        )
+    except Exception as db_error:
+        print(f"Database error (non-critical): {db_error}")
+        return []
+
+
+def start_history_load(request: ChatRequest) -> Optional[asyncio.Task]:
+    """Start loading history in the background so it overlaps cache lookup and retrieval"""
+    if not uses_history(request):
+        return None
+    return asyncio.create_task(load_history(request.session_id))
+
+
+async def await_history(history_task: Optional[asyncio.Task]) -> List[Dict[str, str]]:
+    return await history_task if history_task is not None else []
+
+
+def coalesce_key(request: ChatRequest) -> str:
+    """Single-flight key: normalized message, selected text and scope (plus the session if it has history)"""
+    from app.response_cache import normalize_text
+
+    parts = [normalize_text(request.message), normalize_text(cache_context(request))]
+    if uses_history(request):
+        parts.append(request.session_id)
+    raw = "\x1f".join(parts)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def client_key(http_request: HTTPConnection) -> str:
+    """Admission key: the client IP (session ids are chosen by the client, so cannot key a limit)"""
+    forwarded = http_request.headers.get("x-forwarded-for") if settings.TRUST_PROXY_HEADERS else None
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+
+
+def rejection(error: AdmissionRejected) -> HTTPException:
+    """HTTP error for a refused request, with Retry-After"""
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def admit(http_request: Request, cost: int = 1) -> str:
+    """
+    Rate-limit the client and turn new work away while the LLM queue is full
+
+    Args:
+        http_request: The incoming request
+        cost: Questions in the request (a batch is charged for every one)
+
+    Returns:
+        The client's admission key (raises HTTPException 429 / 503)
+    """
+    key = client_key(http_request)
+    try:
+        check_admission(key, cost)
+    except AdmissionRejected as e:
+        raise rejection(e)
+    return key
+
+
+def check_admission(key: str, cost: int = 1):
+    """Charge cost requests to the client's rate limit and refuse them while the LLM queue is full (raises AdmissionRejected)"""
+    get_rate_limiter().check(key, cost)
+    get_llm_limiter().check_capacity()
+
+
+async def answer_query(request: ChatRequest, client: str) -> Tuple[str, List[Citation]]:
+    """
+    Answer a query through the cache and the RAG pipeline
+
+    Only depends on the session through its history, so concurrent
+    identical requests (see coalesce_key) can share it. The LLM call waits
+    for a global slot, queued fairly under the client's admission key.
+
+    Returns:
+        (response text, citations)
+    """
+    # Earlier turns load concurrently with cache lookup and retrieval
+    history_task = start_history_load(request)
+
+    try:
+        # Serve repeated questions from the answer cache (only without history)
+        cached, query_embedding = await lookup_cached_answer(request)
+        if cached is not None and not await await_history(history_task):
+            return cached["response"], [Citation(**citation) for citation in cached["citations"]]
+
+        # Steps 1-2: Embed query and search Qdrant for relevant context
+        similar_docs = await retrieve_context(request, query_embedding)
+
+        # Step 3: Generate response with context and earlier turns
+        history = await await_history(history_task)
+        async with get_llm_limiter().slot(client):
+            response_text = await get_ai_service().generate_chat_response(
+                user_message=request.message,
+                context_documents=similar_docs,
+                conversation_history=history or None
+            )
+
+        # Step 4: Build citations
+        citations = build_citations(similar_docs)
+
+        # Step 5: Cache answer (follow-ups depend on their history, so are not cached)
+        if not history:
+            cache_answer(request, response_text, citations, similar_docs, query_embedding)
+        return response_text, citations
+
+    finally:
+        if history_task is not None:
+            history_task.cancel()
+
+
+@router.post("/api/chat/query", response_model=ChatResponse)
+async def chat_query(request: ChatRequest, http_request: Request):
     """
     Main chat endpoint with RAG
 
@@ -96,56 +679,24 @@ async def chat_query(request: ChatRequest):
     5. Extract citations
     6. Save conversation to database
     """
-    try:
-        # Generate session ID if not provided
-        session_id = request.session_id or str(uuid.uuid4())
-
-        # Step 1: Generate query embedding
-        query_text = request.message
-        if request.context:
-            query_text = f"{request.context}\n\nQuestion: {request.message}"
+    client = admit(http_request)
 
-        query_embedding = await ai_service.generate_embedding(query_text)
+    # Generate session ID if not provided
+    session_id = request.session_id or str(uuid.uuid4())
 
-        # Step 2: Search Qdrant for relevant context
-        similar_docs = await qdrant_service.search_similar(
-            query_embedding=query_embedding,
-            top_k=settings.TOP_K_RESULTS
-        )
-
-        # Step 3: Generate response with context
-        response_text = await ai_service.generate_chat_response(
-            user_message=request.message,
-            context_documents=similar_docs
-        )
-
-        # Step 4: Build citations
-        citations = [
-            Citation(
-                chapter=doc["chapter"],
-                section=doc["section"],
-                url=doc["url"],
-                relevance_score=doc["score"]
+    try:
+        # Identical concurrent requests share one pipeline run
+        if in_flight_answers is not None:
+            (response_text, citations), shared = await in_flight_answers.do(
+                coalesce_key(request), lambda: answer_query(request, client)
             )
-            for doc in similar_docs[:3]  # Top 3 citations
-        ]
+            COALESCED_REQUESTS.inc(role="follower" if shared else "leader")
+        else:
+            response_text, citations = await answer_query(request, client)
 
-        # Step 5: Save to database (optional)
-        if not TEST_MODE:
-            try:
-                db = get_database()
-                if db:
-                    conversation = Conversation(
-                        session_id=session_id,
-                        user_message=request.message,
-                        ai_response=response_text,
-                        context=request.context
-                    )
-                    db.add(conversation)
-                    db.commit()
-                    db.close()
-            except Exception as db_error:
-                print(f"Database error (non-critical): {db_error}")
+        # Step 6: Save conversation to database under this request's session (optional)
+        save_conversation(session_id, request, response_text)
+        log_query(session_id, request, success=response_text != ERROR_RESPONSE)
 
         return ChatResponse(
             response=response_text,
@@ -153,70 +704,416 @@ async def chat_query(request: ChatRequest):
             session_id=session_id
         )
 
+    except AdmissionRejected as e:
+        log_query(session_id, request, success=False)
+        raise rejection(e)
+
     except Exception as e:
         print(f"Error in chat_query: {e}")
+        log_query(session_id, request, success=False)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/chat/history/{session_id}")
-async def get_chat_history(session_id: str):
-    """Get conversation history for a session"""
+async def answer_batch(requests: List[ChatRequest], client: str) -> AsyncIterator[BatchItemResult]:
+    """
+    Answer many queries, yielding each result as soon as it is ready
+
+    Cache hits come first. The remaining queries share one embedding call
+    and one batched vector search, then their completions run
+    BATCH_LLM_CONCURRENCY at a time, each taking a global LLM slot under
+    the batch's admission key. A failed item yields a result with error
+    set and does not affect the others.
+    """
+    session_ids = [request.session_id or str(uuid.uuid4()) for request in requests]
+    history_tasks = [start_history_load(request) for request in requests]
+    tasks: List[asyncio.Future] = []
+
+    def item_result(i: int, response_text: str = None, citations: List[Citation] = (), error: str = None):
+        request = requests[i]
+        if response_text is not None:
+            save_conversation(session_ids[i], request, response_text)
+            if response_text == ERROR_RESPONSE:
+                error = "LLM provider error"
+        log_query(session_ids[i], request, success=error is None)
+        return BatchItemResult(
+            index=i,
+            response=response_text,
+            citations=list(citations),
+            session_id=session_ids[i],
+            error=error
+        )
+
+    try:
+        # Step 1: answer cache (items with history skip the lookup)
+        response_cache = get_response_cache()
+        semantic = response_cache is not None and response_cache.semantic_threshold
+        pending = []
+        for i, request in enumerate(requests):
+            cached = None
+            if response_cache is not None and history_tasks[i] is None:
+                with stage("cache"):
+                    cached = response_cache.get(request.message, cache_context(request))
+                if cached is not None or not semantic:
+                    CACHE_REQUESTS.inc(cache="response", result="miss" if cached is None else "hit")
+            if cached is not None:
+                yield item_result(i, cached["response"], [Citation(**c) for c in cached["citations"]])
+            else:
+                pending.append(i)
+
+        if not pending:
+            return
+
+        # Step 2: one batched embedding call and one batched vector search
+        try:
+            query_embeddings = None
+            if semantic:
+                query_embeddings = await embed_queries([requests[i] for i in pending])
+                still_pending = []
+                for i, query_embedding in zip(pending, query_embeddings):
+                    cached = None
+                    if history_tasks[i] is None:
+                        with stage("cache"):
+                            cached = response_cache.get_semantic(query_embedding, cache_context(requests[i]))
+                        CACHE_REQUESTS.inc(cache="response", result="miss" if cached is None else "semantic_hit")
+                    if cached is not None:
+                        yield item_result(i, cached["response"], [Citation(**c) for c in cached["citations"]])
+                    else:
+                        still_pending.append((i, query_embedding))
+                pending = [i for i, _ in still_pending]
+                query_embeddings = [query_embedding for _, query_embedding in still_pending]
+
+            retrieved = await retrieve_context_batch([requests[i] for i in pending], query_embeddings)
+        except Exception as e:
+            print(f"Error in chat_batch retrieval: {e}")
+            for i in pending:
+                yield item_result(i, error=str(e))
+            return
+
+        # Step 3: completions, a bounded number at a time
+        semaphore = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+
+        async def complete(i: int, similar_docs: List[Dict], query_embedding: Optional[List[float]]):
+            try:
+                async with semaphore:
+                    history = await await_history(history_tasks[i])
+                    async with get_llm_limiter().slot(client):
+                        response_text = await get_ai_service().generate_chat_response(
+                            user_message=requests[i].message,
+                            context_documents=similar_docs,
+                            conversation_history=history or None
+                        )
+                citations = build_citations(similar_docs)
+                if not history:
+                    cache_answer(requests[i], response_text, citations, similar_docs, query_embedding)
+                return item_result(i, response_text, citations)
+            except Exception as e:
+                print(f"Error in chat_batch item {i}: {e}")
+                return item_result(i, error=str(e))
+
+        tasks = [
+            asyncio.ensure_future(complete(
+                i, similar_docs, query_embeddings[n] if query_embeddings is not None else None
+            ))
+            for n, (i, similar_docs) in enumerate(zip(pending, retrieved))
+        ]
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+
+    finally:
+        # The client went away (or we are done): stop whatever is still running
+        for task in tasks + [task for task in history_tasks if task is not None]:
+            task.cancel()
+
+
+@router.post("/api/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(batch: BatchChatRequest, http_request: Request, stream: bool = False):
+    """
+    Answer many questions in one call (e.g. quiz generation)
+
+    Results are returned in request order. With ?stream=true they are sent
+    as NDJSON instead, one BatchItemResult per line in the order they finish.
+    """
+    if len(batch.questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    client = admit(http_request, cost=len(batch.questions))
+
+    if stream:
+        async def ndjson():
+            async for item in answer_batch(batch.questions, client):
+                yield item.model_dump_json() + "\n"
+
+        return StreamingResponse(
+            ndjson(),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    results = [item async for item in answer_batch(batch.questions, client)]
+    return BatchChatResponse(results=sorted(results, key=lambda item: item.index))
+
+
+async def answer_events(
+    request: ChatRequest,
+    session_id: str,
+    client: str,
+    history: Optional[List[Dict[str, str]]] = None
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Answer a query as a stream of (event, data) pairs
+
+    Events: citations, then one token per completion delta, then done; or
+    error instead of done if the pipeline fails (with retry_after if no LLM
+    slot freed up in time).
+
+    Args:
+        request: The question
+        session_id: Session the turn is saved under
+        client: Admission key the LLM slot is queued under
+        history: Earlier turns held by the caller (None loads the session's from the database)
+    """
+    history_task = start_history_load(request) if history is None else None
+    try:
+        cached, query_embedding = await lookup_cached_answer(request)
+        if cached is not None and not (history or await await_history(history_task)):
+            yield "citations", {"citations": cached["citations"]}
+            yield "token", {"delta": cached["response"]}
+            save_conversation(session_id, request, cached["response"])
+            log_query(session_id, request, success=True)
+            yield "done", {"session_id": session_id}
+            return
+
+        similar_docs = await retrieve_context(request, query_embedding)
+        citations = build_citations(similar_docs)
+        yield "citations", {"citations": [citation.model_dump() for citation in citations]}
+
+        if history is None:
+            history = await await_history(history_task)
+        parts = []
+        async with get_llm_limiter().slot(client):
+            async for delta in get_ai_service().stream_chat_response(
+                user_message=request.message,
+                context_documents=similar_docs,
+                conversation_history=history or None
+            ):
+                parts.append(delta)
+                yield "token", {"delta": delta}
+
+        response_text = "".join(parts)
+        if not history:
+            cache_answer(request, response_text, citations, similar_docs, query_embedding)
+        save_conversation(session_id, request, response_text)
+        log_query(session_id, request, success=response_text != ERROR_RESPONSE)
+        yield "done", {"session_id": session_id}
+
+    except AdmissionRejected as e:
+        log_query(session_id, request, success=False)
+        yield "error", {"detail": str(e), "retry_after": e.retry_after, "session_id": session_id}
+
+    except Exception as e:
+        print(f"Error in chat_stream: {e}")
+        log_query(session_id, request, success=False)
+        yield "error", {"detail": str(e), "session_id": session_id}
+
+    finally:
+        if history_task is not None:
+            history_task.cancel()
+
+
+@router.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Streaming chat endpoint (Server-Sent Events)
+
+    Events:
+    - citations: sent as soon as retrieval finishes
+    - token: one per completion delta ({"delta": "..."})
+    - done: final event with the session_id
+    - error: sent instead of done if the pipeline fails (with retry_after
+      if no LLM slot freed up in time)
+    """
+    client = admit(http_request)
+    session_id = request.session_id or str(uuid.uuid4())
+
+    async def event_stream():
+        async for event, data in answer_events(request, session_id, client):
+            yield sse_event(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    Multi-turn chat over one WebSocket
+
+    Client messages (JSON):
+    - {"type": "message", "message": ..., "context", "page_url", "scope"}:
+      ask a question (the ChatRequest fields, without session_id)
+    - {"type": "cancel"}: stop the answer in progress
+
+    Server events (JSON with a "type"): session (once, with the session_id),
+    then per question the /api/chat/stream events (citations, token...,
+    done or error), or cancelled. Earlier turns of the connection are kept
+    server-side and sent to the LLM, so the client only sends the new
+    question. One answer runs at a time; admission applies per question.
+    """
+    await websocket.accept()
+    session_id = session_id or str(uuid.uuid4())
+    client = client_key(websocket)
+    outbox = SocketOutbox(settings.WS_MAX_PENDING_EVENTS)
+    history: List[Dict[str, str]] = []
+    answering: Optional[asyncio.Task] = None
+
+    async def answer(request: ChatRequest):
+        parts = []
+        async for event, data in answer_events(request, session_id, client, history=list(history)):
+            if event == "token":
+                parts.append(data["delta"])
+            elif event == "done" and settings.HISTORY_TURNS and "".join(parts) != ERROR_RESPONSE:
+                history.extend([
+                    {"role": "user", "content": request.message},
+                    {"role": "assistant", "content": "".join(parts)}
+                ])
+                del history[:-2 * settings.HISTORY_TURNS]
+            outbox.put(event, data)
+
+    async def receive():
+        nonlocal answering
+        while True:
+            try:
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+                if frame.get("text") is None:
+                    raise ValueError("Expected a text frame with a JSON object")
+                message = json.loads(frame["text"])
+                if not isinstance(message, dict):
+                    raise ValueError("Expected a JSON object")
+                kind = message.pop("type", "message")
+                if kind == "cancel":
+                    if answering is not None and not answering.done():
+                        answering.cancel()
+                        outbox.put("cancelled", {"session_id": session_id})
+                    continue
+                if kind != "message":
+                    raise ValueError(f"Unknown message type: {kind}")
+                if answering is not None and not answering.done():
+                    raise ValueError("An answer is already in progress (send cancel first)")
+                request = ChatRequest(**{**message, "session_id": session_id})
+                check_admission(client)
+            except AdmissionRejected as e:
+                outbox.put("error", {"detail": str(e), "retry_after": e.retry_after, "session_id": session_id})
+                continue
+            except (ValueError, TypeError) as e:  # bad JSON or fields (pydantic errors are ValueErrors)
+                outbox.put("error", {"detail": str(e), "session_id": session_id})
+                continue
+            answering = asyncio.create_task(answer(request))
+
+    async def send():
+        while True:
+            event = await outbox.get()
+            # A client that stops reading is dropped rather than buffered forever
+            await asyncio.wait_for(websocket.send_json(event), settings.WS_SEND_TIMEOUT)
+
+    chat_sockets.add(websocket)
+    outbox.put("session", {"session_id": session_id})
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        error = next(iter(done)).exception()
+        if isinstance(error, asyncio.TimeoutError):
+            print(f"Closing chat socket {session_id}: client not reading")
+            await websocket.close(code=1013)
+        elif isinstance(error, SocketOutboxFull):
+            print(f"Closing chat socket {session_id}: {error}")
+            await websocket.close(code=1008)
+        elif error is not None and not isinstance(error, WebSocketDisconnect):
+            print(f"Error in chat_socket: {error}")
+            await websocket.close(code=1011)
+    except Exception:
+        pass  # the socket is already gone
+    finally:
+        chat_sockets.discard(websocket)
+        for task in tasks + ([answering] if answering is not None else []):
+            task.cancel()
+
+
+@router.get("/metrics")
+def metrics():
+    """Prometheus metrics"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@router.get("/api/chat/history/{session_id}")
+async def get_chat_history(
+    session_id: str,
+    limit: int = Query(settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """
+    Get conversation history for a session, oldest first
+
+    Pages are keyset-paginated: pass the returned next_cursor to get the
+    following page (null on the last page)
+    """
     try:
         if TEST_MODE:
             return {
                 "session_id": session_id,
                 "messages": [],
+                "next_cursor": None,
                 "note": "Test mode - history not saved"
             }
 
-        db = get_database()
-        if not db:
-            return {"session_id": session_id, "messages": []}
-
-        conversations = db.query(Conversation).filter(
-            Conversation.session_id == session_id
-        ).order_by(Conversation.created_at).all()
-
-        messages = [
-            {
-                "user_message": conv.user_message,
-                "ai_response": conv.ai_response,
-                "created_at": conv.created_at.isoformat()
-            }
-            for conv in conversations
-        ]
-
-        db.close()
+        from app.history import fetch_history_page
+        messages, next_cursor = await fetch_history_page(session_id, limit, cursor)
 
         return {
             "session_id": session_id,
-            "messages": messages
+            "messages": messages,
+            "next_cursor": next_cursor
         }
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/collection/info")
+@router.get("/api/collection/info")
 async def get_collection_info():
     """Get Qdrant collection information"""
     try:
-        info = await qdrant_service.get_collection_info()
+        info = await get_qdrant_service().get_collection_info()
         return info
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/collection/create")
+@router.post("/api/collection/create")
 async def create_collection():
     """Create Qdrant collection (admin endpoint)"""
     try:
-        await qdrant_service.create_collection()
+        await get_qdrant_service().create_collection()
         return {"message": "Collection created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Default app for `uvicorn main:app`
+app = create_app()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+
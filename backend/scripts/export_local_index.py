@@ -0,0 +1,58 @@
+"""
+Export the Qdrant collection to a local index snapshot
+The snapshot can ship inside the serverless bundle and be served with
+VECTOR_BACKEND=local, removing Qdrant as a runtime dependency
+"""
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from app.config import settings, resolve_path
+from app.local_index import normalize_rows, write_snapshot
+from qdrant_client import QdrantClient
+
+
+def export_local_index():
+    """Scroll every point out of Qdrant and write the snapshot"""
+    print("Exporting Qdrant collection to local index...")
+
+    client = QdrantClient(
+        url=settings.QDRANT_URL,
+        api_key=settings.QDRANT_API_KEY or None
+    )
+
+    ids, payloads, vectors = [], [], []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            limit=256,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        for point in points:
+            ids.append(point.id)
+            payloads.append(point.payload or {})
+            vectors.append(point.vector)
+        if offset is None:
+            break
+
+    if vectors:
+        matrix = normalize_rows(vectors)
+    else:
+        matrix = np.zeros((0, settings.QDRANT_VECTOR_SIZE), dtype=np.float32)
+
+    path = resolve_path(settings.LOCAL_INDEX_PATH)
+    write_snapshot(path, ids, payloads, matrix)
+
+    print(f"[SUCCESS] Wrote {len(ids)} vectors to {path}")
+    print(f"  Size: {path.stat().st_size / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    export_local_index()
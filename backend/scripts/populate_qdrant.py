@@ -1,9 +1,10 @@
 """
 Script to populate Qdrant with book embeddings
 Reads markdown files, generates embeddings, and uploads to Qdrant
+Re-runs are incremental; pass --full to ignore the manifest
 """
 
-import os
+import argparse
 import sys
 import asyncio
 from pathlib import Path
@@ -12,135 +13,76 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from app.config import settings
-from app.qdrant_service import QdrantService
-from sentence_transformers import SentenceTransformer
-
-# Use sentence-transformers for embeddings (free and works offline)
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')  # 384 dimensions
+from app.index_version import bump_index_version
+from app.embedding_cache import get_embedding_cache
+from app.indexer import IncrementalIndexer, format_stage_report
 
+if settings.VECTOR_BACKEND == "local":
+    from app.local_index import LocalIndexService as QdrantService
+else:
+    from app.qdrant_service import QdrantService
 
-def parse_markdown_file(file_path: str) -> dict:
-    """Parse markdown file and extract metadata"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+# Use sentence-transformers for embeddings (free and works offline)
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'  # 384 dimensions
+_embedding_model = None
 
-    # Extract title from first heading
-    lines = content.split('\n')
-    title = "Untitled"
-    for line in lines:
-        if line.startswith('#'):
-            title = line.strip('#').strip()
-            break
 
-    # Get relative path for URL
-    rel_path = file_path.replace('\\', '/').split('docs/')[1] if 'docs/' in file_path else ""
-    url = f"/{rel_path.replace('.md', '')}"
+def get_embedding_model():
+    """Load the sentence-transformers model on first use"""
+    global _embedding_model
+    if _embedding_model is None:
+        from sentence_transformers import SentenceTransformer
+        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _embedding_model
 
-    return {
-        "title": title,
-        "content": content,
-        "file_path": file_path,
-        "url": url
-    }
 
+def embed_chunks(chunks: list, batch_size: int = None) -> list:
+    """Embed chunks, running the model only for texts missing from the embedding cache"""
+    batch_size = batch_size or settings.INGEST_EMBED_BATCH_SIZE
+    cache = get_embedding_cache()
+    if cache is None:
+        return get_embedding_model().encode(chunks, batch_size=batch_size).tolist()
 
-def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> list:
-    """Split text into overlapping chunks"""
-    words = text.split()
-    chunks = []
+    embeddings = cache.get_many(EMBEDDING_MODEL_NAME, chunks)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
 
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk = ' '.join(words[i:i + chunk_size])
-        if len(chunk) > 50:  # Only keep meaningful chunks
-            chunks.append(chunk)
+    if missing:
+        new_embeddings = get_embedding_model().encode(
+            [chunks[i] for i in missing], batch_size=batch_size
+        ).tolist()
+        cache.put_many(EMBEDDING_MODEL_NAME, [chunks[i] for i in missing], new_embeddings)
+        for i, embedding in zip(missing, new_embeddings):
+            embeddings[i] = embedding
 
-    return chunks
+    print(f"   Embedded {len(missing)} new chunks ({len(chunks) - len(missing)} cached)")
+    return embeddings
 
 
-async def populate_qdrant():
+async def populate_qdrant(full: bool = False, batch_size: int = None):
     """Main function to populate Qdrant"""
     print("🚀 Starting Qdrant population...")
 
     # Initialize Qdrant service
     qdrant = QdrantService()
 
-    # Create collection
-    print("📦 Creating Qdrant collection...")
-    await qdrant.create_collection()
-
-    # Find all markdown files
-    docs_dir = Path(__file__).parent.parent.parent / "frontend" / "docs"
-    md_files = list(docs_dir.rglob("*.md"))
-
-    print(f"📚 Found {len(md_files)} markdown files")
-
-    # Process each file
-    total_chunks = 0
-    vector_ids = []
-    embeddings = []
-    metadatas = []
-
-    for idx, md_file in enumerate(md_files):
-        print(f"\n📄 Processing ({idx+1}/{len(md_files)}): {md_file.name}")
-
-        # Parse file
-        doc = parse_markdown_file(str(md_file))
-
-        # Determine chapter and section from path
-        path_parts = str(md_file).split(os.sep)
-        chapter = "General"
-        section = doc['title']
-
-        if 'module-01-ros2' in str(md_file):
-            chapter = "Module 1: ROS 2"
-        elif 'module-02-simulation' in str(md_file):
-            chapter = "Module 2: Simulation"
-        elif 'module-03-isaac' in str(md_file):
-            chapter = "Module 3: NVIDIA Isaac"
-        elif 'module-04-vla' in str(md_file):
-            chapter = "Module 4: VLA Systems"
-
-        # Chunk the content
-        chunks = chunk_text(doc['content'], chunk_size=500, overlap=50)
-        print(f"   Split into {len(chunks)} chunks")
-
-        # Generate embeddings for each chunk
-        for chunk_idx, chunk in enumerate(chunks):
-            # Generate embedding
-            embedding = embedding_model.encode(chunk).tolist()
-
-            # Prepare metadata
-            vector_id = f"{md_file.stem}_chunk_{chunk_idx}"
-            metadata = {
-                "chapter": chapter,
-                "section": section,
-                "url": doc['url'],
-                "content": chunk,
-                "file": md_file.name
-            }
-
-            vector_ids.append(vector_id)
-            embeddings.append(embedding)
-            metadatas.append(metadata)
-
-            total_chunks += 1
-
-            # Batch upload every 50 chunks
-            if len(vector_ids) >= 50:
-                print(f"   ⬆️  Uploading batch of {len(vector_ids)} vectors...")
-                await qdrant.insert_embeddings_batch(vector_ids, embeddings, metadatas)
-                vector_ids = []
-                embeddings = []
-                metadatas = []
-
-    # Upload remaining chunks
-    if vector_ids:
-        print(f"\n⬆️  Uploading final batch of {len(vector_ids)} vectors...")
-        await qdrant.insert_embeddings_batch(vector_ids, embeddings, metadatas)
+    async def embed(texts):
+        return await asyncio.to_thread(embed_chunks, texts, batch_size)
+
+    # Diff the docs against the manifest; only new or changed chunks are embedded
+    indexer = IncrementalIndexer(qdrant, embed, embedding_model=EMBEDDING_MODEL_NAME,
+                                 embed_batch_size=batch_size)
+    counts = await indexer.run(full=full)
+    print(f"\n⏱️  {format_stage_report(counts)}")
+
+    # Invalidate cached answers only if the collection actually changed
+    if counts["upserted"] or counts["deleted"]:
+        version = bump_index_version()
+        print(f"🔖 Collection version: {version}")
 
     print(f"\n✅ Successfully populated Qdrant!")
-    print(f"📊 Total chunks: {total_chunks}")
-    print(f"📚 Total files: {len(md_files)}")
+    print(f"🔁 Upserted: {counts['upserted']}, deleted: {counts['deleted']}, unchanged: {counts['unchanged']}")
+    print(f"📊 Total chunks: {counts['chunks']}")
+    print(f"📚 Total files: {counts['files']}")
 
     # Get collection info
     info = await qdrant.get_collection_info()
@@ -149,6 +91,14 @@ async def populate_qdrant():
     print(f"   Vectors: {info.get('vector_count')}")
     print(f"   Dimension: {info.get('vector_size')}")
 
+    if hasattr(qdrant, "close"):
+        await qdrant.close()
+
 
 if __name__ == "__main__":
-    asyncio.run(populate_qdrant())
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-embed every chunk")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Chunks per embedding batch (default: INGEST_EMBED_BATCH_SIZE)")
+    args = parser.parse_args()
+    asyncio.run(populate_qdrant(full=args.full, batch_size=args.batch_size))
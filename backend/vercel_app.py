@@ -1,7 +1,8 @@
 """
 Vercel-compatible FastAPI app
 """
-from main import app
+from main import create_app
 
 # Export for Vercel
+app = create_app()
 handler = app
@@ -32,7 +32,9 @@ const ChatWidget: React.FC<ChatWidgetProps> = ({
   const [isLoading, setIsLoading] = useState(false);
   const [sessionId, setSessionId] = useState<string | null>(null);
   const [selectedText, setSelectedText] = useState<string>('');
+  const [socketEpoch, setSocketEpoch] = useState(0);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const socketRef = useRef<WebSocket | null>(null);
 
   // Handle text selection on the page
   useEffect(() => {
@@ -48,6 +50,75 @@ const ChatWidget: React.FC<ChatWidgetProps> = ({
     return () => document.removeEventListener('mouseup', handleSelection);
   }, []);
 
+  // Keep one WebSocket open while the panel is open: answers stream over it
+  // and the server keeps the conversation, so each message is just the
+  // question. Without it (e.g. serverless hosting) messages fall back to POST.
+  useEffect(() => {
+    if (!isOpen) return;
+
+    const query = sessionId ? `?session_id=${encodeURIComponent(sessionId)}` : '';
+    const socket = new WebSocket(`${apiUrl.replace(/^http/, 'ws')}/ws/chat${query}`);
+    socket.onmessage = (event) => handleSocketEvent(JSON.parse(event.data));
+    socket.onopen = () => { socketRef.current = socket; };
+    socket.onclose = () => {
+      if (socketRef.current === socket) {
+        socketRef.current = null;
+        setIsLoading(false);
+      }
+    };
+
+    return () => {
+      if (socketRef.current === socket) socketRef.current = null;
+      socket.close();
+    };
+  }, [isOpen, socketEpoch]);
+
+  // Apply a server event to the answer being streamed (the last message)
+  const updateAnswer = (update: (message: Message) => Message) => {
+    setMessages(prev => {
+      const last = prev[prev.length - 1];
+      return last?.role === 'assistant' ? [...prev.slice(0, -1), update(last)] : prev;
+    });
+  };
+
+  const handleSocketEvent = (event: any) => {
+    switch (event.type) {
+      case 'session':
+        setSessionId(event.session_id);
+        break;
+      case 'citations':
+        updateAnswer(message => ({ ...message, citations: event.citations }));
+        break;
+      case 'token':
+        updateAnswer(message => ({ ...message, content: message.content + event.delta }));
+        break;
+      case 'error':
+        updateAnswer(message => ({
+          ...message,
+          content: message.content || (event.retry_after
+            ? `The assistant is busy. Please try again in ${event.retry_after}s.`
+            : 'Sorry, I encountered an error. Please try again.')
+        }));
+        setIsLoading(false);
+        break;
+      case 'cancelled':
+        // Drop the answer bubble if it was stopped before its first token
+        setMessages(prev => {
+          const last = prev[prev.length - 1];
+          return last?.role === 'assistant' && !last.content ? prev.slice(0, -1) : prev;
+        });
+        setIsLoading(false);
+        break;
+      case 'done':
+        setIsLoading(false);
+        break;
+    }
+  };
+
+  const cancelAnswer = () => {
+    socketRef.current?.send(JSON.stringify({ type: 'cancel' }));
+  };
+
   // Auto-scroll to bottom
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -66,6 +137,19 @@ const ChatWidget: React.FC<ChatWidgetProps> = ({
     setInput('');
     setIsLoading(true);
 
+    const socket = socketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+      socket.send(JSON.stringify({
+        type: 'message',
+        message: textToSend,
+        context: selectedText || undefined,
+        page_url: window.location.pathname
+      }));
+      setSelectedText(''); // Clear selected text after using it
+      return;
+    }
+
     try {
       const response = await fetch(`${apiUrl}/api/chat/query`, {
         method: 'POST',
@@ -75,7 +159,8 @@ const ChatWidget: React.FC<ChatWidgetProps> = ({
         body: JSON.stringify({
           message: textToSend,
           context: selectedText || undefined,
-          session_id: sessionId
+          session_id: sessionId,
+          page_url: window.location.pathname
         }),
       });
 
@@ -123,8 +208,13 @@ const ChatWidget: React.FC<ChatWidgetProps> = ({
     setMessages([]);
     setSessionId(null);
     setSelectedText('');
+    setIsLoading(false);
+    setSocketEpoch(epoch => epoch + 1); // a new connection starts a new conversation
   };
 
+  // Streamed answers replace the typing indicator once their first token arrives
+  const lastMessage = messages[messages.length - 1];
+
   return (
     <>
       {/* Floating chat button */}
@@ -207,7 +297,7 @@ const ChatWidget: React.FC<ChatWidgetProps> = ({
               </div>
             ))}
 
-            {isLoading && (
+            {isLoading && !(lastMessage?.role === 'assistant' && lastMessage.content) && (
               <div className="message assistant loading">
                 <div className="typing-indicator">
                   <span></span>
@@ -237,13 +327,19 @@ const ChatWidget: React.FC<ChatWidgetProps> = ({
                 rows={2}
                 disabled={isLoading}
               />
-              <button
-                onClick={() => sendMessage()}
-                disabled={!input.trim() || isLoading}
-                className="send-button"
-              >
-                {isLoading ? '⏳' : '📤'}
-              </button>
+              {isLoading && socketRef.current ? (
+                <button onClick={cancelAnswer} className="send-button" title="Stop answering">
+                  ⏹
+                </button>
+              ) : (
+                <button
+                  onClick={() => sendMessage()}
+                  disabled={!input.trim() || isLoading}
+                  className="send-button"
+                >
+                  {isLoading ? '⏳' : '📤'}
+                </button>
+              )}
             </div>
             <div className="quick-actions">
               <button onClick={() => sendMessage("What is ROS 2?")} className="quick-action">